@@ -0,0 +1,66 @@
+"""
+Migration script to create the user_daily_activity rollup table and
+backfill it from activity_logs
+"""
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from config.database import engine
+from sqlalchemy import text
+from progress.models import UserDailyActivity
+from utils.logger import logger
+
+BACKFILL_QUERY = """
+    INSERT INTO user_daily_activity (
+        user_id, day, upload_count, note_count, summary_count, quiz_count,
+        quiz_attempt_count, resume_uploaded_count, resume_analyzed_count,
+        total_count, study_minutes
+    )
+    SELECT
+        user_id,
+        CAST(timestamp AT TIME ZONE 'UTC' AS DATE) AS day,
+        COUNT(*) FILTER (WHERE activity_type = 'UPLOAD'),
+        COUNT(*) FILTER (WHERE activity_type = 'NOTE'),
+        COUNT(*) FILTER (WHERE activity_type = 'SUMMARY'),
+        COUNT(*) FILTER (WHERE activity_type = 'QUIZ'),
+        COUNT(*) FILTER (WHERE activity_type = 'QUIZ_ATTEMPT'),
+        COUNT(*) FILTER (WHERE activity_type = 'RESUME_UPLOADED'),
+        COUNT(*) FILTER (WHERE activity_type = 'RESUME_ANALYZED'),
+        COUNT(*),
+        5 * COUNT(*) FILTER (WHERE activity_type IN ('QUIZ', 'QUIZ_ATTEMPT'))
+    FROM activity_logs
+    GROUP BY user_id, CAST(timestamp AT TIME ZONE 'UTC' AS DATE)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        upload_count = EXCLUDED.upload_count,
+        note_count = EXCLUDED.note_count,
+        summary_count = EXCLUDED.summary_count,
+        quiz_count = EXCLUDED.quiz_count,
+        quiz_attempt_count = EXCLUDED.quiz_attempt_count,
+        resume_uploaded_count = EXCLUDED.resume_uploaded_count,
+        resume_analyzed_count = EXCLUDED.resume_analyzed_count,
+        total_count = EXCLUDED.total_count,
+        study_minutes = EXCLUDED.study_minutes
+"""
+
+def create_daily_activity_rollup():
+    """Create user_daily_activity and fill it from the existing activity log"""
+    try:
+        logger.info("Creating user_daily_activity table...")
+        UserDailyActivity.__table__.create(bind=engine, checkfirst=True)
+        
+        with engine.connect() as conn:
+            result = conn.execute(text(BACKFILL_QUERY))
+            conn.commit()
+        
+        logger.info(f"✅ Backfilled {result.rowcount} user/day rows into user_daily_activity!")
+    
+    except Exception as e:
+        logger.error(f"❌ Error creating rollup table: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    create_daily_activity_rollup()
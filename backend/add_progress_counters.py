@@ -0,0 +1,66 @@
+"""
+Migration script to add the running quiz score totals to user_progress
+and backfill every user's counters
+"""
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from config.database import engine, SessionLocal
+from sqlalchemy import text
+from progress.counters import progress_reconciler
+from utils.logger import logger
+
+COLUMNS = {
+    "quiz_score_sum": "DOUBLE PRECISION DEFAULT 0",
+    "quiz_scored_attempts": "INTEGER DEFAULT 0",
+}
+
+def add_progress_counter_columns():
+    """Add quiz_score_sum and quiz_scored_attempts columns to user_progress"""
+    try:
+        logger.info("Adding progress counter columns to user_progress table...")
+        
+        with engine.connect() as conn:
+            for column, definition in COLUMNS.items():
+                # Check if column already exists
+                check_query = text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name='user_progress'
+                    AND column_name=:column
+                """)
+                
+                exists = conn.execute(check_query, {"column": column}).fetchone()
+                if exists:
+                    logger.info(f"✅ Column '{column}' already exists!")
+                    continue
+                
+                conn.execute(text(f"ALTER TABLE user_progress ADD COLUMN {column} {definition}"))
+                logger.info(f"✅ Added '{column}' column to user_progress table")
+            
+            conn.commit()
+    
+    except Exception as e:
+        logger.error(f"❌ Error adding columns: {str(e)}")
+        raise
+
+def backfill_progress_counters():
+    """Recount every user's progress counters"""
+    db = SessionLocal()
+    try:
+        fixed = progress_reconciler.reconcile(db)
+        logger.info(f"✅ Backfilled progress counters for {fixed} users")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error backfilling counters: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_progress_counter_columns()
+    backfill_progress_counters()
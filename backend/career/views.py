@@ -2,6 +2,7 @@
 Career module API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any
 from config.database import get_db
@@ -70,12 +71,12 @@ async def upload_resume(
             detail=f"Error saving file: {str(e)}"
         )
     
-    # Parse resume
+    # Parse resume (file parsing and the Gemini extraction call block, so run off the event loop)
     try:
         if file_ext == '.pdf':
-            parsed_content = resume_parser.parse_pdf(str(file_path))
+            parsed_content = await run_in_threadpool(resume_parser.parse_pdf, str(file_path))
         else:  # .docx
-            parsed_content = resume_parser.parse_docx(str(file_path))
+            parsed_content = await run_in_threadpool(resume_parser.parse_docx, str(file_path))
     except Exception as e:
         os.remove(file_path)
         raise HTTPException(
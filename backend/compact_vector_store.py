@@ -0,0 +1,41 @@
+"""
+Maintenance script to remove orphaned vectors and keyword postings
+(chunks of deleted documents, collections of deleted users, expired
+ad-hoc assistant chunks) in bulk
+"""
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from config.database import SessionLocal
+from core.vector_store import vector_store
+from documents.models import Document
+from users.models import User
+from utils.logger import logger
+
+def compact_vector_store():
+    """Delete every indexed chunk whose document or owner no longer exists"""
+    db = SessionLocal()
+    try:
+        logger.info("Compacting vector store...")
+        
+        document_ids = {str(row[0]) for row in db.query(Document.id)}
+        user_ids = {str(row[0]) for row in db.query(User.id)}
+        stats = vector_store.compact(document_ids, user_ids)
+        
+        logger.info(
+            f"✅ Dropped {stats['collections_dropped']} collections, removed "
+            f"{stats['vectors_removed']} orphaned vectors and "
+            f"{stats['keyword_documents_removed']} orphaned keyword-indexed documents"
+        )
+    except Exception as e:
+        logger.error(f"❌ Error compacting vector store: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    compact_vector_store()
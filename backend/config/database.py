@@ -33,15 +33,40 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+def save_in_new_session(instance):
+    """
+    Insert a row with a short-lived session of its own
+    
+    For work that outlives the request session (e.g. streaming responses);
+    blocking, so call it from async code via run_in_threadpool.
+    
+    Args:
+        instance: New model instance
+    
+    Returns:
+        The instance, refreshed and detached from the closed session
+    """
+    db = SessionLocal()
+    try:
+        db.add(instance)
+        db.commit()
+        db.refresh(instance)
+        return instance
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 def init_db():
     """Initialize database tables"""
     # Import all models to ensure they are registered with Base
     from users.models import User
-    from documents.models import Document
+    from documents.models import Document, ProcessingJob
     from notes.models import Note
     from summarizer.models import Summary
-    from quizzes.models import Quiz, QuizQuestion, QuizAttempt
-    from progress.models import UserProgress, ActivityLog
+    from quizzes.models import Quiz, QuizQuestion, QuizAttempt, QuestionBankItem
+    from progress.models import UserProgress, ActivityLog, UserDailyActivity
     from career.models import Resume, ResumeAnalysis, CareerRecommendation
     
     # Create all tables
@@ -39,6 +39,48 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-2.5-flash"
     GEMINI_EMBEDDING_MODEL: str = "models/text-embedding-004"
+    GEMINI_MAX_CONCURRENCY: int = 8  # Concurrent generate_content calls per process
+    GEMINI_REQUESTS_PER_MINUTE: int = 60  # 0 disables the limit
+    GEMINI_TOKENS_PER_MINUTE: int = 1000000  # Estimated prompt tokens; 0 disables the limit
+    GEMINI_RATE_LIMIT_TIMEOUT_SECONDS: float = 60.0
+    GEMINI_REQUEST_TIMEOUT_SECONDS: float = 120.0
+    GEMINI_MAX_RETRIES: int = 3
+    GEMINI_RETRY_BASE_SECONDS: float = 1.0
+    GEMINI_RETRY_MAX_SECONDS: float = 30.0
+    GEMINI_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    GEMINI_CIRCUIT_RESET_SECONDS: float = 60.0
+    
+    # LLM response cache (opt-in)
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_PATH: str = "./cache/llm_cache.sqlite3"
+    LLM_CACHE_MEMORY_ITEMS: int = 256
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    LLM_CACHE_MAX_SIZE_MB: float = 200.0
+    LLM_CACHE_TTL_HOURS: float = 168.0
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.5  # Higher-temperature calls are never cached
+    
+    # Prompt context budgets (estimated tokens of document content per prompt)
+    QUIZ_CONTEXT_TOKENS: int = 2000
+    QUIZ_GENERATION_CONCURRENCY: int = 4  # Question types generated in parallel for mixed quizzes
+    QUIZ_GRADING_BATCH_SIZE: int = 20  # Short answers graded per LLM call
+    QUIZ_GRADING_CONCURRENCY: int = 4  # Parallel per-question grading when a batch fails
+    SHORT_ANSWER_LOCAL_ACCEPT: float = 0.85  # Local similarity at or above this is graded correct without the LLM
+    SHORT_ANSWER_LOCAL_REJECT: float = 0.1  # Local similarity at or below this is graded incorrect without the LLM
+    NOTES_CONTEXT_TOKENS: int = 12000
+    SUMMARY_CONTEXT_TOKENS: int = 12000
+    
+    # Question bank (pre-generated questions per document, type and difficulty)
+    QUESTION_BANK_ENABLED: bool = True
+    QUESTION_BANK_POOL_SIZE: int = 20  # Questions kept per document/type/difficulty pool
+    QUESTION_BANK_LOW_WATERMARK: int = 8  # Pools below this are topped up in the background
+    QUESTION_BANK_MAX_SERVES: int = 3  # Questions are retired after appearing in this many quizzes
+    QUESTION_BANK_PREFILL_DIFFICULTIES: str = "medium"  # Pools filled after document processing
+    
+    # Map-reduce summarization for content over SUMMARY_CONTEXT_TOKENS
+    SUMMARY_CHUNK_CHARS: int = 16000
+    SUMMARY_CHUNK_OVERLAP: int = 400
+    SUMMARY_MAP_CONCURRENCY: int = 4
+    SUMMARY_PARTIAL_CACHE_PATH: str = "./cache/summary_partials.sqlite3"
     
     # External APIs (Optional - will use defaults if not in .env)
     SUPADATA_API_KEY: str = ""
@@ -70,6 +112,47 @@ class Settings(BaseSettings):
     
     # Vector Database
     VECTOR_DB_PATH: str = "./vector_store"
+    EMBEDDING_BATCH_SIZE: int = 100  # Max texts per embed_content call
+    EMBEDDING_PROVIDER: str = "gemini"  # gemini, or local (offline hashing vectorizer; separate collections)
+    LOCAL_EMBEDDING_DIM: int = 384
+    RETRIEVAL_TOP_K: int = 5
+    HYBRID_RETRIEVAL_ENABLED: bool = True  # Fuse BM25 keyword and vector results (reciprocal-rank fusion)
+    HYBRID_CANDIDATES: int = 20  # Candidates taken from each retriever before fusion
+    HYBRID_RRF_K: int = 60
+    ASSISTANT_INDEX_TTL_HOURS: int = 24  # compact_vector_store.py removes ad-hoc assistant chunks not re-indexed for this long
+    CHUNK_MAX_TOKENS: int = 250  # Estimated tokens per indexed chunk (about 1000 characters)
+    CHUNK_OVERLAP_TOKENS: int = 50  # Trailing sentences repeated in the next chunk
+    EMBEDDING_CACHE_ENABLED: bool = True  # Reuse vectors of identical chunks across users and uploads
+    EMBEDDING_CACHE_PATH: str = "./cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000
+    
+    # Extracted text cache
+    EXTRACTION_CACHE_DIR: str = "./cache/extractions"
+    EXTRACTION_CACHE_URL_TTL_HOURS: int = 24
+    EXTRACTION_CACHE_DB_TIER: bool = True  # Also store text in documents.extracted_text
+    
+    # Background job queue (document processing)
+    JOB_WORKERS_ENABLED: bool = True  # Disable to accept uploads without processing them in this process
+    JOB_WORKER_CONCURRENCY: int = 2
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 10.0
+    JOB_RETRY_MAX_SECONDS: float = 600.0
+    JOB_HEARTBEAT_SECONDS: float = 60.0  # Workers refresh locked_at of their running jobs this often
+    JOB_STALE_AFTER_SECONDS: int = 1800  # Running jobs without a heartbeat for this long are re-queued on startup
+    
+    # Progress counters (maintained incrementally, recounted periodically to fix drift)
+    PROGRESS_RECONCILE_INTERVAL_MINUTES: int = 60  # 0 disables the background reconciler
+    
+    # Activity logging (write-behind)
+    ACTIVITY_LOG_BUFFERED: bool = True  # False writes each event synchronously (tests, scripts)
+    ACTIVITY_FLUSH_BATCH_SIZE: int = 200
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = 2.0
+    ACTIVITY_MAX_PENDING: int = 10000  # Oldest events are dropped past this while the DB is failing
+    
+    # Dashboard response cache (per user, invalidated when the user's data changes)
+    DASHBOARD_CACHE_TTL_SECONDS: int = 300  # 0 disables caching
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 5000
     
     # File Upload Configuration
     MAX_FILE_SIZE_MB: int = 50
@@ -99,6 +182,11 @@ class Settings(BaseSettings):
         """Convert ALLOWED_EXTENSIONS string to list"""
         return [ext.strip() for ext in self.ALLOWED_EXTENSIONS.split(",")]
     
+    @property
+    def question_bank_prefill_difficulties(self) -> List[str]:
+        """Convert QUESTION_BANK_PREFILL_DIFFICULTIES string to list"""
+        return [level.strip() for level in self.QUESTION_BANK_PREFILL_DIFFICULTIES.split(",") if level.strip()]
+    
     @property
     def upload_folder_path(self) -> Path:
         """Get upload folder as Path object"""
@@ -0,0 +1,93 @@
+"""
+BM25 keyword scoring for ranking text chunks
+"""
+import math
+import re
+from typing import List, Dict
+
+# Common English stop words ignored when scoring
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'should', 'could', 'may', 'might', 'can', 'this', 'that',
+    'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'not',
+    'if', 'then', 'than', 'so', 'such', 'into', 'its', 'also', 'which'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_+#.\-]*[a-z0-9+#]|[a-z0-9]")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms, keeping identifiers like c++, node.js or CS-101
+    
+    Args:
+        text: Input text
+    
+    Returns:
+        List of terms without stop words
+    """
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOP_WORDS
+    ]
+
+class BM25Scorer:
+    """Okapi BM25 over an in-memory list of tokenized chunks"""
+    
+    def __init__(self, corpus: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Build term statistics for the corpus
+        
+        Args:
+            corpus: Tokenized chunks
+            k1: Term frequency saturation
+            b: Length normalization strength
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(corpus)
+        self.doc_lengths = [len(doc) for doc in corpus]
+        self.avg_length = (sum(self.doc_lengths) / self.doc_count) if self.doc_count else 0.0
+        
+        self.term_freqs: List[Dict[str, int]] = []
+        self.doc_freqs: Dict[str, int] = {}
+        for doc in corpus:
+            freqs: Dict[str, int] = {}
+            for term in doc:
+                freqs[term] = freqs.get(term, 0) + 1
+            self.term_freqs.append(freqs)
+            for term in freqs:
+                self.doc_freqs[term] = self.doc_freqs.get(term, 0) + 1
+    
+    def idf(self, term: str) -> float:
+        """Inverse document frequency (Lucene variant, never negative)"""
+        df = self.doc_freqs.get(term, 0)
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+    
+    def score(self, query_terms: List[str]) -> List[float]:
+        """
+        Score every chunk against the query
+        
+        Args:
+            query_terms: Tokenized query
+        
+        Returns:
+            One score per chunk, in corpus order
+        """
+        scores = [0.0] * self.doc_count
+        if not self.doc_count or not self.avg_length:
+            return scores
+        
+        for term in set(query_terms):
+            if term not in self.doc_freqs:
+                continue
+            idf = self.idf(term)
+            for i, freqs in enumerate(self.term_freqs):
+                tf = freqs.get(term)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        
+        return scores
@@ -0,0 +1,141 @@
+"""
+Sentence- and token-aware text chunking
+Chunks are packed from whole sentences up to a token budget, prefer to end
+at paragraph breaks, and carry their character offsets into the source text
+"""
+import re
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config.settings import settings
+from utils.helpers import CHARS_PER_TOKEN, estimate_tokens
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Shrink a span so it neither starts nor ends with whitespace"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _split_long(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Split a sentence longer than max_chars at word boundaries (hard cut for giant words)"""
+    while end - start > max_chars:
+        cut = max(text.rfind(" ", start, start + max_chars), text.rfind("\n", start, start + max_chars))
+        if cut <= start:
+            cut = start + max_chars
+        yield _trim(text, start, cut)
+        start, _ = _trim(text, cut, end)
+    if start < end:
+        yield start, end
+
+def _units(text: str, max_chars: int) -> Iterator[Tuple[int, int, bool]]:
+    """
+    Walk the text as sentence spans without copying it
+    
+    Yields:
+        (start, end, starts_paragraph) for each sentence, or sentence piece
+        when a sentence alone exceeds max_chars
+    """
+    paragraph_start = 0
+    breaks = PARAGRAPH_BREAK.finditer(text)
+    while paragraph_start is not None:
+        match = next(breaks, None)
+        paragraph_end = match.start() if match else len(text)
+        
+        first = True
+        sentence_start = paragraph_start
+        sentence_ends = (m.start() for m in SENTENCE_BREAK.finditer(text, paragraph_start, paragraph_end))
+        for sentence_end in chain(sentence_ends, [paragraph_end]):
+            start, end = _trim(text, sentence_start, sentence_end)
+            sentence_start = sentence_end
+            if start >= end:
+                continue
+            for piece_start, piece_end in _split_long(text, start, end, max_chars):
+                yield piece_start, piece_end, first
+                first = False
+        
+        paragraph_start = match.end() if match else None
+
+def _make_chunk(text: str, units: List[Tuple[int, int]], index: int) -> Dict[str, Any]:
+    start, end = units[0][0], units[-1][1]
+    chunk = text[start:end]
+    return {
+        "index": index,
+        "text": chunk,
+        "start": start,
+        "end": end,
+        "tokens": estimate_tokens(chunk)
+    }
+
+def iter_chunks(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily split text into chunks of whole sentences
+    
+    A chunk is closed when the next sentence would push it over max_tokens,
+    or at a paragraph break once it is at least half full. Size-forced breaks
+    repeat up to overlap_tokens of trailing sentences in the next chunk;
+    paragraph breaks do not overlap. Only the current chunk's spans are held
+    in memory, so long transcripts can be embedded as they are chunked.
+    
+    Args:
+        text: Input text
+        max_tokens: Estimated token budget per chunk (defaults to CHUNK_MAX_TOKENS)
+        overlap_tokens: Estimated tokens repeated between chunks (defaults to CHUNK_OVERLAP_TOKENS)
+    
+    Yields:
+        Dicts with index, text, start and end (character offsets into text, end
+        exclusive) and tokens (estimated)
+    """
+    max_tokens = max(1, max_tokens or settings.CHUNK_MAX_TOKENS)
+    if overlap_tokens is None:
+        overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens, max_tokens // 2) * CHARS_PER_TOKEN
+    
+    units: List[Tuple[int, int]] = []
+    index = 0
+    for start, end, starts_paragraph in _units(text, max_chars):
+        if units:
+            at_paragraph = starts_paragraph and units[-1][1] - units[0][0] >= max_chars // 2
+            if at_paragraph or end - units[0][0] > max_chars:
+                yield _make_chunk(text, units, index)
+                index += 1
+                
+                carried = []
+                if not at_paragraph:
+                    for unit in reversed(units[1:]):
+                        if units[-1][1] - unit[0] > overlap_chars:
+                            break
+                        carried.insert(0, unit)
+                while carried and end - carried[0][0] > max_chars:
+                    carried.pop(0)
+                units = carried
+        units.append((start, end))
+    
+    if units:
+        yield _make_chunk(text, units, index)
+
+def chunk_text(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None
+) -> List[str]:
+    """
+    Split text into chunks of whole sentences
+    
+    Args:
+        text: Input text
+        max_tokens: Estimated token budget per chunk
+        overlap_tokens: Estimated tokens repeated between chunks
+    
+    Returns:
+        List of chunk texts
+    """
+    return [chunk["text"] for chunk in iter_chunks(text, max_tokens, overlap_tokens)]
@@ -4,6 +4,8 @@ Web content extractor using ExtractorAPI
 import requests
 from typing import Dict, Any, Optional
 from config.settings import settings
+from utils.helpers import hash_string
+from utils.single_flight import single_flight
 
 class WebExtractor:
     """Extract content from web pages"""
@@ -15,6 +17,7 @@ class WebExtractor:
     def fetch_content(self, url: str) -> Dict[str, Any]:
         """
         Fetch webpage content using ExtractorAPI
+        Concurrent requests for the same page share one API call
         
         Args:
             url: Webpage URL
@@ -22,6 +25,10 @@ class WebExtractor:
         Returns:
             Content data dictionary
         """
+        return single_flight.do(f"web:{hash_string(url.strip())}", lambda: self._fetch_content(url))
+    
+    def _fetch_content(self, url: str) -> Dict[str, Any]:
+        """Call ExtractorAPI (see fetch_content)"""
         params = {
             "apikey": self.api_key,
             "url": url
@@ -35,13 +42,16 @@ class WebExtractor:
         except Exception as e:
             raise RuntimeError(f"ExtractorAPI error: {e}")
     
-    def extract_text(self, url: str, max_length: int = 15000) -> Optional[str]:
+    def extract_text(self, url: str, max_length: Optional[int] = None) -> Optional[str]:
         """
         Extract text content from webpage
         
+        Full text is returned by default - prompt builders select or
+        condense long content themselves.
+        
         Args:
             url: Webpage URL
-            max_length: Maximum text length to extract
+            max_length: Optional maximum text length to extract
             
         Returns:
             Extracted text content or None if API key not configured
@@ -57,8 +67,8 @@ class WebExtractor:
             if "text" in webpage_data and webpage_data["text"]:
                 text_content = webpage_data["text"]
                 
-                # Truncate if too long
-                if len(text_content) > max_length:
+                # Truncate if a limit was requested
+                if max_length and len(text_content) > max_length:
                     text_content = text_content[:max_length] + "... [content truncated]"
                 
                 return text_content
@@ -4,6 +4,8 @@ YouTube content extractor using Supadata API
 import requests
 from typing import Dict, Any, Optional
 from config.settings import settings
+from utils.helpers import hash_string
+from utils.single_flight import single_flight
 import logging
 
 # Setup logger
@@ -20,6 +22,7 @@ class YouTubeExtractor:
     def fetch_transcript(self, youtube_url: str, prefer_lang: str = "en") -> Dict[str, Any]:
         """
         Fetch transcript using Supadata API
+        Concurrent requests for the same video share one API call
         
         Args:
             youtube_url: YouTube video URL
@@ -28,6 +31,11 @@ class YouTubeExtractor:
         Returns:
             Transcript data dictionary
         """
+        key = f"youtube:{prefer_lang}:{hash_string(youtube_url.strip())}"
+        return single_flight.do(key, lambda: self._fetch_transcript(youtube_url, prefer_lang))
+    
+    def _fetch_transcript(self, youtube_url: str, prefer_lang: str) -> Dict[str, Any]:
+        """Call the Supadata API (see fetch_transcript)"""
         headers = {"x-api-key": self.api_key}
         params = {"url": youtube_url, "lang": prefer_lang}
         
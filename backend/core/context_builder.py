@@ -0,0 +1,93 @@
+"""
+Context assembly for LLM prompts - selects the most relevant chunks within a token budget
+"""
+from typing import List, Optional
+from core.bm25 import BM25Scorer, tokenize
+from core.vector_store import vector_store
+from utils.helpers import estimate_tokens, extract_keywords
+from utils.logger import logger
+
+class ContextBuilder:
+    """Pick prompt context from long documents instead of slicing the first N characters"""
+    
+    def __init__(self):
+        self.vector_store = vector_store
+    
+    def build_context(
+        self,
+        content: str,
+        token_budget: int,
+        focus_terms: Optional[List[str]] = None,
+        top_k: Optional[int] = None
+    ) -> str:
+        """
+        Select the chunks of content most relevant to the focus terms
+        
+        The document is split into as many contiguous sections as the budget
+        allows; the best BM25 chunk of every section is taken first so the
+        whole document is covered, then the remaining budget is filled with
+        the highest scoring chunks overall. Selected chunks keep document order.
+        
+        Args:
+            content: Full document content
+            token_budget: Maximum estimated tokens of context to return
+            focus_terms: Topics/keywords to rank by (defaults to frequent keywords)
+            top_k: Optional cap on the number of chunks
+        
+        Returns:
+            Context text (content unchanged if it already fits the budget)
+        """
+        if not content or estimate_tokens(content) <= token_budget:
+            return content
+        
+        chunks = self.vector_store.chunk_text(content)
+        chunk_tokens = [estimate_tokens(chunk) for chunk in chunks]
+        
+        terms = [term for term in (focus_terms or []) if term]
+        if not terms:
+            terms = extract_keywords(content, max_keywords=25)
+        query = tokenize(" ".join(terms))
+        
+        scores = BM25Scorer([tokenize(chunk) for chunk in chunks]).score(query)
+        
+        avg_tokens = max(1, sum(chunk_tokens) // len(chunks))
+        max_chunks = max(1, token_budget // avg_tokens)
+        if top_k:
+            max_chunks = min(max_chunks, top_k)
+        
+        selected = set()
+        used_tokens = 0
+        
+        def try_add(i: int) -> bool:
+            nonlocal used_tokens
+            if i in selected or len(selected) >= max_chunks:
+                return False
+            if used_tokens + chunk_tokens[i] > token_budget:
+                return False
+            selected.add(i)
+            used_tokens += chunk_tokens[i]
+            return True
+        
+        # Coverage pass: best chunk from each contiguous section
+        sections = min(max_chunks, len(chunks))
+        for s in range(sections):
+            start = s * len(chunks) // sections
+            end = max(start + 1, (s + 1) * len(chunks) // sections)
+            best = max(range(start, end), key=lambda i: (scores[i], -i))
+            try_add(best)
+        
+        # Relevance pass: fill what is left of the budget by score
+        for i in sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True):
+            if len(selected) >= max_chunks:
+                break
+            try_add(i)
+        
+        ordered = sorted(selected)
+        logger.info(
+            f"Context builder: selected {len(ordered)}/{len(chunks)} chunks, "
+            f"~{used_tokens} tokens (budget {token_budget})"
+        )
+        return "\n\n[...]\n\n".join(chunks[i] for i in ordered)
+
+# Global context builder instance
+context_builder = ContextBuilder()
@@ -0,0 +1,275 @@
+"""
+Persistent BM25 inverted index over vector store chunks
+Lives in a SQLite file inside VECTOR_DB_PATH and mirrors the chunks of every
+collection, so exact terms (course codes, formula and function names) can be
+retrieved without an embedding call
+"""
+import heapq
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from config.settings import settings
+from core.bm25 import tokenize
+from utils.logger import logger
+
+# Stay under SQLite's bound-parameter limit in IN (...) statements
+LOOKUP_BATCH_SIZE = 500
+
+class KeywordIndex:
+    """
+    Okapi BM25 over an on-disk inverted index, one namespace per collection
+    
+    Collection statistics (chunk count, average length, document frequencies)
+    are read at query time, so adds and deletes need no rebuild.
+    """
+    
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path or Path(settings.VECTOR_DB_PATH) / "keyword_index.sqlite3")
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite file on first use (caller holds the lock)"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS kw_chunks (
+                    collection TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    document_id TEXT,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (collection, chunk_id)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS kw_postings (
+                    collection TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (collection, term, chunk_id)
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_kw_chunks_document ON kw_chunks (collection, document_id)"
+            )
+            # The primary key leads with term; deletes by chunk need their own index
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_kw_postings_chunk ON kw_postings (collection, chunk_id)"
+            )
+            self._conn.commit()
+        return self._conn
+    
+    @staticmethod
+    def _delete_chunk_ids(conn: sqlite3.Connection, collection: str, ids: Sequence[str]):
+        """Remove chunks by ID, LOOKUP_BATCH_SIZE IDs per statement"""
+        ids = list(ids)
+        for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+            batch = ids[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(
+                f"DELETE FROM kw_postings WHERE collection = ? AND chunk_id IN ({placeholders})",
+                [collection, *batch]
+            )
+            conn.execute(
+                f"DELETE FROM kw_chunks WHERE collection = ? AND chunk_id IN ({placeholders})",
+                [collection, *batch]
+            )
+    
+    @staticmethod
+    def _delete_postings(conn: sqlite3.Connection, collection: str, chunk_filter: str, params: Sequence[Any]):
+        conn.execute(
+            f"DELETE FROM kw_postings WHERE collection = ? AND chunk_id IN "
+            f"(SELECT chunk_id FROM kw_chunks WHERE collection = ? AND {chunk_filter})",
+            [collection, collection, *params]
+        )
+        conn.execute(f"DELETE FROM kw_chunks WHERE collection = ? AND {chunk_filter}", [collection, *params])
+    
+    def add(
+        self,
+        collection: str,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        replace: bool = True
+    ):
+        """
+        Index chunks, replacing any chunk with the same ID
+        
+        Args:
+            collection: Vector store collection the chunks belong to
+            ids: Chunk IDs (shared with the vector store)
+            texts: Chunk texts
+            metadatas: Optional chunk metadata (document_id is indexed for filtering)
+            replace: Remove existing postings of these IDs first; pass False when
+                the IDs are known to be new (e.g. after delete(document_id=...))
+        """
+        metadatas = metadatas or [{} for _ in ids]
+        chunk_rows, posting_rows = [], []
+        for chunk_id, text, meta in zip(ids, texts, metadatas):
+            terms = tokenize(text)
+            chunk_rows.append((
+                collection, chunk_id, meta.get("document_id"), text, json.dumps(meta), len(terms)
+            ))
+            posting_rows.extend(
+                (collection, term, chunk_id, tf) for term, tf in Counter(terms).items()
+            )
+        
+        with self._lock:
+            conn = self._connect()
+            try:
+                if replace:
+                    self._delete_chunk_ids(conn, collection, ids)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO kw_chunks (collection, chunk_id, document_id, text, metadata, length) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    chunk_rows
+                )
+                conn.executemany(
+                    "INSERT INTO kw_postings (collection, term, chunk_id, tf) VALUES (?, ?, ?, ?)",
+                    posting_rows
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+    
+    def delete(self, collection: str, document_id: Optional[str] = None, ids: Optional[Sequence[str]] = None):
+        """
+        Remove chunks from the index
+        
+        Args:
+            collection: Vector store collection
+            document_id: Remove every chunk of this document
+            ids: Remove these chunk IDs (the whole collection when neither is given)
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                if ids is not None:
+                    self._delete_chunk_ids(conn, collection, ids)
+                elif document_id is not None:
+                    self._delete_postings(conn, collection, "document_id = ?", [str(document_id)])
+                else:
+                    conn.execute("DELETE FROM kw_postings WHERE collection = ?", (collection,))
+                    conn.execute("DELETE FROM kw_chunks WHERE collection = ?", (collection,))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+    
+    def collections(self) -> List[str]:
+        """Names of every collection with indexed chunks"""
+        with self._lock:
+            conn = self._connect()
+            return [row[0] for row in conn.execute("SELECT DISTINCT collection FROM kw_chunks")]
+    
+    def document_ids(self, collection: str) -> List[str]:
+        """IDs of every document with chunks in a collection"""
+        with self._lock:
+            conn = self._connect()
+            return [
+                row[0] for row in conn.execute(
+                    "SELECT DISTINCT document_id FROM kw_chunks WHERE collection = ? AND document_id IS NOT NULL",
+                    (collection,)
+                )
+            ]
+    
+    def vacuum(self):
+        """Reclaim the space of deleted postings"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("VACUUM")
+    
+    def search(
+        self,
+        collection: str,
+        query: str,
+        k: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the chunks that best match the query terms
+        
+        Args:
+            collection: Vector store collection
+            query: Query text
+            k: Number of chunks to return
+            where: Optional filter; only {"document_id": ...} is supported
+        
+        Returns:
+            Matches with id, text, metadata and BM25 score, best first
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        
+        placeholders = ",".join("?" * len(terms))
+        document_filter, filter_params = "", []
+        if where and where.get("document_id") is not None:
+            document_filter, filter_params = " AND c.document_id = ?", [str(where["document_id"])]
+        
+        with self._lock:
+            try:
+                conn = self._connect()
+                chunk_count, avg_length = conn.execute(
+                    "SELECT COUNT(*), AVG(length) FROM kw_chunks WHERE collection = ?", (collection,)
+                ).fetchone()
+                if not chunk_count or not avg_length:
+                    return []
+                
+                doc_freqs = dict(conn.execute(
+                    f"SELECT term, COUNT(*) FROM kw_postings WHERE collection = ? AND term IN ({placeholders}) "
+                    f"GROUP BY term",
+                    [collection, *terms]
+                ).fetchall())
+                postings = conn.execute(
+                    f"SELECT p.chunk_id, p.term, p.tf, c.length FROM kw_postings p "
+                    f"JOIN kw_chunks c ON c.collection = p.collection AND c.chunk_id = p.chunk_id "
+                    f"WHERE p.collection = ? AND p.term IN ({placeholders}){document_filter}",
+                    [collection, *terms, *filter_params]
+                ).fetchall()
+                
+                scores: Dict[str, float] = {}
+                for chunk_id, term, tf, length in postings:
+                    df = doc_freqs[term]
+                    idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                
+                top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+                if not top:
+                    return []
+                
+                rows = dict((row[0], row[1:]) for row in conn.execute(
+                    f"SELECT chunk_id, text, metadata FROM kw_chunks WHERE collection = ? "
+                    f"AND chunk_id IN ({','.join('?' * len(top))})",
+                    [collection, *[chunk_id for chunk_id, _ in top]]
+                ).fetchall())
+            except sqlite3.Error as e:
+                logger.warning(f"Keyword index search failed: {e}")
+                return []
+        
+        return [
+            {
+                "id": chunk_id,
+                "text": rows[chunk_id][0],
+                "metadata": json.loads(rows[chunk_id][1]),
+                "score": score
+            }
+            for chunk_id, score in top
+            if chunk_id in rows
+        ]
+
+# Global keyword index instance
+keyword_index = KeywordIndex()
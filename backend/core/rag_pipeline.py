@@ -1,12 +1,14 @@
 """
 RAG Pipeline for content processing and retrieval
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from core.content_extractors.youtube_extractor import YouTubeExtractor
 from core.content_extractors.web_extractor import WebExtractor
 from core.content_extractors.document_extractor import DocumentExtractor
+from config.settings import settings
 from core.vector_store import vector_store
 from utils.gemini_client import gemini_client
+from utils.helpers import hash_string
 
 class RAGPipeline:
     """Complete RAG pipeline for content processing"""
@@ -19,12 +21,19 @@ class RAGPipeline:
         self.vector_store = vector_store
         self.gemini_client = gemini_client
     
-    def process_youtube(self, url: str) -> Dict[str, Any]:
+    def process_youtube(
+        self, 
+        url: str, 
+        document_id: Optional[str] = None, 
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Process YouTube video - extracts transcript on-demand
         
         Args:
             url: YouTube video URL
+            document_id: Document ID - chunks are only indexed when given
+            user_id: Owner of the document
             
         Returns:
             Processed data dictionary
@@ -62,26 +71,14 @@ class RAGPipeline:
                 print(f"RAG Pipeline Warning: Could not translate to English: {e}")
                 # Continue with original text
             
-            # Chunk text
+            # Chunk and index text (indexing is optional, may fail)
             print("RAG Pipeline: Chunking text...")
-            chunks = self.vector_store.chunk_text(text)
-            print(f"RAG Pipeline: Created {len(chunks)} chunks")
-            
-            # Create index (optional, may fail)
-            try:
-                print("RAG Pipeline: Creating vector index...")
-                index = self.vector_store.create_index(chunks)
-                doc_id = index
-                print("RAG Pipeline: Vector index created successfully")
-            except Exception as e:
-                print(f"RAG Pipeline Warning: Could not create vector index: {e}")
-                index = None
-                doc_id = None
+            index, doc_id, chunk_count = self._index_text(text, document_id, user_id)
+            print(f"RAG Pipeline: Created {chunk_count} chunks")
             
             result = {
                 "text": text,
-                "chunks": chunks,
-                "chunk_count": len(chunks),
+                "chunk_count": chunk_count,
                 "metadata": metadata,
                 "index": index,
                 "doc_id": doc_id,
@@ -89,7 +86,7 @@ class RAGPipeline:
             }
             
             print("RAG Pipeline: YouTube processing completed successfully")
-            print(f"RAG Pipeline Result: text_length={len(text)}, chunks={len(chunks)}, success=True")
+            print(f"RAG Pipeline Result: text_length={len(text)}, chunks={chunk_count}, success=True")
             
             return result
             
@@ -103,12 +100,19 @@ class RAGPipeline:
                 "error": error_msg
             }
     
-    def process_webpage(self, url: str) -> Dict[str, Any]:
+    def process_webpage(
+        self, 
+        url: str, 
+        document_id: Optional[str] = None, 
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Process web article - extracts content on-demand
         
         Args:
             url: Webpage URL
+            document_id: Document ID - chunks are only indexed when given
+            user_id: Owner of the document
             
         Returns:
             Processed data dictionary
@@ -132,22 +136,12 @@ class RAGPipeline:
                 print(f"Warning: Could not translate to English: {e}")
                 # Continue with original text
             
-            # Chunk text
-            chunks = self.vector_store.chunk_text(text)
-            
-            # Create index (optional, may fail)
-            try:
-                index = self.vector_store.create_index(chunks)
-                doc_id = index
-            except Exception as e:
-                print(f"Warning: Could not create vector index: {e}")
-                index = None
-                doc_id = None
+            # Chunk and index text (indexing is optional, may fail)
+            index, doc_id, chunk_count = self._index_text(text, document_id, user_id)
             
             return {
                 "text": text,
-                "chunks": chunks,
-                "chunk_count": len(chunks),
+                "chunk_count": chunk_count,
                 "metadata": metadata,
                 "index": index,
                 "doc_id": doc_id,
@@ -160,12 +154,19 @@ class RAGPipeline:
                 "error": str(e)
             }
     
-    def process_document(self, file_path: str) -> Dict[str, Any]:
+    def process_document(
+        self, 
+        file_path: str, 
+        document_id: Optional[str] = None, 
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Process document file (includes image processing with Gemini Vision)
         
         Args:
             file_path: Path to document
+            document_id: Document ID - chunks are only indexed when given
+            user_id: Owner of the document
             
         Returns:
             Processed data dictionary
@@ -189,17 +190,15 @@ class RAGPipeline:
                 # Regular text document - ensure English
                 text = self.gemini_client.ensure_english(text)
             
-            # Chunk text
-            chunks = self.vector_store.chunk_text(text)
-            
-            # Create index
-            index = self.vector_store.create_index(chunks)
+            # Chunk and index text (indexing is optional, may fail)
+            index, doc_id, chunk_count = self._index_text(text, document_id, user_id)
             
             return {
                 "text": text,
-                "chunks": chunks,
+                "chunk_count": chunk_count,
                 "metadata": {"file_path": file_path},
                 "index": index,
+                "doc_id": doc_id,
                 "success": True
             }
             
@@ -209,19 +208,67 @@ class RAGPipeline:
                 "error": str(e)
             }
     
-    def create_rag_assistant(self, texts: List[str]):
+    def _index_text(
+        self, 
+        text: str, 
+        document_id: Optional[str], 
+        user_id: Optional[str]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], int]:
+        """
+        Chunk text and stream the chunks into the user's vector collection
+        On-demand extraction (no document_id) skips indexing so repeated
+        requests don't re-embed the same content
+        
+        Args:
+            text: Extracted text
+            document_id: Document ID
+            user_id: Owner of the document
+            
+        Returns:
+            Tuple of (index reference, vector DB reference ID, chunk count)
+        """
+        if not document_id:
+            return None, None, sum(1 for _ in self.vector_store.iter_chunks(text))
+        
+        try:
+            print(f"RAG Pipeline: Indexing chunks for document {document_id}...")
+            index = self.vector_store.create_index(
+                self.vector_store.iter_chunks(text), 
+                document_id=document_id, 
+                user_id=user_id
+            )
+            print(f"RAG Pipeline: Vector index created successfully ({index['chunk_count']} chunks)")
+            return index, index["reference_id"], index["chunk_count"]
+        except Exception as e:
+            print(f"RAG Pipeline Warning: Could not create vector index: {e}")
+            return None, None, sum(1 for _ in self.vector_store.iter_chunks(text))
+    
+    def create_rag_assistant(self, texts: List[str], hybrid: Optional[bool] = None):
         """
         Create RAG assistant from multiple texts
         
+        The texts are chunked and indexed for both vector and keyword retrieval,
+        so answers are grounded in the best-matching passages. The index is
+        keyed by a hash of the texts, so repeated calls upsert the same chunks;
+        compact_vector_store.py removes them after ASSISTANT_INDEX_TTL_HOURS.
+        
         Args:
             texts: List of text strings
+            hybrid: Fuse keyword and vector retrieval (defaults to HYBRID_RETRIEVAL_ENABLED)
             
         Returns:
             Query engine
         """
         try:
-            index = self.vector_store.create_index(texts)
-            query_engine = self.vector_store.create_query_engine(index)
+            # Offsets are per text, so only the chunk texts are indexed
+            chunks = (chunk["text"] for text in texts for chunk in self.vector_store.iter_chunks(text))
+            content_hash = hash_string("\0".join(texts))
+            index = self.vector_store.create_index(chunks, document_id=f"assistant_{content_hash}")
+            query_engine = self.vector_store.create_query_engine(
+                index,
+                similarity_top_k=settings.RETRIEVAL_TOP_K,
+                hybrid=hybrid
+            )
             return query_engine
         except Exception as e:
             raise Exception(f"Error creating RAG assistant: {str(e)}")
@@ -230,6 +277,10 @@ class RAGPipeline:
         """
         Query the RAG system
         
+        Retrieval is hybrid (BM25 + vector, rank-fused) when the query engine
+        was created with hybrid enabled, so exact terms like course codes or
+        function names find their passages.
+        
         Args:
             query_engine: Query engine instance
             question: Question to ask
@@ -1,136 +1,485 @@
 """
-Vector store operations using ChromaDB - Simplified Version
+Vector store operations using ChromaDB
 """
-import os
-from typing import List, Dict, Any, Optional
-import google.generativeai as genai
+import time
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Union
 import chromadb
 from config.settings import settings
+from core.chunker import chunk_text, iter_chunks
+from core.keyword_index import keyword_index
+from utils.gemini_client import gemini_client
+from utils.embedding_provider import embedding_provider
+from utils.helpers import generate_unique_id
+from utils.logger import logger
 
 class VectorStore:
     """Manage vector storage and retrieval"""
     
     def __init__(self):
         """Initialize vector store"""
-        # Configure Gemini
-        genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        self.gemini_client = gemini_client
+        # Embedding backend (settings.EMBEDDING_PROVIDER)
+        self.embedder = embedding_provider
+        # BM25 mirror of every collection, stored inside VECTOR_DB_PATH
+        self.keyword_index = keyword_index
         
         # Initialize ChromaDB client
         self.chroma_client = chromadb.PersistentClient(
             path=settings.VECTOR_DB_PATH
         )
     
-    def create_index(
-        self, 
-        texts: List[str], 
+    def get_collection_name(
+        self,
+        user_id: Optional[Any] = None,
         collection_name: str = "documents"
+    ) -> str:
+        """
+        Resolve collection name - every user gets their own collection, and
+        each embedding provider its own vector space (collection suffix)
+        
+        Args:
+            user_id: Owner of the chunks
+            collection_name: Fallback collection when no user is given
+        
+        Returns:
+            Collection name
+        """
+        name = f"user_{user_id}" if user_id else collection_name
+        return f"{name}{self.embedder.collection_suffix}"
+    
+    def get_collection(self, collection_name: str):
+        """Get or create a ChromaDB collection (cosine distance)"""
+        return self.chroma_client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+    
+    def create_index(
+        self,
+        texts: Iterable[Union[str, Dict[str, Any]]],
+        collection_name: str = "documents",
+        document_id: Optional[Any] = None,
+        user_id: Optional[Any] = None
     ) -> Dict[str, Any]:
         """
         Create vector index from texts
         
+        Chunks are consumed lazily and embedded one EMBEDDING_BATCH_SIZE batch
+        at a time, so a generator from iter_chunks never has to be materialized.
+        Chunk IDs are "<document_id>:<chunk_index>" and written by upsert, so
+        re-indexing a document replaces its chunks and drops any left over
+        past the new chunk count. The document's keyword postings are replaced
+        with one delete up front rather than one per chunk.
+        
         Args:
-            texts: List of text strings
-            collection_name: Name of the collection
-            
+            texts: Text chunks, or chunk dicts from iter_chunks (their character
+                offsets are stored as char_start/char_end metadata)
+            collection_name: Name of the collection (ignored when user_id is given)
+            document_id: Document the chunks belong to
+            user_id: Owner of the document
+        
         Returns:
             Index reference dict
         """
         try:
-            return {"status": "success", "texts": texts}
+            name = self.get_collection_name(user_id, collection_name)
+            reindexing = bool(document_id)
+            document_id = str(document_id) if document_id else generate_unique_id()
+            chunks = iter(texts)
+            count = 0
+            if reindexing:
+                self.keyword_index.delete(name, document_id=document_id)
+            
+            while True:
+                batch = list(islice(chunks, settings.EMBEDDING_BATCH_SIZE))
+                if not batch:
+                    break
+                
+                batch_texts, metadata, ids = [], [], []
+                for chunk in batch:
+                    if isinstance(chunk, str):
+                        chunk = {"text": chunk}
+                    meta = {
+                        "document_id": document_id,
+                        "user_id": str(user_id) if user_id else "",
+                        "chunk_index": count,
+                        "indexed_at": time.time()
+                    }
+                    if "start" in chunk:
+                        meta["char_start"] = chunk["start"]
+                        meta["char_end"] = chunk["end"]
+                    batch_texts.append(chunk["text"])
+                    metadata.append(meta)
+                    ids.append(f"{document_id}:{count}")
+                    count += 1
+                
+                self.add_documents(batch_texts, metadata, collection_name=name, ids=ids, replace_keywords=False)
+            
+            if reindexing:
+                self._prune_chunks(name, document_id, keep=count)
+            
+            return {
+                "status": "success",
+                "collection": name,
+                "document_id": document_id,
+                "chunk_count": count,
+                "reference_id": f"{name}:{document_id}"
+            }
         except Exception as e:
             raise Exception(f"Error creating index: {str(e)}")
     
+    def _prune_chunks(self, collection_name: str, document_id: str, keep: int):
+        """Delete a document's vectors with chunk_index >= keep (left over from a longer version)"""
+        collection = self.get_collection(collection_name)
+        existing = collection.get(where={"document_id": document_id}, include=["metadatas"])
+        stale = [
+            chunk_id for chunk_id, meta in zip(existing["ids"], existing["metadatas"])
+            if (meta or {}).get("chunk_index", 0) >= keep
+        ]
+        if stale:
+            collection.delete(ids=stale)
+    
+    def delete_document(
+        self,
+        document_id: Any,
+        user_id: Optional[Any] = None,
+        collection_name: str = "documents"
+    ) -> int:
+        """
+        Remove every chunk of a document from the vector store and keyword index
+        
+        Args:
+            document_id: Document ID
+            user_id: Owner of the document
+            collection_name: Collection when no user is given
+        
+        Returns:
+            Number of vectors removed
+        """
+        try:
+            name = self.get_collection_name(user_id, collection_name)
+            collection = self.get_collection(name)
+            ids = collection.get(where={"document_id": str(document_id)}, include=[])["ids"]
+            if ids:
+                collection.delete(ids=ids)
+            self.keyword_index.delete(name, document_id=str(document_id))
+            return len(ids)
+        except Exception as e:
+            raise Exception(f"Error deleting document vectors: {str(e)}")
+    
+    def compact(self, document_ids: Set[str], user_ids: Set[str], page_size: int = 5000) -> Dict[str, int]:
+        """
+        Remove vectors and keyword postings whose document or user no longer exists
+        
+        Collections of deleted users are dropped whole; other collections are
+        scanned page by page and their orphaned chunks deleted in bulk. In
+        collections not owned by a user (ad-hoc assistants), chunks of unknown
+        documents are orphaned once not re-indexed for ASSISTANT_INDEX_TTL_HOURS.
+        
+        Args:
+            document_ids: IDs of every existing document
+            user_ids: IDs of every existing user
+            page_size: Chunks read per page while scanning
+        
+        Returns:
+            Counts of dropped collections and removed vectors/documents
+        """
+        stats = {"collections_dropped": 0, "vectors_removed": 0, "keyword_documents_removed": 0}
+        cutoff = time.time() - settings.ASSISTANT_INDEX_TTL_HOURS * 3600
+        # Documents still indexed in collections not owned by a user
+        shared_live: Dict[str, Set[str]] = {}
+        
+        def owner(name: str) -> Optional[str]:
+            return name.split("__")[0][len("user_"):] if name.startswith("user_") else None
+        
+        for collection in self.chroma_client.list_collections():
+            user_id = owner(collection.name)
+            if user_id is not None and user_id not in user_ids:
+                stats["vectors_removed"] += collection.count()
+                self.chroma_client.delete_collection(collection.name)
+                stats["collections_dropped"] += 1
+                continue
+            
+            orphans, live = [], set()
+            offset = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                for chunk_id, meta in zip(page["ids"], page["metadatas"]):
+                    meta = meta or {}
+                    document_id = meta.get("document_id")
+                    expired = user_id is not None or meta.get("indexed_at", 0) < cutoff
+                    if document_id not in document_ids and expired:
+                        orphans.append(chunk_id)
+                    else:
+                        live.add(document_id)
+                offset += len(page["ids"])
+            
+            for start in range(0, len(orphans), page_size):
+                collection.delete(ids=orphans[start:start + page_size])
+            stats["vectors_removed"] += len(orphans)
+            if user_id is None:
+                shared_live[collection.name] = live
+        
+        for name in self.keyword_index.collections():
+            user_id = owner(name)
+            if user_id is not None and user_id not in user_ids:
+                self.keyword_index.delete(name)
+                continue
+            keep = document_ids if user_id is not None else document_ids | shared_live.get(name, set())
+            for document_id in self.keyword_index.document_ids(name):
+                if document_id not in keep:
+                    self.keyword_index.delete(name, document_id=document_id)
+                    stats["keyword_documents_removed"] += 1
+        
+        self.keyword_index.vacuum()
+        return stats
+    
     def create_query_engine(
-        self, 
-        index: Any, 
-        similarity_top_k: int = 3
+        self,
+        index: Any,
+        similarity_top_k: int = 3,
+        hybrid: Optional[bool] = None
     ):
         """
         Create query engine from index
         
         Args:
-            index: Vector store index
+            index: Index reference dict returned by create_index
             similarity_top_k: Number of similar chunks to retrieve
-            
+            hybrid: Fuse keyword and vector retrieval (defaults to HYBRID_RETRIEVAL_ENABLED)
+        
         Returns:
             Query engine
         """
         try:
-            return {"index": index, "k": similarity_top_k}
+            return {
+                "collection": index["collection"],
+                "where": {"document_id": index["document_id"]},
+                "k": similarity_top_k,
+                "hybrid": settings.HYBRID_RETRIEVAL_ENABLED if hybrid is None else hybrid
+            }
         except Exception as e:
             raise Exception(f"Error creating query engine: {str(e)}")
     
+    def similarity_search(
+        self,
+        question: str,
+        collection_name: str,
+        k: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the chunks most similar to a question
+        
+        Args:
+            question: Query text
+            collection_name: Collection to search
+            k: Number of chunks to return
+            where: Optional metadata filter (e.g. {"document_id": ...})
+        
+        Returns:
+            List of matches with id, text, metadata and similarity score
+        """
+        collection = self.get_collection(collection_name)
+        count = collection.count()
+        if count == 0:
+            return []
+        
+        query_embedding = self.embedder.embed(
+            question,
+            task_type="retrieval_query"
+        )
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(k, count),
+            where=where
+        )
+        
+        matches = []
+        for chunk_id, text, meta, distance in zip(
+            results["ids"][0],
+            results["documents"][0],
+            results["metadatas"][0],
+            results["distances"][0]
+        ):
+            matches.append({
+                "id": chunk_id,
+                "text": text,
+                "metadata": meta,
+                "score": 1.0 - distance
+            })
+        return matches
+    
+    def hybrid_search(
+        self,
+        question: str,
+        collection_name: str,
+        k: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Combine BM25 keyword and vector retrieval by reciprocal-rank fusion
+        
+        Each list contributes 1 / (HYBRID_RRF_K + rank) per chunk, so chunks
+        found by both rank first and raw scores never need calibrating. If
+        the embedding call fails, keyword matches are still returned.
+        
+        Args:
+            question: Query text
+            collection_name: Collection to search
+            k: Number of chunks to return
+            where: Optional filter (e.g. {"document_id": ...})
+        
+        Returns:
+            List of matches with id, text, metadata and fused score, best first
+        """
+        candidates = max(k, settings.HYBRID_CANDIDATES)
+        keyword_matches = self.keyword_index.search(collection_name, question, k=candidates, where=where)
+        try:
+            vector_matches = self.similarity_search(question, collection_name, k=candidates, where=where)
+        except Exception as e:
+            if not keyword_matches:
+                raise
+            logger.warning(f"Vector retrieval failed, using keyword matches only: {e}")
+            vector_matches = []
+        
+        fused: Dict[str, Dict[str, Any]] = {}
+        for matches in (vector_matches, keyword_matches):
+            for rank, match in enumerate(matches, start=1):
+                entry = fused.setdefault(match["id"], {**match, "score": 0.0})
+                entry["score"] += 1.0 / (settings.HYBRID_RRF_K + rank)
+        
+        return sorted(fused.values(), key=lambda match: match["score"], reverse=True)[:k]
+    
     def query(
-        self, 
-        query_engine, 
+        self,
+        query_engine,
         question: str
     ) -> str:
         """
-        Query the vector store
+        Query the vector store and answer from the retrieved chunks
         
         Args:
             query_engine: Query engine instance
             question: Question to ask
-            
+        
         Returns:
             Answer string
         """
         try:
-            # Use Gemini directly for now
-            response = self.model.generate_content(question)
-            return response.text
+            search = self.hybrid_search if query_engine.get("hybrid") else self.similarity_search
+            matches = search(
+                question,
+                query_engine["collection"],
+                k=query_engine.get("k", settings.RETRIEVAL_TOP_K),
+                where=query_engine.get("where")
+            )
+            context = "\n\n".join(match["text"] for match in matches)
+            
+            prompt = f"""Answer the question using only the context below.
+If the context does not contain the answer, say that you could not find it in the material.
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+ANSWER:"""
+            return self.gemini_client.generate_text(prompt, temperature=0.3)
         except Exception as e:
             raise Exception(f"Error querying: {str(e)}")
     
     def add_documents(
-        self, 
-        texts: List[str], 
-        metadata: Optional[List[Dict[str, Any]]] = None
+        self,
+        texts: List[str],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        collection_name: str = "documents",
+        ids: Optional[List[str]] = None,
+        replace_keywords: bool = True
     ) -> str:
         """
-        Add documents to vector store
+        Embed texts in batches and upsert them into the vector store and keyword index
+        
+        Chunks with an existing ID are replaced, so re-adding is idempotent.
         
         Args:
             texts: List of text strings
             metadata: Optional metadata for each text
-            
+            collection_name: Target collection
+            ids: Optional chunk IDs (generated when omitted)
+            replace_keywords: Remove existing keyword postings of these IDs first
+                (False when the caller already cleared them)
+        
         Returns:
-            Collection ID
+            Collection name
         """
         try:
-            return f"collection_{hash(str(texts[0][:100]) if texts else 'empty')}"
+            collection = self.get_collection(collection_name)
+            ids = ids or [generate_unique_id() for _ in texts]
+            batch_size = settings.EMBEDDING_BATCH_SIZE
+            
+            for start in range(0, len(texts), batch_size):
+                end = start + batch_size
+                batch = texts[start:end]
+                embeddings = self.embedder.embed_batch(batch)
+                collection.upsert(
+                    ids=ids[start:end],
+                    documents=batch,
+                    embeddings=embeddings,
+                    metadatas=metadata[start:end] if metadata else None
+                )
+                self.keyword_index.add(
+                    collection_name,
+                    ids[start:end],
+                    batch,
+                    metadata[start:end] if metadata else None,
+                    replace=replace_keywords
+                )
+            
+            return collection_name
         except Exception as e:
             raise Exception(f"Error adding documents: {str(e)}")
     
+    def iter_chunks(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily chunk text at sentence and paragraph boundaries
+        
+        Args:
+            text: Input text
+            max_tokens: Estimated tokens per chunk (defaults to CHUNK_MAX_TOKENS)
+            overlap_tokens: Estimated tokens repeated between chunks (defaults to CHUNK_OVERLAP_TOKENS)
+        
+        Returns:
+            Generator of chunk dicts (index, text, start, end, tokens)
+        """
+        return iter_chunks(text, max_tokens, overlap_tokens)
+    
     def chunk_text(
-        self, 
-        text: str, 
-        chunk_size: int = 1000, 
-        overlap: int = 200
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
     ) -> List[str]:
         """
         Chunk text into smaller pieces
         
         Args:
             text: Input text
-            chunk_size: Size of each chunk
-            overlap: Overlap between chunks
-            
+            max_tokens: Estimated tokens per chunk (defaults to CHUNK_MAX_TOKENS)
+            overlap_tokens: Estimated tokens repeated between chunks (defaults to CHUNK_OVERLAP_TOKENS)
+        
         Returns:
             List of text chunks
         """
-        chunks = []
-        start = 0
-        text_len = len(text)
-        
-        while start < text_len:
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start += (chunk_size - overlap)
-        
-        return chunks
+        return chunk_text(text, max_tokens, overlap_tokens)
 
 # Global vector store instance
 vector_store = VectorStore()
@@ -0,0 +1,319 @@
+"""
+Content-addressed cache for extracted document text
+Avoids re-parsing files, re-translating and re-fetching transcripts/articles
+on every notes, summary, quiz or content request
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session
+from config.settings import settings
+from documents.models import Document, ContentType
+from utils.helpers import hash_string, calculate_file_hash
+from utils.logger import logger
+from utils.single_flight import single_flight
+
+# Bump to invalidate every cached extraction after changing extraction logic
+EXTRACTION_VERSION = "2"
+
+class ExtractionCache:
+    """
+    Two-tier read-through cache for extracted text
+    
+    - DB tier: Document.extracted_text of the row itself (per document)
+    - Disk tier: JSON files keyed by file hash / URL (shared across users and re-uploads)
+    
+    Invalidation policy:
+    - Keys include the file content hash (or URL) and EXTRACTION_VERSION, so
+      changed files or changed extraction logic never hit stale entries
+    - URL entries expire after EXTRACTION_CACHE_URL_TTL_HOURS since the page or
+      transcript can change behind the same URL
+    - invalidate() drops both tiers for a document explicitly
+    """
+    
+    def __init__(self):
+        self.cache_dir = Path(settings.EXTRACTION_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.url_ttl = timedelta(hours=settings.EXTRACTION_CACHE_URL_TTL_HOURS)
+        self._lock = threading.Lock()
+        self.counters = {
+            "db_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "expired": 0
+        }
+    
+    def _count(self, name: str):
+        """Increment a hit/miss counter"""
+        with self._lock:
+            self.counters[name] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit/miss counters
+        
+        Returns:
+            Counters plus overall hit rate
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["db_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["db_hits"] + counters["disk_hits"]
+        counters["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return counters
+    
+    @staticmethod
+    def _is_url(document: Document) -> bool:
+        return document.content_type in [ContentType.YOUTUBE, ContentType.ARTICLE]
+    
+    def get_cache_key(self, document: Document) -> Optional[str]:
+        """
+        Build the content-addressed cache key for a document
+        
+        Args:
+            document: Document record
+        
+        Returns:
+            Cache key, or None when the source is unavailable
+        """
+        if self._is_url(document):
+            if not document.file_url:
+                return None
+            return f"url:{EXTRACTION_VERSION}:{hash_string(document.file_url.strip())}"
+        
+        if not document.file_path or not os.path.exists(document.file_path):
+            return None
+        
+        # Uploaded files are never modified in place - reuse the stored hash
+        # while size and mtime still match instead of re-hashing the file
+        meta = document.doc_metadata or {}
+        stat = os.stat(document.file_path)
+        if (
+            meta.get("extraction_key")
+            and meta.get("source_size") == stat.st_size
+            and meta.get("source_mtime") == stat.st_mtime
+            and meta["extraction_key"].startswith(f"file:{EXTRACTION_VERSION}:")
+        ):
+            return meta["extraction_key"]
+        
+        return f"file:{EXTRACTION_VERSION}:{calculate_file_hash(document.file_path)}"
+    
+    def _is_expired(self, key: str, extracted_at: Optional[str]) -> bool:
+        """URL entries expire after the TTL; file entries are content-addressed"""
+        if not key.startswith("url:"):
+            return False
+        if not extracted_at:
+            return True
+        try:
+            created = datetime.fromisoformat(extracted_at)
+        except ValueError:
+            return True
+        return datetime.now(timezone.utc) - created > self.url_ttl
+    
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{hash_string(key)}.json"
+    
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read an entry from the disk tier"""
+        path = self._disk_path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception as e:
+            logger.warning(f"Extraction cache: unreadable entry {path.name}: {e}")
+            return None
+        
+        if entry.get("key") != key:
+            return None
+        if self._is_expired(key, entry.get("extracted_at")):
+            self._count("expired")
+            path.unlink(missing_ok=True)
+            return None
+        return entry
+    
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        """Atomically write an entry to the disk tier"""
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Extraction cache: failed to write {path.name}: {e}")
+    
+    def _write_db(self, document: Document, db: Session, key: str, text: str, extracted_at: str):
+        """
+        Record the extraction key on the document row, and the text itself when
+        the DB tier is on (the key is always kept so release() and invalidate()
+        can find the disk entry)
+        """
+        store_text = settings.EXTRACTION_CACHE_DB_TIER
+        meta = dict(document.doc_metadata or {})
+        if not store_text and meta.get("extraction_key") == key:
+            return
+        
+        meta["extraction_key"] = key
+        meta["extracted_at"] = extracted_at
+        if not self._is_url(document) and document.file_path and os.path.exists(document.file_path):
+            stat = os.stat(document.file_path)
+            meta["source_size"] = stat.st_size
+            meta["source_mtime"] = stat.st_mtime
+        
+        # Without the DB tier, drop any text stored under an earlier key
+        document.extracted_text = text if store_text else None
+        document.doc_metadata = meta
+        db.commit()
+    
+    def store(
+        self,
+        document: Document,
+        db: Session,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Write extracted text to both tiers
+        
+        Args:
+            document: Document record
+            db: Database session
+            text: Extracted (English) text
+            metadata: Extraction metadata
+        """
+        key = self.get_cache_key(document)
+        if not key or not text:
+            return
+        
+        extracted_at = datetime.now(timezone.utc).isoformat()
+        self._write_disk(key, {
+            "key": key,
+            "text": text,
+            "metadata": metadata or {},
+            "extracted_at": extracted_at
+        })
+        self._write_db(document, db, key, text, extracted_at)
+        self._count("writes")
+    
+    def _extract(self, document: Document) -> Dict[str, Any]:
+        """Run the actual extraction for a document"""
+        from core.rag_pipeline import rag_pipeline
+        from documents.upload_handler import upload_handler
+        
+        if document.content_type == ContentType.YOUTUBE:
+            logger.info(f"Extracting YouTube content from {document.file_url}")
+            return rag_pipeline.process_youtube(document.file_url)
+        if document.content_type == ContentType.ARTICLE:
+            logger.info(f"Extracting web article content from {document.file_url}")
+            return rag_pipeline.process_webpage(document.file_url)
+        if document.file_path:
+            logger.info(f"Extracting file content from {document.file_path}")
+            return upload_handler.extract_content_on_demand(
+                document.file_path,
+                document.content_type.value
+            )
+        return {"success": False, "error": "No file path or URL available"}
+    
+    def get_content(self, document: Document, db: Session) -> Dict[str, Any]:
+        """
+        Get extracted content for a document, reading through the cache
+        
+        Args:
+            document: Document record
+            db: Database session
+        
+        Returns:
+            Dictionary with success flag, text, metadata and which tier served it
+        """
+        key = self.get_cache_key(document)
+        
+        if key:
+            # DB tier
+            meta = document.doc_metadata or {}
+            if (
+                settings.EXTRACTION_CACHE_DB_TIER
+                and meta.get("extraction_key") == key
+                and document.extracted_text
+                and not self._is_expired(key, meta.get("extracted_at"))
+            ):
+                self._count("db_hits")
+                logger.info(f"Extraction cache hit (db) for document {document.id}")
+                return {
+                    "success": True,
+                    "text": document.extracted_text,
+                    "metadata": {},
+                    "cache": "db"
+                }
+            
+            # Disk tier
+            entry = self._read_disk(key)
+            if entry:
+                self._count("disk_hits")
+                logger.info(f"Extraction cache hit (disk) for document {document.id}")
+                self._write_db(document, db, key, entry["text"], entry["extracted_at"])
+                return {
+                    "success": True,
+                    "text": entry["text"],
+                    "metadata": entry.get("metadata", {}),
+                    "cache": "disk"
+                }
+        
+        self._count("misses")
+        logger.info(f"Extraction cache miss for document {document.id}")
+        
+        # Requests for the same source arriving together share one extraction
+        flight_key = f"extract:{key}" if key else f"extract:document:{document.id}"
+        result = dict(single_flight.do(flight_key, lambda: self._extract(document)))
+        if result.get("success") and result.get("text"):
+            self.store(document, db, result["text"], result.get("metadata"))
+        result["cache"] = "miss"
+        return result
+    
+    def invalidate(self, document: Document, db: Optional[Session] = None):
+        """
+        Drop cached text for a document from both tiers
+        
+        Args:
+            document: Document record
+            db: Optional session - clears the DB tier when given
+        """
+        meta = dict(document.doc_metadata or {})
+        key = meta.get("extraction_key")
+        if key:
+            self._disk_path(key).unlink(missing_ok=True)
+        
+        if db is not None:
+            meta.pop("extraction_key", None)
+            meta.pop("extracted_at", None)
+            document.extracted_text = None
+            document.doc_metadata = meta
+            db.commit()
+
+    def release(self, document: Document, db: Session):
+        """
+        Drop the disk entry of a document being deleted, unless another
+        document (another user's copy of the same file or URL) still uses it
+        
+        Args:
+            document: Document record being deleted
+            db: Database session
+        """
+        key = (document.doc_metadata or {}).get("extraction_key")
+        if not key:
+            return
+        
+        shared = db.query(Document.id).filter(
+            Document.doc_metadata["extraction_key"].astext == key,
+            Document.id != document.id
+        ).first()
+        if not shared:
+            self._disk_path(key).unlink(missing_ok=True)
+
+# Global extraction cache instance
+extraction_cache = ExtractionCache()
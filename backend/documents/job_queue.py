@@ -0,0 +1,360 @@
+"""
+Durable document-processing job queue
+Jobs live in the processing_jobs table and are executed by a bounded pool of
+worker threads, each with its own database session
+"""
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Any, Optional
+from sqlalchemy import or_, func
+from sqlalchemy.orm import Session
+from config.database import SessionLocal
+from config.settings import settings
+from documents.models import Document, ProcessingJob, JobStatus, ProcessingStatus
+from utils.logger import logger
+
+# handler(db, job) runs the job; on_failure(db, job, error) runs once retries are exhausted
+JobHandler = Callable[[Session, ProcessingJob], None]
+FailureHandler = Callable[[Session, ProcessingJob, str], None]
+
+class JobQueue:
+    """
+    DB-backed job queue with a worker pool
+    
+    - Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+      workers (or several API processes) never pick up the same job
+    - Failed jobs are retried with exponential backoff and jitter up to
+      max_attempts, then handed to the job type's failure handler
+    - Running jobs are kept alive by a heartbeat that refreshes locked_at;
+      on startup, jobs whose heartbeat stopped (crashed process) and
+      documents left in PENDING/PROCESSING without a live job are re-queued
+    """
+    
+    def __init__(self):
+        self.concurrency = max(1, settings.JOB_WORKER_CONCURRENCY)
+        self.poll_interval = settings.JOB_POLL_INTERVAL_SECONDS
+        self.heartbeat_interval = settings.JOB_HEARTBEAT_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers: Dict[str, JobHandler] = {}
+        self.failure_handlers: Dict[str, FailureHandler] = {}
+        self._threads = []
+        self._running: Dict[Any, str] = {}  # job id -> locked_by, for the heartbeat
+        self._running_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+    
+    def register(self, job_type: str, handler: JobHandler, on_failure: Optional[FailureHandler] = None):
+        """
+        Register the handler for a job type
+        
+        Args:
+            job_type: Job type name
+            handler: Callable(db, job) - raise to trigger a retry
+            on_failure: Optional callable(db, job, error) run after the last attempt
+        """
+        self.handlers[job_type] = handler
+        if on_failure:
+            self.failure_handlers[job_type] = on_failure
+    
+    def enqueue(
+        self,
+        db: Session,
+        document_id,
+        job_type: str = "process_document",
+        payload: Optional[Dict[str, Any]] = None,
+        max_attempts: Optional[int] = None
+    ) -> ProcessingJob:
+        """
+        Add a job to the queue
+        
+        Args:
+            db: Database session
+            document_id: Document the job belongs to
+            job_type: Registered job type
+            payload: Optional job arguments
+            max_attempts: Override for JOB_MAX_ATTEMPTS
+        
+        Returns:
+            Created job
+        """
+        job = ProcessingJob(
+            document_id=document_id,
+            job_type=job_type,
+            payload=payload or {},
+            status=JobStatus.QUEUED,
+            attempts=0,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_after=datetime.now(timezone.utc)
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        
+        logger.info(f"Queued {job_type} job {job.id} for document {document_id}")
+        self._wake.set()
+        return job
+    
+    def claim(self, db: Session) -> Optional[ProcessingJob]:
+        """
+        Claim the next due job for this worker
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Claimed job, or None when nothing is due
+        """
+        now = datetime.now(timezone.utc)
+        job = (
+            db.query(ProcessingJob)
+            .filter(
+                ProcessingJob.status == JobStatus.QUEUED,
+                ProcessingJob.run_after <= now
+            )
+            .order_by(ProcessingJob.run_after)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            db.rollback()
+            return None
+        
+        job.status = JobStatus.RUNNING
+        job.attempts = (job.attempts or 0) + 1
+        job.locked_by = f"{self.worker_id}:{threading.current_thread().name}"
+        job.locked_at = now
+        db.commit()
+        return job
+    
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter, in seconds"""
+        delay = min(
+            settings.JOB_RETRY_MAX_SECONDS,
+            settings.JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1))
+        )
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _run(self, db: Session, job: ProcessingJob):
+        """Execute a claimed job and record the outcome"""
+        job_id = job.id
+        handler = self.handlers.get(job.job_type)
+        with self._running_lock:
+            self._running[job_id] = job.locked_by
+        try:
+            if not handler:
+                raise RuntimeError(f"No handler registered for job type '{job.job_type}'")
+            
+            handler(db, job)
+            
+            job.status = JobStatus.SUCCEEDED
+            job.last_error = None
+            job.locked_by = None
+            job.locked_at = None
+            db.commit()
+            logger.info(f"Job {job.id} ({job.job_type}) succeeded on attempt {job.attempts}")
+        
+        except Exception as e:
+            db.rollback()
+            error = str(e)
+            job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+            if not job:
+                # Document (and its jobs) deleted while running
+                return
+            
+            job.last_error = error
+            job.locked_by = None
+            job.locked_at = None
+            
+            if job.attempts >= job.max_attempts:
+                job.status = JobStatus.FAILED
+                db.commit()
+                logger.error(f"Job {job.id} ({job.job_type}) failed after {job.attempts} attempts: {error}")
+                
+                on_failure = self.failure_handlers.get(job.job_type)
+                if on_failure:
+                    try:
+                        on_failure(db, job, error)
+                    except Exception as hook_error:
+                        db.rollback()
+                        logger.error(f"Failure handler for job {job.id} raised: {hook_error}")
+            else:
+                delay = self._retry_delay(job.attempts)
+                job.status = JobStatus.QUEUED
+                job.run_after = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                db.commit()
+                logger.warning(
+                    f"Job {job.id} ({job.job_type}) attempt {job.attempts} failed: {error} - "
+                    f"retrying in {delay:.0f}s"
+                )
+        finally:
+            with self._running_lock:
+                self._running.pop(job_id, None)
+    
+    def _worker_loop(self):
+        """Claim and run jobs until stopped"""
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                job = self.claim(db)
+                if job:
+                    self._run(db, job)
+                    continue
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Job worker error: {e}")
+            finally:
+                db.close()
+            
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+    
+    def heartbeat(self) -> int:
+        """
+        Refresh locked_at of the jobs this process is running
+        
+        Only rows still RUNNING under this worker's lock are touched, so a job
+        that just finished (or was re-queued elsewhere) is never revived.
+        
+        Returns:
+            Number of jobs refreshed
+        """
+        with self._running_lock:
+            running = dict(self._running)
+        if not running:
+            return 0
+        
+        db = SessionLocal()
+        try:
+            refreshed = db.query(ProcessingJob).filter(
+                ProcessingJob.id.in_(list(running)),
+                ProcessingJob.status == JobStatus.RUNNING,
+                ProcessingJob.locked_by.in_(set(running.values()))
+            ).update({ProcessingJob.locked_at: datetime.now(timezone.utc)}, synchronize_session=False)
+            db.commit()
+            return refreshed
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Job heartbeat failed: {e}")
+            return 0
+        finally:
+            db.close()
+    
+    def _heartbeat_loop(self):
+        """Refresh running jobs' locks until stopped"""
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+    
+    def recover(self) -> Dict[str, int]:
+        """
+        Re-queue work interrupted by a crash or restart
+        
+        Returns:
+            Number of stale jobs and orphaned documents re-queued
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            stale_before = now - timedelta(seconds=settings.JOB_STALE_AFTER_SECONDS)
+            
+            stale_jobs = db.query(ProcessingJob).filter(
+                ProcessingJob.status == JobStatus.RUNNING,
+                or_(ProcessingJob.locked_at == None, ProcessingJob.locked_at < stale_before)
+            ).all()
+            for job in stale_jobs:
+                job.status = JobStatus.QUEUED
+                job.run_after = now
+                job.locked_by = None
+                job.locked_at = None
+                job.last_error = "Re-queued after worker crash or restart"
+            db.commit()
+            
+            # Documents that never got a job (or lost it) but are not finished
+            live_jobs = db.query(ProcessingJob.document_id).filter(
+                ProcessingJob.job_type == "process_document",
+                ProcessingJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+            )
+            orphaned = db.query(Document.id).filter(
+                Document.processing_status.in_([ProcessingStatus.PENDING, ProcessingStatus.PROCESSING]),
+                ~Document.id.in_(live_jobs)
+            ).all()
+            for (document_id,) in orphaned:
+                db.add(ProcessingJob(
+                    document_id=document_id,
+                    job_type="process_document",
+                    payload={},
+                    status=JobStatus.QUEUED,
+                    attempts=0,
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                    run_after=now
+                ))
+            db.commit()
+            
+            if stale_jobs or orphaned:
+                logger.info(
+                    f"Job queue recovery: re-queued {len(stale_jobs)} stale jobs and "
+                    f"{len(orphaned)} unprocessed documents"
+                )
+            return {"stale_jobs": len(stale_jobs), "orphaned_documents": len(orphaned)}
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Job queue recovery failed: {e}")
+            return {"stale_jobs": 0, "orphaned_documents": 0}
+        finally:
+            db.close()
+    
+    def start(self):
+        """Recover interrupted work and start the worker threads"""
+        if self._threads:
+            return
+        
+        self._stop.clear()
+        self.recover()
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"job-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        
+        thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logger.info(f"Job queue started with {self.concurrency} workers")
+    
+    def stop(self, timeout: float = 10.0):
+        """
+        Stop the worker threads
+        
+        Jobs still running when the timeout expires are picked up again by
+        recover() on the next start.
+        
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Job queue stopped")
+    
+    def stats(self, db: Session) -> Dict[str, int]:
+        """
+        Count jobs by status
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Job count per status
+        """
+        rows = db.query(ProcessingJob.status, func.count(ProcessingJob.id)).group_by(ProcessingJob.status).all()
+        return {status.value: count for status, count in rows}
+
+# Global job queue instance
+job_queue = JobQueue()
@@ -4,7 +4,7 @@ Document model for file uploads and content management
 from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum as SQLEnum, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import uuid
 import enum
 from config.database import Base
@@ -25,6 +25,12 @@ class ProcessingStatus(str, enum.Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
 class Document(Base):
     __tablename__ = "documents"
     
@@ -40,7 +46,7 @@ class Document(Base):
     processing_status = Column(SQLEnum(ProcessingStatus), default=ProcessingStatus.PENDING)
     vector_db_reference_id = Column(String(255))
     doc_metadata = Column(JSONB)  # Renamed from metadata to avoid SQLAlchemy conflict
-    extracted_text = Column(Text)  # Store extracted content
+    extracted_text = deferred(Column(Text))  # Extraction cache DB tier (loaded only when accessed)
     
     # Topic and domain tracking for career recommendations
     topics = Column(JSONB)  # List of extracted topics/subjects
@@ -53,3 +59,24 @@ class Document(Base):
     
     def __repr__(self):
         return f"<Document {self.title} - {self.content_type}>"
+
+class ProcessingJob(Base):
+    """Durable background job (document processing and other per-document work)"""
+    __tablename__ = "processing_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_type = Column(String(50), nullable=False, default="process_document")
+    payload = Column(JSONB)
+    status = Column(SQLEnum(JobStatus), nullable=False, default=JobStatus.QUEUED, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    locked_by = Column(String(255))
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<ProcessingJob {self.job_type} - {self.status}>"
@@ -1,126 +1,156 @@
 """
 Document API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import validators
 from config.database import get_db
-from documents.models import Document, ContentType, ProcessingStatus
+from documents.models import Document, ContentType, ProcessingStatus, ProcessingJob
 from documents.schemas import (
     URLUpload, DocumentResponse, DocumentListResponse
 )
 from documents.validators import DocumentValidator
 from documents.upload_handler import upload_handler
+from documents.extraction_cache import extraction_cache
+from documents.job_queue import job_queue
 from users.auth import get_current_user
 from users.models import User
 from core.rag_pipeline import rag_pipeline
+from core.vector_store import vector_store
 from documents.topic_extractor import topic_extractor
+from quizzes.question_bank import question_bank
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
 def process_document_background(document_id: str, db: Session):
     """
-    Background task to process document - Enhanced with topic extraction
+    Process a document - Enhanced with topic extraction
     For URLs (YouTube/Article): Skip extraction, mark as completed immediately
     For Files: Extract topics, index to vector store
     
+    Runs in a job queue worker with its own session. Raises when content
+    extraction fails so the job is retried with backoff.
+    
     Args:
         document_id: Document ID
         db: Database session
     """
-    try:
-        from utils.logger import logger
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if not doc:
-            return
-        
-        # For URLs (YouTube and Articles), skip processing at upload time
-        # Content will be extracted on-demand when generating summaries/notes/quizzes
-        if doc.content_type in [ContentType.YOUTUBE, ContentType.ARTICLE]:
-            logger.info(f"URL document {document_id} - skipping content extraction at upload")
-            doc.processing_status = ProcessingStatus.COMPLETED
-            doc.doc_metadata = {
-                "type": "url",
-                "extraction": "on-demand",
-                "note": "Content will be extracted when needed for summaries/notes/quizzes"
-            }
-            db.commit()
-            return
-        
-        # For file uploads, update status to processing
-        doc.processing_status = ProcessingStatus.PROCESSING
-        db.commit()
-        
-        # Extract content for topic analysis
-        extracted_text = ""
-        try:
-            result = rag_pipeline.process_document(doc.file_path)
-            
-            if result.get("success"):
-                # Store vector DB reference
-                doc.vector_db_reference_id = result.get("doc_id")
-                extracted_text = result.get("text", "")
-                
-                # Extract topics and domains using AI
-                logger.info(f"Extracting topics for document {document_id}")
-                topic_data = topic_extractor.extract_topics_and_domains(
-                    extracted_text,
-                    doc.original_filename
-                )
-                
-                # Store topic data in document
-                doc.topics = topic_data.get('topics', [])
-                doc.domains = topic_data.get('domains', [])
-                doc.keywords = topic_data.get('keywords', [])
-                doc.subject_area = topic_data.get('subject_area', 'General')
-                doc.difficulty_level = topic_data.get('difficulty_level', 'intermediate')
-                
-                # Store comprehensive metadata
-                doc.doc_metadata = {
-                    "indexed": True,
-                    "chunk_count": result.get("chunk_count", 0),
-                    "indexed_at": str(doc.upload_date),
-                    "technical_skills": topic_data.get('technical_skills', []),
-                    "concepts": topic_data.get('concepts', []),
-                    "technologies": topic_data.get('technologies', []),
-                    "programming_languages": topic_data.get('programming_languages', []),
-                    "extraction_confidence": topic_data.get('extraction_confidence', 'medium'),
-                    "extraction_method": topic_data.get('extraction_method', 'ai')
-                }
-                
-                doc.processing_status = ProcessingStatus.COMPLETED
-                logger.info(f"Document {document_id} processed successfully with topics: {doc.topics[:3]}")
-            else:
-                # If extraction fails, mark as completed but without topics
-                doc.processing_status = ProcessingStatus.COMPLETED
-                doc.doc_metadata = {
-                    "indexed": False,
-                    "note": "File uploaded successfully, content extraction failed"
-                }
-                logger.warning(f"Document {document_id} extraction failed: {result.get('error')}")
-        except Exception as extract_error:
-            logger.error(f"Topic extraction failed for {document_id}: {extract_error}")
-            # Still mark as completed - file is uploaded
-            doc.processing_status = ProcessingStatus.COMPLETED
-            doc.doc_metadata = {
-                "indexed": False,
-                "note": "File uploaded successfully, topic extraction failed"
-            }
-        
+    from utils.logger import logger
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if not doc:
+        return
+    
+    # For URLs (YouTube and Articles), skip processing at upload time
+    # Content will be extracted on-demand when generating summaries/notes/quizzes
+    if doc.content_type in [ContentType.YOUTUBE, ContentType.ARTICLE]:
+        logger.info(f"URL document {document_id} - skipping content extraction at upload")
+        doc.processing_status = ProcessingStatus.COMPLETED
+        doc.doc_metadata = {
+            "type": "url",
+            "extraction": "on-demand",
+            "note": "Content will be extracted when needed for summaries/notes/quizzes"
+        }
         db.commit()
-        
+        schedule_question_bank(db, doc)
+        return
+    
+    # For file uploads, update status to processing
+    doc.processing_status = ProcessingStatus.PROCESSING
+    db.commit()
+    
+    # Extract content for topic analysis
+    result = rag_pipeline.process_document(
+        doc.file_path,
+        document_id=str(doc.id),
+        user_id=str(doc.user_id)
+    )
+    if not result.get("success"):
+        raise RuntimeError(f"Content extraction failed: {result.get('error')}")
+    
+    # Store vector DB reference
+    doc.vector_db_reference_id = result.get("doc_id")
+    extracted_text = result.get("text", "")
+    
+    # Warm the extraction cache so the first notes/summary/quiz request is a hit
+    extraction_cache.store(doc, db, extracted_text, result.get("metadata"))
+    
+    # Extract topics and domains using AI (content is indexed either way)
+    topic_data = {}
+    try:
+        logger.info(f"Extracting topics for document {document_id}")
+        topic_data = topic_extractor.extract_topics_and_domains(
+            extracted_text,
+            doc.original_filename
+        )
+    except Exception as extract_error:
+        logger.error(f"Topic extraction failed for {document_id}: {extract_error}")
+    
+    # Store topic data in document
+    doc.topics = topic_data.get('topics', [])
+    doc.domains = topic_data.get('domains', [])
+    doc.keywords = topic_data.get('keywords', [])
+    doc.subject_area = topic_data.get('subject_area', 'General')
+    doc.difficulty_level = topic_data.get('difficulty_level', 'intermediate')
+    
+    # Store comprehensive metadata (keeping the extraction cache fields)
+    doc.doc_metadata = {
+        **(doc.doc_metadata or {}),
+        "indexed": True,
+        "chunk_count": result.get("chunk_count", 0),
+        "indexed_at": str(doc.upload_date),
+        "technical_skills": topic_data.get('technical_skills', []),
+        "concepts": topic_data.get('concepts', []),
+        "technologies": topic_data.get('technologies', []),
+        "programming_languages": topic_data.get('programming_languages', []),
+        "extraction_confidence": topic_data.get('extraction_confidence', 'medium'),
+        "extraction_method": topic_data.get('extraction_method', 'ai' if topic_data else 'failed')
+    }
+    
+    doc.processing_status = ProcessingStatus.COMPLETED
+    db.commit()
+    logger.info(f"Document {document_id} processed successfully with topics: {doc.topics[:3]}")
+    schedule_question_bank(db, doc)
+
+def schedule_question_bank(db: Session, doc: Document):
+    """Queue question bank generation so the first quiz is served without an LLM call"""
+    from utils.logger import logger
+    try:
+        question_bank.prefill(db, doc.id)
     except Exception as e:
-        from utils.logger import logger
-        logger.error(f"Error processing document {document_id}: {e}")
-        if doc:
-            doc.processing_status = ProcessingStatus.FAILED
-            doc.doc_metadata = {"error": str(e)}
-            db.commit()
+        db.rollback()
+        logger.error(f"Could not queue question bank for document {doc.id}: {e}")
+
+def process_document_job(db: Session, job: ProcessingJob):
+    """Job queue handler for process_document jobs"""
+    process_document_background(str(job.document_id), db)
+
+def mark_document_processing_failed(db: Session, job: ProcessingJob, error: str):
+    """
+    Called once a process_document job has used all its attempts
+    The file is kept - content can still be extracted on demand
+    """
+    doc = db.query(Document).filter(Document.id == job.document_id).first()
+    if not doc:
+        return
+    
+    doc.processing_status = ProcessingStatus.COMPLETED
+    doc.doc_metadata = {
+        **(doc.doc_metadata or {}),
+        "indexed": False,
+        "note": "File uploaded successfully, content extraction failed",
+        "error": error
+    }
+    db.commit()
+
+job_queue.register(
+    "process_document",
+    process_document_job,
+    on_failure=mark_document_processing_failed
+)
 
 @router.post("/upload/file", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -129,7 +159,6 @@ async def upload_file(
     Upload a document file
     
     Args:
-        background_tasks: Background tasks
         file: Uploaded file
         current_user: Current authenticated user
         db: Database session
@@ -169,8 +198,8 @@ async def upload_file(
         
         logger.info(f"Document record created with ID: {new_document.id}")
         
-        # Process in background
-        background_tasks.add_task(process_document_background, str(new_document.id), db)
+        # Queue for processing by the job workers
+        job_queue.enqueue(db, new_document.id)
         
         return DocumentResponse.from_orm(new_document)
         
@@ -187,7 +216,6 @@ async def upload_file(
 
 @router.post("/upload/youtube", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_youtube(
-    background_tasks: BackgroundTasks,
     url_data: URLUpload,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -196,7 +224,6 @@ async def upload_youtube(
     Upload YouTube video URL
     
     Args:
-        background_tasks: Background tasks
         url_data: YouTube URL data
         current_user: Current authenticated user
         db: Database session
@@ -226,14 +253,13 @@ async def upload_youtube(
     db.commit()
     db.refresh(new_document)
     
-    # Process in background
-    background_tasks.add_task(process_document_background, str(new_document.id), db)
+    # Queue for processing by the job workers
+    job_queue.enqueue(db, new_document.id)
     
     return DocumentResponse.from_orm(new_document)
 
 @router.post("/upload/web", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_web_article(
-    background_tasks: BackgroundTasks,
     url_data: URLUpload,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -242,7 +268,6 @@ async def upload_web_article(
     Upload web article URL
     
     Args:
-        background_tasks: Background tasks
         url_data: Web article URL data
         current_user: Current authenticated user
         db: Database session
@@ -272,8 +297,8 @@ async def upload_web_article(
     db.commit()
     db.refresh(new_document)
     
-    # Process in background
-    background_tasks.add_task(process_document_background, str(new_document.id), db)
+    # Queue for processing by the job workers
+    job_queue.enqueue(db, new_document.id)
     
     return DocumentResponse.from_orm(new_document)
 
@@ -371,10 +396,21 @@ def delete_document(
     if doc.file_path:
         upload_handler.delete_file(doc.file_path)
     
-    # Delete from database
+    # Drop the cached extraction unless another document shares it
+    extraction_cache.release(doc, db)
+    
+    # Delete from database (notes, summaries, question bank and jobs cascade)
+    doc_id, owner_id = doc.id, doc.user_id
     db.delete(doc)
     db.commit()
     
+    # Remove vectors and keyword postings; leftovers are cleaned by compact_vector_store.py
+    try:
+        vector_store.delete_document(doc_id, user_id=owner_id)
+    except Exception as e:
+        from utils.logger import logger
+        logger.error(f"Could not delete vectors of document {doc_id}: {e}")
+    
     return {"message": "Document deleted successfully"}
 
 @router.get("/{document_id}/content")
@@ -410,31 +446,24 @@ def get_document_content(
             detail="Document not found"
         )
     
-    # Extract content based on type
+    if not doc.file_url and not doc.file_path:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No file path or URL available"
+        )
+    
+    # Extract content (served from the extraction cache when possible)
     try:
-        if doc.content_type == ContentType.YOUTUBE:
-            result = rag_pipeline.process_youtube(doc.file_url)
-        elif doc.content_type == ContentType.ARTICLE:
-            result = rag_pipeline.process_webpage(doc.file_url)
-        elif doc.file_path:
-            result = upload_handler.extract_content_on_demand(
-                doc.file_path, 
-                doc.content_type.value
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No file path or URL available"
-            )
+        result = extraction_cache.get_content(doc, db)
         
         if result.get("success"):
-            logger.info(f"Content extracted on-demand for document {document_id}")
+            logger.info(f"Content extracted on-demand for document {document_id} (cache: {result.get('cache')})")
             return {
                 "document_id": str(doc.id),
                 "title": doc.title,
                 "content": result.get("text", ""),
                 "metadata": result.get("metadata", {}),
-                "extracted_at": str(doc.upload_date)
+                "extracted_at": (doc.doc_metadata or {}).get("extracted_at", str(doc.upload_date))
             }
         else:
             raise HTTPException(
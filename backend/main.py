@@ -7,6 +7,9 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from config.settings import settings
 from config.database import init_db
+from documents.job_queue import job_queue
+from progress.counters import progress_reconciler
+from progress.activity_sink import activity_sink
 from users.views import router as users_router
 from documents.views import router as documents_router
 from notes.views import router as notes_router
@@ -93,6 +96,17 @@ async def startup_event():
         Path(directory).mkdir(parents=True, exist_ok=True)
     logger.info("[OK] Upload directories created")
     
+    # Start document processing workers
+    if settings.JOB_WORKERS_ENABLED:
+        job_queue.start()
+        logger.info("[OK] Job queue workers started")
+    
+    # Start progress counter reconciliation
+    progress_reconciler.start()
+    
+    # Start buffered activity logging
+    activity_sink.start()
+    
     logger.info(f"[OK] Server started on {settings.HOST}:{settings.PORT}")
     logger.info(f"[INFO] API Documentation: http://{settings.HOST}:{settings.PORT}/docs")
     logger.info("=" * 50)
@@ -101,6 +115,9 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down SLCA Backend Server...")
+    job_queue.stop()
+    progress_reconciler.stop()
+    activity_sink.stop()
     logger.info("[OK] Cleanup completed")
 
 @app.get("/")
@@ -17,11 +17,11 @@ sys.path.insert(0, str(backend_dir))
 
 from config.database import Base, engine, init_db
 from users.models import User
-from documents.models import Document
+from documents.models import Document, ProcessingJob
 from notes.models import Note
 from summarizer.models import Summary
-from quizzes.models import Quiz, QuizQuestion, QuizAttempt
-from progress.models import UserProgress, ActivityLog
+from quizzes.models import Quiz, QuizQuestion, QuizAttempt, QuestionBankItem
+from progress.models import UserProgress, ActivityLog, UserDailyActivity
 from career.models import Resume, ResumeAnalysis, CareerRecommendation
 from utils.logger import logger
 
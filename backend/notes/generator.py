@@ -1,7 +1,9 @@
 """
 Notes generator using Gemini AI - BEST NOTES GENERATOR
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, AsyncIterator
+from config.settings import settings
+from core.context_builder import context_builder
 from utils.gemini_client import gemini_client
 from utils.logger import logger
 
@@ -10,26 +12,36 @@ class NotesGenerator:
     
     def __init__(self):
         self.gemini_client = gemini_client
+        self.context_builder = context_builder
     
-    def generate_notes(
+    def build_prompt(
         self, 
         content: str, 
         title: str,
         note_type: str = "structured",
-        additional_context: Optional[str] = None
+        additional_context: Optional[str] = None,
+        focus_terms: Optional[List[str]] = None
     ) -> str:
         """
-        Generate comprehensive notes from document content
+        Build the notes prompt for document content
         
         Args:
             content: Full document content
             title: Title for the notes
             note_type: Type of notes (structured, bullet, detailed)
             additional_context: Additional user-provided context
+            focus_terms: Document topics/keywords used to pick relevant content
             
         Returns:
-            Generated notes in markdown format
+            Prompt text
         """
+        # Keep the prompt within budget by selecting the most relevant content
+        content = self.context_builder.build_context(
+            content,
+            settings.NOTES_CONTEXT_TOKENS,
+            focus_terms=(focus_terms or []) + [title, additional_context or ""]
+        )
+        
         # Build context-aware prompt
         context_section = ""
         if additional_context:
@@ -118,28 +130,104 @@ class NotesGenerator:
             """
         }
         
-        prompt = prompts.get(note_type, prompts["structured"])
+        return prompts.get(note_type, prompts["structured"])
+    
+    def generate_notes(
+        self, 
+        content: str, 
+        title: str,
+        note_type: str = "structured",
+        additional_context: Optional[str] = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> str:
+        """
+        Generate comprehensive notes from document content
+        
+        Args:
+            content: Full document content
+            title: Title for the notes
+            note_type: Type of notes (structured, bullet, detailed)
+            additional_context: Additional user-provided context
+            focus_terms: Document topics/keywords used to pick relevant content
+            
+        Returns:
+            Generated notes in markdown format
+        """
+        prompt = self.build_prompt(content, title, note_type, additional_context, focus_terms)
         
         try:
             logger.info(f"Starting AI note generation for: {title} (type: {note_type})")
-            logger.info(f"Content length: {len(content)} characters")
+            logger.info(f"Prompt length: {len(prompt)} characters")
             
             # Generate notes using Gemini
             logger.info("Calling Gemini API to generate notes...")
             notes_content = self.gemini_client.generate_text(prompt, temperature=0.3)
             
-            logger.info(f"Gemini API returned {len(notes_content)} characters")
+            return self.check_notes(notes_content)
+            
+        except Exception as e:
+            logger.error(f"Note generation failed: {str(e)}")
+            raise Exception(f"Failed to generate notes: {str(e)}")
+    
+    async def generate_notes_async(
+        self, 
+        content: str, 
+        title: str,
+        note_type: str = "structured",
+        additional_context: Optional[str] = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> str:
+        """
+        Generate notes without blocking the event loop (same arguments as generate_notes)
+        
+        Returns:
+            Generated notes in markdown format
+        """
+        prompt = self.build_prompt(content, title, note_type, additional_context, focus_terms)
+        
+        try:
+            logger.info(f"Starting AI note generation for: {title} (type: {note_type})")
+            logger.info(f"Prompt length: {len(prompt)} characters")
             
-            # Ensure quality and structure
-            if not notes_content or len(notes_content) < 100:
-                raise ValueError("Generated notes are too short or empty")
+            logger.info("Calling Gemini API to generate notes...")
+            notes_content = await self.gemini_client.generate_text_async(prompt, temperature=0.3)
             
-            logger.info("Note generation completed successfully")
-            return notes_content
+            return self.check_notes(notes_content)
             
         except Exception as e:
             logger.error(f"Note generation failed: {str(e)}")
             raise Exception(f"Failed to generate notes: {str(e)}")
+    
+    async def stream_notes(
+        self, 
+        content: str, 
+        title: str,
+        note_type: str = "structured",
+        additional_context: Optional[str] = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream notes as Gemini generates them (same arguments as generate_notes)
+        
+        Yields:
+            Markdown chunks in order
+        """
+        prompt = self.build_prompt(content, title, note_type, additional_context, focus_terms)
+        logger.info(f"Streaming AI note generation for: {title} (type: {note_type})")
+        
+        async for chunk in self.gemini_client.stream_text_async(prompt, temperature=0.3):
+            yield chunk
+    
+    def check_notes(self, notes_content: str) -> str:
+        """Ensure generated notes are usable"""
+        logger.info(f"Gemini API returned {len(notes_content)} characters")
+        
+        # Ensure quality and structure
+        if not notes_content or len(notes_content) < 100:
+            raise ValueError("Generated notes are too short or empty")
+        
+        logger.info("Note generation completed successfully")
+        return notes_content
 
 # Global instance
 notes_generator = NotesGenerator()
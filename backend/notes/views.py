@@ -2,26 +2,77 @@
 Notes API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
-from config.database import get_db
+from config.database import get_db, save_in_new_session
 from notes.models import Note
 from notes.schemas import NoteCreate, NoteResponse
 from documents.models import Document, ProcessingStatus
-from documents.upload_handler import upload_handler
+from documents.extraction_cache import extraction_cache
 from users.auth import get_current_user
 from users.models import User
 from notes.generator import notes_generator
-from core.rag_pipeline import rag_pipeline
 from docx import Document as DocxDocument
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import io
 import re
+from utils.helpers import format_sse
 from utils.logger import logger
 
 router = APIRouter(prefix="/api/notes", tags=["notes"])
 
+async def _load_document_content(document_id, current_user: User, db: Session):
+    """
+    Get the user's document and its extracted content
+    
+    Args:
+        document_id: Document ID
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        Tuple of (document, content)
+    """
+    # Check if document exists and belongs to user
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    logger.info(f"Generating notes for document {document.id} by user {current_user.email}")
+    
+    # Extract content on-demand (served from the extraction cache when possible)
+    # Extraction can parse files or fetch URLs, so run it off the event loop
+    content = None
+    try:
+        result = await run_in_threadpool(extraction_cache.get_content, document, db)
+        if result.get("success"):
+            content = result.get("text")
+    except Exception as extract_error:
+        logger.error(f"Content extraction error: {extract_error}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to extract document content: {str(extract_error)}"
+        )
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not extract content from document. Please ensure the document is accessible."
+        )
+    
+    logger.info(f"Content extracted successfully, length: {len(content)} characters")
+    
+    return document, content
+
 @router.post("/generate", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 async def generate_notes(
     note_data: NoteCreate,
@@ -41,63 +92,16 @@ async def generate_notes(
         Generated notes
     """
     try:
-        # Check if document exists and belongs to user
-        document = db.query(Document).filter(
-            Document.id == note_data.document_id,
-            Document.user_id == current_user.id
-        ).first()
-        
-        if not document:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Document not found"
-            )
-        
-        logger.info(f"Generating notes for document {document.id} by user {current_user.email}")
-        
-        # Extract content on-demand based on document type
-        content = None
-        try:
-            if document.content_type.value == "youtube":
-                logger.info(f"Extracting YouTube content from {document.file_url}")
-                result = rag_pipeline.process_youtube(document.file_url)
-                if result.get("success"):
-                    content = result.get("text")
-            elif document.content_type.value == "article":
-                logger.info(f"Extracting web article content from {document.file_url}")
-                result = rag_pipeline.process_webpage(document.file_url)
-                if result.get("success"):
-                    content = result.get("text")
-            elif document.file_path:
-                logger.info(f"Extracting file content from {document.file_path}")
-                result = upload_handler.extract_content_on_demand(
-                    document.file_path, 
-                    document.content_type.value
-                )
-                if result.get("success"):
-                    content = result.get("text")
-        except Exception as extract_error:
-            logger.error(f"Content extraction error: {extract_error}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to extract document content: {str(extract_error)}"
-            )
-        
-        if not content:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Could not extract content from document. Please ensure the document is accessible."
-            )
-        
-        logger.info(f"Content extracted successfully, length: {len(content)} characters")
+        document, content = await _load_document_content(note_data.document_id, current_user, db)
         
         # Generate notes using Gemini AI
         try:
-            notes_content = notes_generator.generate_notes(
+            notes_content = await notes_generator.generate_notes_async(
                 content=content,
                 title=note_data.title,
                 note_type=note_data.note_type,
-                additional_context=note_data.additional_context
+                additional_context=note_data.additional_context,
+                focus_terms=(document.topics or []) + (document.keywords or [])
             )
             logger.info(f"Notes generated successfully, length: {len(notes_content)} characters")
         except Exception as gen_error:
@@ -134,6 +138,66 @@ async def generate_notes(
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+@router.post("/generate/stream")
+async def generate_notes_stream(
+    note_data: NoteCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate notes and stream them as Server-Sent Events
+    
+    Events: "chunk" ({"text": ...}) as Gemini produces text, then "done" with
+    the saved note, or "error" ({"detail": ...}) if generation fails.
+    
+    Args:
+        note_data: Note creation data
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        text/event-stream response
+    """
+    document, content = await _load_document_content(note_data.document_id, current_user, db)
+    focus_terms = (document.topics or []) + (document.keywords or [])
+    user_id = current_user.id
+    
+    async def event_stream():
+        parts = []
+        try:
+            async for chunk in notes_generator.stream_notes(
+                content=content,
+                title=note_data.title,
+                note_type=note_data.note_type,
+                additional_context=note_data.additional_context,
+                focus_terms=focus_terms
+            ):
+                parts.append(chunk)
+                yield format_sse("chunk", {"text": chunk})
+            
+            notes_content = notes_generator.check_notes("".join(parts))
+            
+            # The request session is closed once streaming starts - save with a new one
+            new_note = await run_in_threadpool(save_in_new_session, Note(
+                user_id=user_id,
+                document_id=note_data.document_id,
+                title=note_data.title,
+                note_type=note_data.note_type,
+                content=notes_content,
+                tags=note_data.tags
+            ))
+            logger.info(f"Streamed notes saved successfully with ID: {new_note.id}")
+            yield format_sse("done", NoteResponse.from_orm(new_note).model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"Streaming note generation failed: {e}")
+            yield format_sse("error", {"detail": f"Failed to generate notes: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/", response_model=list[NoteResponse])
 def get_all_notes(
     current_user: User = Depends(get_current_user),
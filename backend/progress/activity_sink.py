@@ -0,0 +1,170 @@
+"""
+Write-behind activity logging
+Activity events are queued in memory and written in bulk by a background
+flusher, so user actions do not pay for an extra commit per event
+"""
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+from config.database import SessionLocal
+from config.settings import settings
+from progress.analytics import progress_analytics
+from progress.models import ActivityType
+from utils.logger import logger
+
+class ActivitySink:
+    """
+    Buffered sink for activity events
+    
+    - Buffered mode: submit() only appends to the queue; the flusher thread
+      writes a batch when ACTIVITY_FLUSH_BATCH_SIZE events are waiting or
+      every ACTIVITY_FLUSH_INTERVAL_SECONDS, and once more on shutdown
+    - Synchronous mode (ACTIVITY_LOG_BUFFERED off, or before start()): the
+      event is written and committed through the caller's session, which
+      keeps tests and scripts deterministic
+    """
+    
+    def __init__(self, buffered: Optional[bool] = None):
+        self.buffered = settings.ACTIVITY_LOG_BUFFERED if buffered is None else buffered
+        self.batch_size = max(1, settings.ACTIVITY_FLUSH_BATCH_SIZE)
+        self.interval = settings.ACTIVITY_FLUSH_INTERVAL_SECONDS
+        self.max_pending = settings.ACTIVITY_MAX_PENDING
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {"submitted": 0, "written": 0, "flushes": 0, "dropped": 0}
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+    
+    def submit(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        activity_type: ActivityType,
+        details: Dict[str, Any]
+    ):
+        """
+        Record an activity event
+        
+        Args:
+            db: Caller's database session (used only in synchronous mode)
+            user_id: User ID
+            activity_type: Activity type
+            details: Activity details
+        """
+        event = {
+            'user_id': user_id,
+            'activity_type': activity_type,
+            'activity_details': details,
+            'timestamp': datetime.now(timezone.utc)
+        }
+        
+        if not (self.buffered and self.running):
+            progress_analytics.write_activities(db, [event])
+            with self._lock:
+                self.counters["submitted"] += 1
+                self.counters["written"] += 1
+            return
+        
+        with self._lock:
+            self._queue.append(event)
+            self.counters["submitted"] += 1
+            pending = len(self._queue)
+        if pending >= self.batch_size:
+            self._wake.set()
+    
+    def flush(self) -> int:
+        """
+        Write every queued event now
+        
+        Returns:
+            Number of events written
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return written
+                
+                db = SessionLocal()
+                try:
+                    progress_analytics.write_activities(db, batch)
+                    written += len(batch)
+                    with self._lock:
+                        self.counters["written"] += len(batch)
+                        self.counters["flushes"] += 1
+                except Exception as e:
+                    db.rollback()
+                    self._requeue(batch)
+                    logger.error(f"Activity flush of {len(batch)} events failed: {e}")
+                    return written
+                finally:
+                    db.close()
+    
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed batch back at the front, dropping the oldest events over ACTIVITY_MAX_PENDING"""
+        with self._lock:
+            self._queue.extendleft(reversed(batch))
+            overflow = len(self._queue) - self.max_pending
+            for _ in range(max(0, overflow)):
+                self._queue.popleft()
+            if overflow > 0:
+                self.counters["dropped"] += overflow
+                logger.error(f"Activity queue full: dropped {overflow} events")
+    
+    def _flush_loop(self):
+        """Flush on the size threshold or the interval until stopped"""
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+    
+    def start(self):
+        """Start the background flusher (no-op in synchronous mode)"""
+        if not self.buffered or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="activity-flusher", daemon=True)
+        self._thread.start()
+        logger.info("Activity sink started")
+    
+    def stop(self, timeout: float = 10.0):
+        """
+        Stop the flusher and write whatever is still queued
+        
+        Args:
+            timeout: Seconds to wait for the flusher thread
+        """
+        if self._thread:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        written = self.flush()
+        if written:
+            logger.info(f"Activity sink flushed {written} events on shutdown")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get sink counters
+        
+        Returns:
+            Submitted, written, dropped and pending event counts
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            counters["pending"] = len(self._queue)
+        return counters
+
+# Global activity sink instance
+activity_sink = ActivitySink()
@@ -2,22 +2,49 @@
 Progress analytics service
 """
 from typing import Dict, List, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from progress.models import UserProgress, ActivityLog, ActivityType
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from progress.models import UserProgress, ActivityLog, ActivityType, UserDailyActivity
 from documents.models import Document
 from notes.models import Note
 from summarizer.models import Summary
 from quizzes.models import Quiz, QuizAttempt
 import uuid
 
+# user_daily_activity column counting each activity type
+DAILY_COUNT_COLUMNS = {
+    ActivityType.UPLOAD: "upload_count",
+    ActivityType.NOTE: "note_count",
+    ActivityType.SUMMARY: "summary_count",
+    ActivityType.QUIZ: "quiz_count",
+    ActivityType.QUIZ_ATTEMPT: "quiz_attempt_count",
+    ActivityType.RESUME_UPLOADED: "resume_uploaded_count",
+    ActivityType.RESUME_ANALYZED: "resume_analyzed_count",
+}
+
+# Rollup days fetched per query while walking back a study streak
+STREAK_PAGE_DAYS = 32
+
+# Estimated study minutes per activity (5 minutes per quiz)
+STUDY_MINUTES = {
+    ActivityType.QUIZ: 5,
+    ActivityType.QUIZ_ATTEMPT: 5,
+}
+
 class ProgressAnalytics:
     """Analytics service for progress tracking"""
     
     @staticmethod
     def get_or_create_progress(db: Session, user_id: uuid.UUID) -> UserProgress:
-        """Get or create user progress record"""
+        """
+        Get or create user progress record
+        
+        Counters are kept current by progress.counters as content is created
+        and deleted, so this is a single-row read. A missing record is
+        counted from scratch once.
+        """
         progress = db.query(UserProgress).filter(
             UserProgress.user_id == user_id
         ).first()
@@ -25,15 +52,16 @@ class ProgressAnalytics:
         if not progress:
             progress = UserProgress(user_id=user_id)
             db.add(progress)
+            ProgressAnalytics._recount(db, progress)
             db.commit()
             db.refresh(progress)
         
         return progress
     
     @staticmethod
-    def update_progress(db: Session, user_id: uuid.UUID):
-        """Update user progress statistics"""
-        progress = ProgressAnalytics.get_or_create_progress(db, user_id)
+    def _recount(db: Session, progress: UserProgress):
+        """Recompute every counter for a progress record from the source tables"""
+        user_id = progress.user_id
         
         # Count documents
         total_docs = db.query(func.count(Document.id)).filter(
@@ -55,15 +83,14 @@ class ProgressAnalytics:
             Quiz.user_id == user_id
         ).scalar()
         
-        # Count quiz attempts
-        total_attempts = db.query(func.count(QuizAttempt.id)).filter(
-            QuizAttempt.user_id == user_id
-        ).scalar()
-        
-        # Calculate average quiz score
-        avg_score = db.query(func.avg(QuizAttempt.score)).filter(
+        # Count quiz attempts and the running totals behind the average score
+        total_attempts, scored_attempts, score_sum = db.query(
+            func.count(QuizAttempt.id),
+            func.count(QuizAttempt.score),
+            func.coalesce(func.sum(QuizAttempt.score), 0.0)
+        ).filter(
             QuizAttempt.user_id == user_id
-        ).scalar()
+        ).one()
         
         # Calculate study streak
         streak = ProgressAnalytics._calculate_streak(db, user_id)
@@ -74,9 +101,35 @@ class ProgressAnalytics:
         progress.total_summaries = total_summaries or 0
         progress.total_quizzes_generated = total_quizzes or 0
         progress.total_quizzes_attempted = total_attempts or 0
-        progress.average_quiz_score = round(avg_score or 0.0, 2)
+        progress.quiz_score_sum = score_sum or 0.0
+        progress.quiz_scored_attempts = scored_attempts or 0
+        progress.average_quiz_score = round(score_sum / scored_attempts, 2) if scored_attempts else 0.0
         progress.study_streak_days = streak
         progress.last_activity_date = datetime.now()
+    
+    @staticmethod
+    def lock_progress(db: Session, user_id: uuid.UUID) -> UserProgress:
+        """
+        Get a user's progress record locked FOR UPDATE until the transaction ends
+        
+        The row is created first if missing, so counter upserts from other
+        transactions wait for this one to commit; a recount taken while
+        holding the lock cannot overwrite increments it did not see.
+        """
+        table = UserProgress.__table__
+        db.execute(
+            pg_insert(table).values(user_id=user_id, study_streak_days=0)
+            .on_conflict_do_nothing(index_elements=[table.c.user_id])
+        )
+        return db.query(UserProgress).filter(
+            UserProgress.user_id == user_id
+        ).with_for_update().populate_existing().one()
+    
+    @staticmethod
+    def update_progress(db: Session, user_id: uuid.UUID):
+        """Recount user progress statistics from scratch (manual refresh)"""
+        progress = ProgressAnalytics.lock_progress(db, user_id)
+        ProgressAnalytics._recount(db, progress)
         
         db.commit()
         db.refresh(progress)
@@ -85,28 +138,30 @@ class ProgressAnalytics:
     
     @staticmethod
     def _calculate_streak(db: Session, user_id: uuid.UUID) -> int:
-        """Calculate study streak in days"""
-        activities = db.query(ActivityLog).filter(
-            ActivityLog.user_id == user_id
-        ).order_by(ActivityLog.timestamp.desc()).all()
-        
-        if not activities:
-            return 0
-        
-        streak = 1
-        current_date = activities[0].timestamp.date()
-        
-        for activity in activities[1:]:
-            activity_date = activity.timestamp.date()
-            diff = (current_date - activity_date).days
+        """
+        Calculate study streak in days (consecutive active days ending at the
+        most recent activity)
+        
+        Walks back from the newest rollup day, STREAK_PAGE_DAYS days per query
+        over the (user_id, day) index, and stops at the first gap - the cost
+        follows the streak length, not the user's lifetime of active days.
+        """
+        streak = 0
+        previous = None
+        while True:
+            query = db.query(UserDailyActivity.day).filter(UserDailyActivity.user_id == user_id)
+            if previous is not None:
+                query = query.filter(UserDailyActivity.day < previous)
+            days = [row.day for row in query.order_by(UserDailyActivity.day.desc()).limit(STREAK_PAGE_DAYS)]
             
-            if diff == 1:
+            for day in days:
+                if previous is not None and day != previous - timedelta(days=1):
+                    return streak
                 streak += 1
-                current_date = activity_date
-            elif diff > 1:
-                break
-        
-        return streak
+                previous = day
+            
+            if len(days) < STREAK_PAGE_DAYS:
+                return streak
     
     @staticmethod
     def log_activity(
@@ -115,17 +170,105 @@ class ProgressAnalytics:
         activity_type: ActivityType, 
         details: Dict[str, Any]
     ):
-        """Log user activity"""
-        activity = ActivityLog(
-            user_id=user_id,
-            activity_type=activity_type,
-            activity_details=details
-        )
-        db.add(activity)
+        """
+        Log user activity
+        
+        The event goes to the activity sink, which writes it in bulk in the
+        background (or immediately through db when ACTIVITY_LOG_BUFFERED is off).
+        """
+        from progress.activity_sink import activity_sink
+        activity_sink.submit(db, user_id, activity_type, details)
+    
+    @staticmethod
+    def write_activities(db: Session, events: List[Dict[str, Any]]):
+        """
+        Persist activity events and commit
+        
+        Inserts the activity_logs rows in one executemany, upserts the daily
+        rollup in one statement and refreshes the streak of each user involved.
+        
+        Args:
+            db: Database session
+            events: Dicts with user_id, activity_type, activity_details and timestamp
+        """
+        if not events:
+            return
+        
+        db.execute(ActivityLog.__table__.insert(), [
+            {
+                'id': uuid.uuid4(),
+                'user_id': event['user_id'],
+                'activity_type': event['activity_type'],
+                'activity_details': event['activity_details'],
+                'timestamp': event['timestamp']
+            }
+            for event in events
+        ])
+        ProgressAnalytics.record_daily_activity(db, events)
+        
+        # Counters are maintained incrementally; only the streak depends on activity
+        for user_id in {event['user_id'] for event in events}:
+            progress = ProgressAnalytics.get_or_create_progress(db, user_id)
+            progress.study_streak_days = ProgressAnalytics._calculate_streak(db, user_id)
+            progress.last_activity_date = datetime.now()
         db.commit()
+    
+    @staticmethod
+    def record_daily_activity(db: Session, events: List[Dict[str, Any]]):
+        """Add activity events to their user_daily_activity rows (one upsert)"""
+        rows = {}
+        for event in events:
+            key = (event['user_id'], event['timestamp'].astimezone(timezone.utc).date())
+            row = rows.get(key)
+            if row is None:
+                row = dict.fromkeys(DAILY_COUNT_COLUMNS.values(), 0)
+                row.update(user_id=key[0], day=key[1], total_count=0, study_minutes=0)
+                rows[key] = row
+            row[DAILY_COUNT_COLUMNS[event['activity_type']]] += 1
+            row['total_count'] += 1
+            row['study_minutes'] += STUDY_MINUTES.get(event['activity_type'], 0)
+        
+        table = UserDailyActivity.__table__
+        stmt = pg_insert(table).values(list(rows.values()))
+        counters = list(DAILY_COUNT_COLUMNS.values()) + ['total_count', 'study_minutes']
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={column: table.c[column] + stmt.excluded[column] for column in counters}
+        ))
+    
+    @staticmethod
+    def get_daily_activity(
+        db: Session,
+        user_id: uuid.UUID,
+        days: int = 30
+    ) -> List[Dict[str, Any]]:
+        """
+        Get per-day activity from the daily rollup
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            days: Number of days to cover, ending today
+        
+        Returns:
+            Activity summaries for the days with activity, oldest first
+        """
+        since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+        rows = db.query(UserDailyActivity).filter(
+            UserDailyActivity.user_id == user_id,
+            UserDailyActivity.day >= since
+        ).order_by(UserDailyActivity.day).all()
         
-        # Update progress after logging activity
-        ProgressAnalytics.update_progress(db, user_id)
+        return [
+            {
+                'date': row.day.strftime('%Y-%m-%d'),
+                'documents': row.upload_count,
+                'notes': row.note_count,
+                'quizzes': row.quiz_count + row.quiz_attempt_count,
+                'study_time': row.study_minutes
+            }
+            for row in rows
+        ]
     
     @staticmethod
     def get_recent_activities(
@@ -178,24 +321,23 @@ class ProgressAnalytics:
         user_id: uuid.UUID
     ) -> Dict[str, int]:
         """Get activity count for the past 7 days"""
-        today = datetime.now()
-        week_ago = today - timedelta(days=7)
+        today = datetime.now(timezone.utc).date()
         
         activities = db.query(
-            func.date(ActivityLog.timestamp),
-            func.count(ActivityLog.id)
+            UserDailyActivity.day,
+            UserDailyActivity.total_count
         ).filter(
-            ActivityLog.user_id == user_id,
-            ActivityLog.timestamp >= week_ago
-        ).group_by(func.date(ActivityLog.timestamp)).all()
+            UserDailyActivity.user_id == user_id,
+            UserDailyActivity.day > today - timedelta(days=7)
+        ).all()
         
         result = {}
         for i in range(7):
-            date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
-            result[date] = 0
+            day = (today - timedelta(days=i)).strftime('%Y-%m-%d')
+            result[day] = 0
         
-        for date, count in activities:
-            result[date.strftime('%Y-%m-%d')] = count
+        for day, count in activities:
+            result[day.strftime('%Y-%m-%d')] = count
         
         return result
     
@@ -205,11 +347,17 @@ class ProgressAnalytics:
         user_id: uuid.UUID
     ) -> Dict[str, Any]:
         """Get detailed performance metrics"""
-        attempts = db.query(QuizAttempt).filter(
+        # Score aggregates in one query
+        best_score, worst_score, average_score, total_attempts = db.query(
+            func.max(QuizAttempt.score),
+            func.min(QuizAttempt.score),
+            func.avg(QuizAttempt.score),
+            func.count(QuizAttempt.id)
+        ).filter(
             QuizAttempt.user_id == user_id
-        ).all()
+        ).one()
         
-        if not attempts:
+        if not total_attempts:
             return {
                 'best_score': 0.0,
                 'worst_score': 0.0,
@@ -220,38 +368,40 @@ class ProgressAnalytics:
                 'weak_topics': []
             }
         
-        scores = [attempt.score for attempt in attempts]
-        
         # Calculate improvement rate (last 5 vs first 5)
         improvement_rate = 0.0
-        if len(attempts) >= 5:
-            first_5_avg = sum(scores[:5]) / 5
-            last_5_avg = sum(scores[-5:]) / 5
+        if total_attempts >= 5:
+            def edge_average(order):
+                scores = db.query(QuizAttempt.score).filter(
+                    QuizAttempt.user_id == user_id
+                ).order_by(order).limit(5).subquery()
+                return db.query(func.avg(scores.c.score)).scalar() or 0.0
+            
+            first_5_avg = edge_average(QuizAttempt.completed_at.asc())
+            last_5_avg = edge_average(QuizAttempt.completed_at.desc())
             improvement_rate = ((last_5_avg - first_5_avg) / first_5_avg * 100) if first_5_avg > 0 else 0
         
-        # Analyze topics/quiz performance for strong and weak areas
-        topic_scores = {}  # topic -> list of scores
-        for attempt in attempts:
-            quiz = db.query(Quiz).filter(Quiz.id == attempt.quiz_id).first()
-            if quiz and quiz.title:
-                # Extract topic from quiz title or use full title
-                topic = quiz.title
-                if topic not in topic_scores:
-                    topic_scores[topic] = []
-                topic_scores[topic].append(attempt.score)
-        
-        # Calculate average score per topic
-        topic_averages = {topic: sum(scores) / len(scores) for topic, scores in topic_scores.items()}
+        # Average score per topic (quiz title) via a join instead of a query per attempt
+        topic_averages = db.query(
+            Quiz.title,
+            func.avg(QuizAttempt.score)
+        ).join(
+            Quiz, Quiz.id == QuizAttempt.quiz_id
+        ).filter(
+            QuizAttempt.user_id == user_id,
+            Quiz.title.isnot(None),
+            Quiz.title != ''
+        ).group_by(Quiz.title).all()
         
         # Identify strong topics (score >= 80) and weak topics (score < 60)
-        strong_topics = [topic for topic, avg in topic_averages.items() if avg >= 80]
-        weak_topics = [topic for topic, avg in topic_averages.items() if avg < 60]
+        strong_topics = [topic for topic, avg in sorted(topic_averages, key=lambda x: -x[1]) if avg >= 80]
+        weak_topics = [topic for topic, avg in sorted(topic_averages, key=lambda x: x[1]) if avg < 60]
         
         return {
-            'best_score': max(scores),
-            'worst_score': min(scores),
-            'average_score': sum(scores) / len(scores),
-            'total_attempts': len(attempts),
+            'best_score': best_score,
+            'worst_score': worst_score,
+            'average_score': float(average_score),
+            'total_attempts': total_attempts,
             'improvement_rate': round(improvement_rate, 2),
             'strong_topics': strong_topics[:5],  # Top 5 strong topics
             'weak_topics': weak_topics[:5]  # Top 5 weak topics
@@ -406,28 +556,33 @@ class ProgressAnalytics:
         user_id: uuid.UUID
     ) -> Dict[str, Any]:
         """Get comprehensive analytics for progress dashboard"""
-        progress = ProgressAnalytics.update_progress(db, user_id)
+        progress = ProgressAnalytics.get_or_create_progress(db, user_id)
         metrics = ProgressAnalytics.get_performance_metrics(db, user_id)
         
-        # Get quiz performance by topic with trends
-        attempts = db.query(QuizAttempt).filter(
-            QuizAttempt.user_id == user_id
+        # Get quiz performance by topic with trends (one joined query)
+        attempts = db.query(
+            Quiz.title,
+            QuizAttempt.score,
+            QuizAttempt.completed_at
+        ).join(
+            Quiz, Quiz.id == QuizAttempt.quiz_id
+        ).filter(
+            QuizAttempt.user_id == user_id,
+            Quiz.title.isnot(None),
+            Quiz.title != ''
         ).order_by(QuizAttempt.completed_at).all()
         
         topic_data = {}
-        for attempt in attempts:
-            quiz = db.query(Quiz).filter(Quiz.id == attempt.quiz_id).first()
-            if quiz and quiz.title:
-                topic = quiz.title
-                if topic not in topic_data:
-                    topic_data[topic] = {
-                        'scores': [],
-                        'dates': [],
-                        'attempts': 0
-                    }
-                topic_data[topic]['scores'].append(attempt.score)
-                topic_data[topic]['dates'].append(attempt.completed_at)
-                topic_data[topic]['attempts'] += 1
+        for topic, score, completed_at in attempts:
+            if topic not in topic_data:
+                topic_data[topic] = {
+                    'scores': [],
+                    'dates': [],
+                    'attempts': 0
+                }
+            topic_data[topic]['scores'].append(score)
+            topic_data[topic]['dates'].append(completed_at)
+            topic_data[topic]['attempts'] += 1
         
         quiz_performance_by_topic = []
         for topic, data in topic_data.items():
@@ -451,44 +606,9 @@ class ProgressAnalytics:
                 'trend': trend
             })
         
-        # Get recent activity (last 30 days)
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        activities = db.query(ActivityLog).filter(
-            ActivityLog.user_id == user_id,
-            ActivityLog.timestamp >= thirty_days_ago
-        ).all()
-        
-        # Group by date
-        activity_by_date = {}
-        for activity in activities:
-            date_key = activity.timestamp.strftime('%Y-%m-%d')
-            if date_key not in activity_by_date:
-                activity_by_date[date_key] = {
-                    'documents': 0,
-                    'notes': 0,
-                    'quizzes': 0,
-                    'study_time': 0
-                }
-            
-            if activity.activity_type == ActivityType.UPLOAD:
-                activity_by_date[date_key]['documents'] += 1
-            elif activity.activity_type == ActivityType.NOTE:
-                activity_by_date[date_key]['notes'] += 1
-            elif activity.activity_type in [ActivityType.QUIZ_ATTEMPT, ActivityType.QUIZ]:
-                activity_by_date[date_key]['quizzes'] += 1
-                # Estimate 5 minutes per quiz
-                activity_by_date[date_key]['study_time'] += 5
-        
-        recent_activity = [
-            {
-                'date': date,
-                'documents': data['documents'],
-                'notes': data['notes'],
-                'quizzes': data['quizzes'],
-                'study_time': data['study_time']
-            }
-            for date, data in sorted(activity_by_date.items())[-14:]  # Last 14 days
-        ]
+        # Get recent activity (last 30 days) from the daily rollup
+        activity_by_date = ProgressAnalytics.get_daily_activity(db, user_id, days=30)
+        recent_activity = activity_by_date[-14:]  # Last 14 days
         
         # Calculate consistency score (0-100)
         days_with_activity = len(activity_by_date)
@@ -0,0 +1,303 @@
+"""
+Incrementally maintained progress counters
+Mapper events adjust user_progress in the same transaction that inserts or
+deletes documents, notes, summaries, quizzes and quiz attempts, so reading
+progress is a single-row fetch. A periodic reconciler corrects drift from
+writes the events cannot see (bulk deletes, raw SQL, other services).
+"""
+import threading
+from typing import Dict, Any, Set
+from sqlalchemy import event, select, func, case, cast, inspect, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from config.database import SessionLocal
+from config.settings import settings
+from documents.models import Document
+from notes.models import Note
+from summarizer.models import Summary
+from quizzes.models import Quiz, QuizAttempt
+from progress.models import UserProgress
+from utils.logger import logger
+
+COUNTER_COLUMNS = (
+    "total_documents",
+    "total_notes",
+    "total_summaries",
+    "total_quizzes_generated",
+    "total_quizzes_attempted",
+    "quiz_score_sum",
+    "quiz_scored_attempts",
+)
+
+def adjust_progress(connection, user_id, **deltas):
+    """
+    Add deltas to a user's counters, creating the row if needed
+    
+    Runs as one INSERT ... ON CONFLICT DO UPDATE, so concurrent requests
+    never lose an increment.
+    
+    Args:
+        connection: Connection of the flush in progress
+        user_id: User whose counters change
+        **deltas: Counter column -> amount to add
+    """
+    deltas = {name: amount for name, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    
+    table = UserProgress.__table__
+    values = {name: deltas.get(name, 0) for name in COUNTER_COLUMNS}
+    scored = values["quiz_scored_attempts"]
+    stmt = pg_insert(table).values(
+        user_id=user_id,
+        average_quiz_score=round(values["quiz_score_sum"] / scored, 2) if scored > 0 else 0.0,
+        last_activity_date=func.now(),
+        **values
+    )
+    
+    updates = {
+        name: func.coalesce(table.c[name], 0) + stmt.excluded[name]
+        for name in deltas
+    }
+    if "quiz_score_sum" in deltas or "quiz_scored_attempts" in deltas:
+        new_sum = func.coalesce(table.c.quiz_score_sum, 0) + stmt.excluded.quiz_score_sum
+        new_count = func.coalesce(table.c.quiz_scored_attempts, 0) + stmt.excluded.quiz_scored_attempts
+        updates["average_quiz_score"] = case(
+            (new_count > 0, func.round(cast(new_sum / new_count, Numeric), 2)),
+            else_=0.0
+        )
+    updates["last_activity_date"] = func.now()
+    updates["updated_at"] = func.now()
+    
+    connection.execute(stmt.on_conflict_do_update(index_elements=[table.c.user_id], set_=updates))
+
+def _attempt_deltas(score, sign: int) -> Dict[str, Any]:
+    """Counter changes for adding (sign=1) or removing (sign=-1) an attempt"""
+    if score is None:
+        return {"total_quizzes_attempted": sign}
+    return {
+        "total_quizzes_attempted": sign,
+        "quiz_scored_attempts": sign,
+        "quiz_score_sum": sign * score
+    }
+
+# Deletes use before_delete: the row (and any cascade children) still exist,
+# and the instance can be loaded if its attributes were expired by a commit
+
+@event.listens_for(Document, "after_insert")
+def _document_created(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_documents=1)
+
+@event.listens_for(Document, "before_delete")
+def _document_deleted(mapper, connection, target):
+    # Notes and summaries go with the document through ON DELETE CASCADE
+    notes = connection.execute(
+        select(func.count(Note.id)).where(Note.document_id == target.id)
+    ).scalar()
+    summaries = connection.execute(
+        select(func.count(Summary.id)).where(Summary.document_id == target.id)
+    ).scalar()
+    adjust_progress(
+        connection,
+        target.user_id,
+        total_documents=-1,
+        total_notes=-(notes or 0),
+        total_summaries=-(summaries or 0)
+    )
+
+@event.listens_for(Note, "after_insert")
+def _note_created(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_notes=1)
+
+@event.listens_for(Note, "before_delete")
+def _note_deleted(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_notes=-1)
+
+@event.listens_for(Summary, "after_insert")
+def _summary_created(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_summaries=1)
+
+@event.listens_for(Summary, "before_delete")
+def _summary_deleted(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_summaries=-1)
+
+@event.listens_for(Quiz, "after_insert")
+def _quiz_created(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_quizzes_generated=1)
+
+@event.listens_for(Quiz, "before_delete")
+def _quiz_deleted(mapper, connection, target):
+    adjust_progress(connection, target.user_id, total_quizzes_generated=-1)
+    
+    # Attempts go with the quiz through ON DELETE CASCADE
+    rows = connection.execute(
+        select(
+            QuizAttempt.user_id,
+            func.count(QuizAttempt.id),
+            func.count(QuizAttempt.score),
+            func.coalesce(func.sum(QuizAttempt.score), 0.0)
+        ).where(QuizAttempt.quiz_id == target.id).group_by(QuizAttempt.user_id)
+    ).all()
+    for user_id, attempts, scored, score_sum in rows:
+        adjust_progress(
+            connection,
+            user_id,
+            total_quizzes_attempted=-attempts,
+            quiz_scored_attempts=-scored,
+            quiz_score_sum=-score_sum
+        )
+
+@event.listens_for(QuizAttempt, "after_insert")
+def _attempt_created(mapper, connection, target):
+    adjust_progress(connection, target.user_id, **_attempt_deltas(target.score, 1))
+
+@event.listens_for(QuizAttempt, "after_update")
+def _attempt_updated(mapper, connection, target):
+    history = inspect(target).attrs.score.history
+    if not history.has_changes():
+        return
+    old_score = history.deleted[0] if history.deleted else None
+    deltas = _attempt_deltas(old_score, -1)
+    for name, amount in _attempt_deltas(target.score, 1).items():
+        deltas[name] = deltas.get(name, 0) + amount
+    adjust_progress(connection, target.user_id, **deltas)
+
+@event.listens_for(QuizAttempt, "before_delete")
+def _attempt_deleted(mapper, connection, target):
+    adjust_progress(connection, target.user_id, **_attempt_deltas(target.score, -1))
+
+class ProgressReconciler:
+    """
+    Periodically recount every user's counters and fix the ones that drifted
+    
+    Drift is detected set-based (one grouped query per table), so a pass
+    costs the same handful of queries regardless of the number of users.
+    Each drifted user is then recounted in its own transaction holding that
+    user's user_progress row lock, so adjust_progress upserts committed
+    meanwhile are never overwritten with stale absolute values.
+    """
+    
+    def __init__(self):
+        self.interval = settings.PROGRESS_RECONCILE_INTERVAL_MINUTES * 60
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def find_drifted(self, db: Session) -> Set[Any]:
+        """
+        Find users whose counters differ from a recount (read-only)
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            IDs of users with drifted or missing user_progress rows
+        """
+        expected: Dict[Any, Dict[str, Any]] = {}
+        
+        def collect(query, *names):
+            for user_id, *values in query:
+                entry = expected.setdefault(user_id, dict.fromkeys(COUNTER_COLUMNS, 0))
+                for name, value in zip(names, values):
+                    entry[name] = value or 0
+        
+        collect(db.query(Document.user_id, func.count(Document.id)).group_by(Document.user_id), "total_documents")
+        collect(db.query(Note.user_id, func.count(Note.id)).group_by(Note.user_id), "total_notes")
+        collect(db.query(Summary.user_id, func.count(Summary.id)).group_by(Summary.user_id), "total_summaries")
+        collect(db.query(Quiz.user_id, func.count(Quiz.id)).group_by(Quiz.user_id), "total_quizzes_generated")
+        collect(
+            db.query(
+                QuizAttempt.user_id,
+                func.count(QuizAttempt.id),
+                func.count(QuizAttempt.score),
+                func.coalesce(func.sum(QuizAttempt.score), 0.0)
+            ).group_by(QuizAttempt.user_id),
+            "total_quizzes_attempted", "quiz_scored_attempts", "quiz_score_sum"
+        )
+        
+        observed = {
+            row.user_id: row
+            for row in db.query(UserProgress.user_id, *[UserProgress.__table__.c[name] for name in COUNTER_COLUMNS])
+        }
+        drifted = set()
+        for user_id in set(expected) | set(observed):
+            counts = expected.get(user_id, dict.fromkeys(COUNTER_COLUMNS, 0))
+            row = observed.get(user_id)
+            if row is None or any(
+                abs((getattr(row, name) or 0) - counts[name]) > 1e-6 for name in COUNTER_COLUMNS
+            ):
+                drifted.add(user_id)
+        return drifted
+    
+    def reconcile(self, db: Session) -> int:
+        """
+        Recount all counters and correct drifted rows
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Number of user_progress rows corrected or created
+        """
+        from progress.analytics import progress_analytics
+        
+        drifted = self.find_drifted(db)
+        db.commit()
+        
+        fixed = 0
+        for user_id in drifted:
+            try:
+                progress = progress_analytics.lock_progress(db, user_id)
+                before = {name: getattr(progress, name) or 0 for name in COUNTER_COLUMNS}
+                progress_analytics._recount(db, progress)
+                changed = any(
+                    abs(before[name] - (getattr(progress, name) or 0)) > 1e-6 for name in COUNTER_COLUMNS
+                )
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"Progress reconciliation failed for user {user_id}: {e}")
+                continue
+            
+            if changed:
+                fixed += 1
+        
+        return fixed
+    
+    def _loop(self):
+        """Reconcile every interval until stopped"""
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                fixed = self.reconcile(db)
+                if fixed:
+                    logger.info(f"Progress reconciliation corrected {fixed} users")
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"Progress reconciliation failed: {e}")
+            finally:
+                db.close()
+    
+    def start(self):
+        """Start the reconciliation thread (disabled when the interval is 0)"""
+        if self._thread or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="progress-reconciler", daemon=True)
+        self._thread.start()
+        logger.info(f"Progress reconciler started (every {settings.PROGRESS_RECONCILE_INTERVAL_MINUTES} min)")
+    
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the reconciliation thread
+        
+        Args:
+            timeout: Seconds to wait for a pass in progress
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+# Global progress reconciler instance
+progress_reconciler = ProgressReconciler()
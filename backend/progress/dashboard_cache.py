@@ -0,0 +1,184 @@
+"""
+Per-user cache for dashboard and analytics responses
+Entries are dropped whenever a commit touches the user's content or progress,
+with a TTL as a safety net, and served with ETags so polling clients get 304s
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from config.settings import settings
+from documents.models import Document
+from notes.models import Note
+from summarizer.models import Summary
+from quizzes.models import Quiz, QuizAttempt
+from progress.models import UserProgress, ActivityLog
+from utils.helpers import hash_string
+
+# Models whose writes change what the cached endpoints return
+TRACKED_MODELS = (Document, Note, Summary, Quiz, QuizAttempt, UserProgress, ActivityLog)
+
+class DashboardCache:
+    """
+    LRU of computed responses keyed by (user, endpoint)
+    
+    Each user has a version that invalidate() bumps; a response computed
+    while the version changed is returned but not stored, so a read racing
+    a write cannot cache stale data.
+    """
+    
+    def __init__(self):
+        self.ttl_seconds = settings.DASHBOARD_CACHE_TTL_SECONDS
+        self.max_entries = settings.DASHBOARD_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+    
+    def version(self, user_id) -> int:
+        with self._lock:
+            return self._versions.get(str(user_id), 0)
+    
+    def get(self, user_id, name: str) -> Optional[Tuple[str, Any]]:
+        """
+        Look up a cached response
+        
+        Args:
+            user_id: User ID
+            name: Endpoint name
+        
+        Returns:
+            (etag, payload), or None on a miss
+        """
+        key = (str(user_id), name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[2] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0], entry[1]
+            if entry:
+                del self._entries[key]
+            self.counters["misses"] += 1
+            return None
+    
+    def set(self, user_id, name: str, payload: Any, version: int) -> str:
+        """
+        Store a JSON-ready response
+        
+        Args:
+            user_id: User ID
+            name: Endpoint name
+            payload: JSON-serializable response body
+            version: User version read before computing the payload
+        
+        Returns:
+            ETag of the payload
+        """
+        etag = '"' + hash_string(json.dumps(payload, sort_keys=True, default=str))[:32] + '"'
+        key = (str(user_id), name)
+        with self._lock:
+            if self._versions.get(key[0], 0) != version:
+                return etag
+            self._entries[key] = (etag, payload, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+    
+    def invalidate(self, user_id):
+        """
+        Drop every cached response of a user
+        
+        Args:
+            user_id: User ID
+        """
+        user_key = str(user_id)
+        with self._lock:
+            self._versions[user_key] = self._versions.get(user_key, 0) + 1
+            for key in [key for key in self._entries if key[0] == user_key]:
+                del self._entries[key]
+            self.counters["invalidations"] += 1
+    
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            for user_key in {key[0] for key in self._entries}:
+                self._versions[user_key] = self._versions.get(user_key, 0) + 1
+            self._entries.clear()
+    
+    def respond(self, request: Request, user_id, name: str, compute: Callable[[], Any]) -> Response:
+        """
+        Serve an endpoint from the cache, honouring If-None-Match
+        
+        Args:
+            request: Incoming request
+            user_id: User ID
+            name: Endpoint name
+            compute: Builds the response body on a miss
+        
+        Returns:
+            JSON response with an ETag, or 304 when the client's copy is current
+        """
+        entry = self.get(user_id, name) if self.enabled else None
+        if entry is None:
+            version = self.version(user_id)
+            payload = jsonable_encoder(compute())
+            etag = self.set(user_id, name, payload, version) if self.enabled else None
+        else:
+            etag, payload = entry
+        
+        headers = {"Cache-Control": "private, no-cache"}
+        if etag:
+            headers["ETag"] = etag
+            if request.headers.get("if-none-match") == etag:
+                with self._lock:
+                    self.counters["not_modified"] += 1
+                return Response(status_code=304, headers=headers)
+        return JSONResponse(content=payload, headers=headers)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters
+        
+        Returns:
+            Hits, misses, 304s, invalidations and current entry count
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            counters["entries"] = len(self._entries)
+        return counters
+
+# Global dashboard cache instance
+dashboard_cache = DashboardCache()
+
+# Invalidate after commit: users touched by a flush are collected on the
+# session and dropped from the cache once the transaction is durable
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched_users(session, flush_context):
+    touched = session.info.setdefault("dashboard_users", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            user_id = inspect(obj).dict.get("user_id")
+            if user_id is not None:
+                touched.add(user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_touched_users(session):
+    for user_id in session.info.pop("dashboard_users", ()):
+        dashboard_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_touched_users(session):
+    session.info.pop("dashboard_users", None)
@@ -1,7 +1,7 @@
 """
 Progress tracking models
 """
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Enum as SQLEnum
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, String, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 import uuid
@@ -28,6 +28,8 @@ class UserProgress(Base):
     total_quizzes_generated = Column(Integer, default=0)
     total_quizzes_attempted = Column(Integer, default=0)
     average_quiz_score = Column(Float, default=0.0)
+    quiz_score_sum = Column(Float, default=0.0)  # Running totals behind average_quiz_score
+    quiz_scored_attempts = Column(Integer, default=0)
     study_streak_days = Column(Integer, default=0)
     last_activity_date = Column(DateTime(timezone=True))
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -46,3 +48,22 @@ class ActivityLog(Base):
     
     def __repr__(self):
         return f"<ActivityLog {self.activity_type} - {self.timestamp}>"
+
+class UserDailyActivity(Base):
+    """Per-user, per-day activity counts rolled up from activity_logs"""
+    __tablename__ = "user_daily_activity"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    upload_count = Column(Integer, nullable=False, default=0)
+    note_count = Column(Integer, nullable=False, default=0)
+    summary_count = Column(Integer, nullable=False, default=0)
+    quiz_count = Column(Integer, nullable=False, default=0)
+    quiz_attempt_count = Column(Integer, nullable=False, default=0)
+    resume_uploaded_count = Column(Integer, nullable=False, default=0)
+    resume_analyzed_count = Column(Integer, nullable=False, default=0)
+    total_count = Column(Integer, nullable=False, default=0)
+    study_minutes = Column(Integer, nullable=False, default=0)  # Estimated
+    
+    def __repr__(self):
+        return f"<UserDailyActivity {self.user_id} - {self.day}>"
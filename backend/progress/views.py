@@ -1,7 +1,7 @@
 """
 Progress tracking API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 from config.database import get_db
@@ -9,11 +9,12 @@ from progress.models import UserProgress, ActivityLog
 from progress.schemas import (
     UserProgressResponse, ActivityLogResponse, 
     DashboardStats, PerformanceMetrics,
-    AIInsight, DetailedAnalytics
+    AIInsight, DetailedAnalytics, ActivitySummary
 )
 from users.auth import get_current_user
 from users.models import User
 from progress.analytics import progress_analytics
+from progress.dashboard_cache import dashboard_cache
 
 router = APIRouter(prefix="/api/progress", tags=["progress"])
 
@@ -33,53 +34,59 @@ def get_user_progress(
         User progress data
     """
     progress = progress_analytics.get_or_create_progress(db, current_user.id)
-    progress_analytics.update_progress(db, current_user.id)
     
     return UserProgressResponse.from_orm(progress)
 
 @router.get("/dashboard", response_model=DashboardStats)
 def get_dashboard_stats(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get comprehensive dashboard statistics
     
+    Served from the per-user dashboard cache with an ETag.
+    
     Args:
+        request: Incoming request
         current_user: Current authenticated user
         db: Database session
         
     Returns:
         Dashboard statistics
     """
-    # Update progress first
-    progress = progress_analytics.update_progress(db, current_user.id)
-    
-    # Get recent activities
-    recent_activities = progress_analytics.get_recent_activities(db, current_user.id, limit=10)
-    
-    # Get quiz performance trend
-    quiz_trend = progress_analytics.get_quiz_performance_trend(db, current_user.id)
-    
-    # Get document types breakdown
-    doc_breakdown = progress_analytics.get_document_types_breakdown(db, current_user.id)
-    
-    # Get weekly activity
-    weekly_activity = progress_analytics.get_weekly_activity(db, current_user.id)
+    def compute() -> DashboardStats:
+        # Counters are kept current on write, so this is a single-row read
+        progress = progress_analytics.get_or_create_progress(db, current_user.id)
+        
+        # Get recent activities
+        recent_activities = progress_analytics.get_recent_activities(db, current_user.id, limit=10)
+        
+        # Get quiz performance trend
+        quiz_trend = progress_analytics.get_quiz_performance_trend(db, current_user.id)
+        
+        # Get document types breakdown
+        doc_breakdown = progress_analytics.get_document_types_breakdown(db, current_user.id)
+        
+        # Get weekly activity
+        weekly_activity = progress_analytics.get_weekly_activity(db, current_user.id)
+        
+        return DashboardStats(
+            total_documents=progress.total_documents,
+            total_notes=progress.total_notes,
+            total_summaries=progress.total_summaries,
+            total_quizzes_generated=progress.total_quizzes_generated,
+            total_quizzes_attempted=progress.total_quizzes_attempted,
+            average_quiz_score=progress.average_quiz_score,
+            study_streak_days=progress.study_streak_days,
+            recent_activities=[ActivityLogResponse.from_orm(act) for act in recent_activities],
+            quiz_performance_trend=quiz_trend,
+            document_types_breakdown=doc_breakdown,
+            weekly_activity=weekly_activity
+        )
     
-    return DashboardStats(
-        total_documents=progress.total_documents,
-        total_notes=progress.total_notes,
-        total_summaries=progress.total_summaries,
-        total_quizzes_generated=progress.total_quizzes_generated,
-        total_quizzes_attempted=progress.total_quizzes_attempted,
-        average_quiz_score=progress.average_quiz_score,
-        study_streak_days=progress.study_streak_days,
-        recent_activities=[ActivityLogResponse.from_orm(act) for act in recent_activities],
-        quiz_performance_trend=quiz_trend,
-        document_types_breakdown=doc_breakdown,
-        weekly_activity=weekly_activity
-    )
+    return dashboard_cache.respond(request, current_user.id, "dashboard", compute)
 
 @router.get("/activities", response_model=List[ActivityLogResponse])
 def get_activity_history(
@@ -101,6 +108,26 @@ def get_activity_history(
     activities = progress_analytics.get_recent_activities(db, current_user.id, limit)
     return [ActivityLogResponse.from_orm(act) for act in activities]
 
+@router.get("/activity/daily", response_model=List[ActivitySummary])
+def get_daily_activity(
+    days: int = 30,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get per-day activity for charts
+    
+    Args:
+        days: Number of days to cover, ending today (up to 365)
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        Daily activity summaries for days with activity
+    """
+    days = max(1, min(days, 365))
+    return progress_analytics.get_daily_activity(db, current_user.id, days)
+
 @router.get("/performance", response_model=PerformanceMetrics)
 def get_performance_metrics(
     current_user: User = Depends(get_current_user),
@@ -144,40 +171,54 @@ def refresh_progress(
         Success message
     """
     progress_analytics.update_progress(db, current_user.id)
+    dashboard_cache.invalidate(current_user.id)
     return {"message": "Progress statistics updated successfully"}
 
 @router.get("/analytics/detailed", response_model=DetailedAnalytics)
 def get_detailed_analytics(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get comprehensive analytics for progress dashboard
     
+    Served from the per-user dashboard cache with an ETag.
+    
     Args:
+        request: Incoming request
         current_user: Current authenticated user
         db: Database session
         
     Returns:
         Detailed analytics including performance trends, activity, and insights
     """
-    analytics = progress_analytics.get_detailed_analytics(db, current_user.id)
-    return analytics
+    return dashboard_cache.respond(
+        request, current_user.id, "analytics_detailed",
+        lambda: DetailedAnalytics.model_validate(progress_analytics.get_detailed_analytics(db, current_user.id))
+    )
 
 @router.get("/insights/ai", response_model=List[AIInsight])
 def get_ai_insights(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get AI-powered personalized learning insights
     
+    Cached per user, so the LLM is only called again after the user's data changes
+    or the TTL expires.
+    
     Args:
+        request: Incoming request
         current_user: Current authenticated user
         db: Database session
         
     Returns:
         List of AI-generated insights and recommendations
     """
-    insights = progress_analytics.generate_ai_insights(db, current_user.id)
-    return insights
+    return dashboard_cache.respond(
+        request, current_user.id, "insights_ai",
+        lambda: [AIInsight.model_validate(insight) for insight in progress_analytics.generate_ai_insights(db, current_user.id)]
+    )
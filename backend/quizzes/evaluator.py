@@ -1,14 +1,29 @@
 """
 Quiz evaluator for grading and providing feedback
 """
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+import json
+import re
+import threading
+import numpy as np
+from config.settings import settings
+from core.bm25 import STOP_WORDS, TOKEN_PATTERN
 from utils.gemini_client import gemini_client
+from utils.logger import logger
+
+# Words that flip the meaning of an answer; kept as terms when grading and
+# never auto-accepted ("Mitochondria do not produce ATP")
+NEGATIONS = {'not', 'no', 'never', 'without', 'nor', 'none', 'neither', 'cannot'}
+GRADING_STOP_WORDS = STOP_WORDS - NEGATIONS
 
 class QuizEvaluator:
     """Evaluate quiz answers and provide feedback"""
     
     def __init__(self):
         self.gemini_client = gemini_client
+        self._stats_lock = threading.Lock()
+        self.grading_counters = {"local": 0, "llm": 0}
     
     def evaluate_mcq(
         self, 
@@ -132,12 +147,7 @@ class QuizEvaluator:
                 elif line.startswith('FEEDBACK:'):
                     feedback = line.split(':', 1)[1].strip()
             
-            return {
-                'is_correct': score >= 0.7,  # 70% or higher is considered correct
-                'points_earned': score,
-                'points_possible': 1.0,
-                'explanation': feedback
-            }
+            return self._short_answer_result(score, feedback)
             
         except Exception as e:
             # Fallback to simple string matching
@@ -158,6 +168,250 @@ class QuizEvaluator:
                 'explanation': f"Expected answer: {correct_answer}. Your answer was {'correct' if score >= 0.7 else 'incorrect'}."
             }
     
+    @staticmethod
+    def _stem(token: str) -> str:
+        """Light suffix stripping so 'processes' matches 'process'"""
+        for suffix in ("ing", "ed", "es", "ly", "s"):
+            if len(token) > len(suffix) + 3 and token.endswith(suffix):
+                return token[:-len(suffix)]
+        return token
+    
+    def _terms(self, text: str) -> List[str]:
+        """Stemmed grading terms; unlike core.bm25.tokenize, negations are kept"""
+        text = re.sub(r"n['’]t\b", " not", text.lower())
+        return [
+            self._stem(token) for token in TOKEN_PATTERN.findall(text)
+            if token not in GRADING_STOP_WORDS
+        ]
+    
+    def local_score(self, user_answer: str, correct_answer: str, question_text: str = "") -> float:
+        """
+        Score a short answer without the LLM
+        
+        Weighted mix of normalized token overlap (F1), TF-IDF cosine similarity
+        and coverage of key terms - expected-answer terms that do not already
+        appear in the question.
+        
+        Args:
+            user_answer: User's answer
+            correct_answer: Expected answer
+            question_text: Original question
+            
+        Returns:
+            Similarity between 0.0 and 1.0
+        """
+        user_terms = self._terms(user_answer)
+        expected_terms = self._terms(correct_answer)
+        if not user_terms or not expected_terms:
+            return 0.0
+        
+        # Token overlap (F1 over unique terms)
+        user_set, expected_set = set(user_terms), set(expected_terms)
+        common = len(user_set & expected_set)
+        overlap = 2 * common / (len(user_set) + len(expected_set))
+        
+        # TF-IDF cosine; IDF from the question, answer and expected answer
+        # so terms the question gives away count for less
+        question_terms = self._terms(question_text)
+        docs = [user_terms, expected_terms, question_terms]
+        vocab = {term: i for i, term in enumerate(sorted(user_set | expected_set))}
+        tf = np.zeros((2, len(vocab)))
+        for row, terms in enumerate(docs[:2]):
+            for term in terms:
+                tf[row, vocab[term]] += 1
+        doc_sets = [user_set, expected_set, set(question_terms)]
+        df = np.array([sum(1 for doc in doc_sets if term in doc) for term in vocab], dtype=float)
+        idf = np.log((1 + len(docs)) / (1 + df)) + 1
+        vectors = tf * idf
+        norms = np.linalg.norm(vectors, axis=1)
+        cosine = float(vectors[0] @ vectors[1] / (norms[0] * norms[1])) if norms.all() else 0.0
+        
+        # Key-term coverage
+        key_terms = expected_set - set(question_terms) or expected_set
+        coverage = len(key_terms & user_set) / len(key_terms)
+        
+        return max(0.0, min(1.0, 0.3 * overlap + 0.3 * cosine + 0.4 * coverage))
+    
+    def _safe_to_accept(self, user_answer: str, correct_answer: str) -> bool:
+        """
+        Whether a high-overlap answer can be accepted without the LLM
+        
+        Term overlap cannot tell "X produces Y" from "X does not produce Y" or
+        "Z, not X, produces Y", so answers with a negation or with content
+        terms the expected answer lacks are left to the LLM.
+        """
+        user_set = set(self._terms(user_answer))
+        return not (user_set & NEGATIONS) and user_set <= set(self._terms(correct_answer))
+    
+    def pre_grade(self, user_answer: str, correct_answer: str, question_text: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Grade a short answer locally when the outcome is clear
+        
+        Only an exact normalized match, a clear miss (similarity at or below
+        SHORT_ANSWER_LOCAL_REJECT) or a high-similarity answer that adds no
+        negation and no new content terms is decided here.
+        
+        Args:
+            user_answer: User's answer
+            correct_answer: Expected answer
+            question_text: Original question
+            
+        Returns:
+            Evaluation result, or None when the answer needs the LLM
+        """
+        normalize = lambda text: " ".join(re.findall(r"\w+", text.lower()))
+        if not user_answer.strip():
+            return self._short_answer_result(0.0, f"No answer given. Expected answer: {correct_answer}")
+        if normalize(user_answer) == normalize(correct_answer):
+            return self._short_answer_result(1.0, "Correct - your answer matches the expected answer.")
+        
+        similarity = self.local_score(user_answer, correct_answer, question_text)
+        if similarity >= settings.SHORT_ANSWER_LOCAL_ACCEPT and self._safe_to_accept(user_answer, correct_answer):
+            return self._short_answer_result(1.0, f"Correct - your answer covers the expected answer: {correct_answer}")
+        if similarity <= settings.SHORT_ANSWER_LOCAL_REJECT:
+            return self._short_answer_result(
+                0.0,
+                f"Incorrect - your answer does not address the key points. Expected answer: {correct_answer}"
+            )
+        return None
+    
+    def grading_stats(self) -> Dict[str, Any]:
+        """
+        Get how many short answers were graded locally vs by the LLM
+        
+        Returns:
+            Counters plus the fraction graded locally
+        """
+        with self._stats_lock:
+            counters = dict(self.grading_counters)
+        total = counters["local"] + counters["llm"]
+        counters["local_fraction"] = round(counters["local"] / total, 3) if total else 0.0
+        return counters
+    
+    def _short_answer_result(self, score: float, feedback: str) -> Dict[str, Any]:
+        """Build a short answer evaluation result from a 0-1 score"""
+        score = max(0.0, min(1.0, score))  # Clamp between 0 and 1
+        return {
+            'is_correct': score >= 0.7,  # 70% or higher is considered correct
+            'points_earned': score,
+            'points_possible': 1.0,
+            'explanation': feedback
+        }
+    
+    def _parse_batch_grades(self, response: str, count: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Parse the JSON reply of a batch grading prompt
+        
+        Returns:
+            Map of item index to {'score', 'feedback'} for every parsable entry
+        """
+        text = response.strip()
+        fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+        if fenced:
+            text = fenced.group(1)
+        start, end = text.find('['), text.rfind(']')
+        if start == -1 or end == -1:
+            raise ValueError("No JSON array in batch grading response")
+        
+        grades = {}
+        for entry in json.loads(text[start:end + 1]):
+            try:
+                index = int(str(entry['id']).lstrip('Qq')) - 1
+                if 0 <= index < count:
+                    grades[index] = {
+                        'score': float(entry['score']),
+                        'feedback': str(entry.get('feedback', '')).strip() or "No feedback provided."
+                    }
+            except (KeyError, TypeError, ValueError):
+                continue
+        return grades
+    
+    def _grade_batch(self, items: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Grade several short answers with one LLM call"""
+        answers_section = "\n\n".join(
+            f"""ID: Q{i + 1}
+Question: {item['question_text']}
+Expected Answer: {item['correct_answer']}
+Student's Answer: {item['user_answer']}"""
+            for i, item in enumerate(items)
+        )
+        
+        prompt = f"""
+        Evaluate each of the following student answers to short answer questions.
+        Be fair and consider partial credit for partially correct answers.
+        
+        {answers_section}
+        
+        Respond with ONLY a JSON array containing one object per answer, in this format:
+        [{{"id": "Q1", "score": 0.0 to 1.0, "feedback": "Detailed feedback explaining the score, what was correct, what was missing, and suggestions"}}]
+        """
+        
+        response = self.gemini_client.generate_text(prompt, temperature=0.3)
+        return self._parse_batch_grades(response, len(items))
+    
+    def evaluate_short_answers(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Grade many short answers, batching them into as few LLM calls as possible
+        
+        Answers the local pre-grader decides confidently skip the LLM. The
+        rest are sent QUIZ_GRADING_BATCH_SIZE at a time in one structured
+        prompt. Items missing from an unparsable or partial batch reply are
+        graded one by one, QUIZ_GRADING_CONCURRENCY at a time.
+        
+        Args:
+            items: Dicts with question_text, correct_answer and user_answer
+            
+        Returns:
+            Evaluation results, in the same order as items
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        
+        # Clear cases (blank, near-identical or unrelated answers) are graded locally
+        for i, item in enumerate(items):
+            local = self.pre_grade(item['user_answer'], item['correct_answer'], item['question_text'])
+            if local is not None:
+                local['graded_locally'] = True
+                results[i] = local
+            else:
+                pending.append(i)
+        
+        with self._stats_lock:
+            self.grading_counters["local"] += len(items) - len(pending)
+            self.grading_counters["llm"] += len(pending)
+        
+        if len(pending) > 1:
+            batch_size = max(1, settings.QUIZ_GRADING_BATCH_SIZE)
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                try:
+                    grades = self._grade_batch([items[i] for i in batch])
+                except Exception as e:
+                    logger.warning(f"Batch grading failed, grading individually: {e}")
+                    grades = {}
+                for position, i in enumerate(batch):
+                    if position in grades:
+                        results[i] = self._short_answer_result(
+                            grades[position]['score'],
+                            grades[position]['feedback']
+                        )
+        
+        # Fallback: grade whatever the batch did not cover, concurrently
+        remaining = [i for i in pending if results[i] is None]
+        if remaining:
+            def grade(i):
+                return self.evaluate_short_answer(
+                    items[i]['user_answer'],
+                    items[i]['correct_answer'],
+                    items[i]['question_text']
+                )
+            
+            with ThreadPoolExecutor(max_workers=max(1, settings.QUIZ_GRADING_CONCURRENCY)) as executor:
+                for i, result in zip(remaining, executor.map(grade, remaining)):
+                    results[i] = result
+        
+        return results
+    
     def evaluate_quiz(
         self, 
         questions: List[Dict[str, Any]], 
@@ -181,6 +435,20 @@ class QuizEvaluator:
         # Create answer lookup
         answer_map = {ans['question_id']: ans['answer'] for ans in answers}
         
+        # Grade all short answers up front in as few LLM calls as possible
+        short_questions = [q for q in questions if q['question_type'] == 'short']
+        short_results = dict(zip(
+            [str(q['id']) for q in short_questions],
+            self.evaluate_short_answers([
+                {
+                    'question_text': q['question_text'],
+                    'correct_answer': q['correct_answer'],
+                    'user_answer': answer_map.get(str(q['id']), "")
+                }
+                for q in short_questions
+            ])
+        ))
+        
         for question in questions:
             question_id = str(question['id'])
             user_answer = answer_map.get(question_id, "")
@@ -205,11 +473,7 @@ class QuizEvaluator:
                     question['explanation']
                 )
             elif question['question_type'] == 'short':
-                result = self.evaluate_short_answer(
-                    user_answer,
-                    question['correct_answer'],
-                    question['question_text']
-                )
+                result = short_results[question_id]
             else:
                 result = {
                     'is_correct': False,
@@ -244,7 +508,11 @@ class QuizEvaluator:
             'correct_answers': correct_count,
             'points_earned': round(earned_points, 2),
             'points_possible': round(total_points, 2),
-            'feedback': results
+            'feedback': results,
+            'short_answers_graded_locally': sum(
+                1 for r in short_results.values() if r.get('graded_locally')
+            ),
+            'short_answers_total': len(short_results)
         }
 
 # Global evaluator instance
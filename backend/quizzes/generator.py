@@ -1,9 +1,13 @@
 """
 Quiz generator using RAG and Gemini AI
 """
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import json
 import re
+import time
+from config.settings import settings
+from core.context_builder import context_builder
 from utils.gemini_client import gemini_client
 
 class QuizGenerator:
@@ -11,12 +15,22 @@ class QuizGenerator:
     
     def __init__(self):
         self.gemini_client = gemini_client
+        self.context_builder = context_builder
+    
+    def _select_context(self, content: str, focus_terms: Optional[List[str]]) -> str:
+        """Pick the most relevant parts of the content within the quiz token budget"""
+        return self.context_builder.build_context(
+            content,
+            settings.QUIZ_CONTEXT_TOKENS,
+            focus_terms=focus_terms
+        )
     
     def generate_mcq_questions(
         self, 
         content: str, 
         num_questions: int, 
-        difficulty: str
+        difficulty: str,
+        focus_terms: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Generate multiple choice questions
@@ -25,6 +39,7 @@ class QuizGenerator:
             content: Source content
             num_questions: Number of questions to generate
             difficulty: Difficulty level
+            focus_terms: Document topics/keywords used to pick relevant content
             
         Returns:
             List of MCQ questions
@@ -36,6 +51,7 @@ class QuizGenerator:
         }
         
         instruction = difficulty_instructions.get(difficulty, difficulty_instructions["medium"])
+        context = self._select_context(content, focus_terms)
         
         prompt = f"""
         Generate {num_questions} multiple choice questions from the following content.
@@ -44,7 +60,7 @@ class QuizGenerator:
         {instruction}
         
         Content:
-        {content[:3000]}
+        {context}
         
         Format each question EXACTLY as follows:
         Q1: [Question text]
@@ -62,7 +78,7 @@ class QuizGenerator:
         """
         
         try:
-            response = self.gemini_client.generate_text(prompt, temperature=0.7)
+            response = self.gemini_client.generate_text(prompt, temperature=0.7, use_cache=False)
             questions = self._parse_mcq_response(response)
             return questions[:num_questions]
         except Exception as e:
@@ -72,16 +88,18 @@ class QuizGenerator:
         self, 
         content: str, 
         num_questions: int, 
-        difficulty: str
+        difficulty: str,
+        focus_terms: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """Generate short answer questions"""
         
+        context = self._select_context(content, focus_terms)
         prompt = f"""
         Generate {num_questions} short answer questions from the following content.
         Difficulty: {difficulty}
         
         Content:
-        {content[:3000]}
+        {context}
         
         Format each question as:
         Q1: [Question text]
@@ -94,7 +112,7 @@ class QuizGenerator:
         """
         
         try:
-            response = self.gemini_client.generate_text(prompt, temperature=0.7)
+            response = self.gemini_client.generate_text(prompt, temperature=0.7, use_cache=False)
             questions = self._parse_short_answer_response(response)
             return questions[:num_questions]
         except Exception as e:
@@ -104,16 +122,18 @@ class QuizGenerator:
         self, 
         content: str, 
         num_questions: int, 
-        difficulty: str
+        difficulty: str,
+        focus_terms: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """Generate true/false questions"""
         
+        context = self._select_context(content, focus_terms)
         prompt = f"""
         Generate {num_questions} true/false questions from the following content.
         Difficulty: {difficulty}
         
         Content:
-        {content[:3000]}
+        {context}
         
         Format each question as:
         Q1: [Statement]
@@ -124,7 +144,7 @@ class QuizGenerator:
         """
         
         try:
-            response = self.gemini_client.generate_text(prompt, temperature=0.7)
+            response = self.gemini_client.generate_text(prompt, temperature=0.7, use_cache=False)
             questions = self._parse_true_false_response(response)
             return questions[:num_questions]
         except Exception as e:
@@ -134,16 +154,18 @@ class QuizGenerator:
         self, 
         content: str, 
         num_questions: int, 
-        difficulty: str
+        difficulty: str,
+        focus_terms: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """Generate fill in the blank questions"""
         
+        context = self._select_context(content, focus_terms)
         prompt = f"""
         Generate {num_questions} fill in the blank questions from the following content.
         Difficulty: {difficulty}
         
         Content:
-        {content[:3000]}
+        {context}
         
         Format each question as:
         Q1: [Sentence with _____ for the blank]
@@ -153,7 +175,7 @@ class QuizGenerator:
         """
         
         try:
-            response = self.gemini_client.generate_text(prompt, temperature=0.7)
+            response = self.gemini_client.generate_text(prompt, temperature=0.7, use_cache=False)
             questions = self._parse_fill_blank_response(response)
             return questions[:num_questions]
         except Exception as e:
@@ -163,32 +185,85 @@ class QuizGenerator:
         self, 
         content: str, 
         num_questions: int, 
-        difficulty: str
+        difficulty: str,
+        focus_terms: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """Generate mixed question types"""
+        questions, _ = self.generate_mixed_questions_with_stats(
+            content, num_questions, difficulty, focus_terms
+        )
+        return questions
+    
+    def generate_mixed_questions_with_stats(
+        self, 
+        content: str, 
+        num_questions: int, 
+        difficulty: str,
+        focus_terms: Optional[List[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Generate mixed question types, one concurrent LLM call per type
         
-        questions = []
+        A type that fails is reported in the stats and left out; the quiz
+        only fails when every type fails.
+        
+        Args:
+            content: Source content
+            num_questions: Total number of questions
+            difficulty: Difficulty level
+            focus_terms: Document topics/keywords used to pick relevant content
+            
+        Returns:
+            Tuple of (questions, stats with per-type counts, timings and errors)
+        """
         questions_per_type = num_questions // 4
         remainder = num_questions % 4
         
-        # Generate each type
-        try:
-            questions.extend(self.generate_mcq_questions(
-                content, questions_per_type + (1 if remainder > 0 else 0), difficulty
-            ))
-            questions.extend(self.generate_short_answer_questions(
-                content, questions_per_type + (1 if remainder > 1 else 0), difficulty
-            ))
-            questions.extend(self.generate_true_false_questions(
-                content, questions_per_type + (1 if remainder > 2 else 0), difficulty
-            ))
-            questions.extend(self.generate_fill_blank_questions(
-                content, questions_per_type, difficulty
-            ))
-            
-            return questions[:num_questions]
-        except Exception as e:
-            raise Exception(f"Error generating mixed questions: {str(e)}")
+        # Select context once and share it across the question types
+        content = self._select_context(content, focus_terms)
+        
+        plan = [
+            ("mcq", self.generate_mcq_questions, questions_per_type + (1 if remainder > 0 else 0)),
+            ("short", self.generate_short_answer_questions, questions_per_type + (1 if remainder > 1 else 0)),
+            ("true_false", self.generate_true_false_questions, questions_per_type + (1 if remainder > 2 else 0)),
+            ("fill_blank", self.generate_fill_blank_questions, questions_per_type),
+        ]
+        plan = [(name, generate, count) for name, generate, count in plan if count > 0]
+        
+        def run(generate, count):
+            started = time.perf_counter()
+            try:
+                return generate(content, count, difficulty), None, time.perf_counter() - started
+            except Exception as e:
+                return [], str(e), time.perf_counter() - started
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(len(plan), settings.QUIZ_GENERATION_CONCURRENCY)) as executor:
+            futures = [executor.submit(run, generate, count) for _, generate, count in plan]
+            results = [future.result() for future in futures]
+        
+        questions = []
+        type_stats = {}
+        for (name, _, count), (generated, error, seconds) in zip(plan, results):
+            questions.extend(generated)
+            type_stats[name] = {
+                "requested": count,
+                "generated": len(generated),
+                "seconds": round(seconds, 2),
+                "error": error
+            }
+        
+        stats = {
+            "types": type_stats,
+            "total_seconds": round(time.perf_counter() - started, 2),
+            "partial": any(item["error"] for item in type_stats.values())
+        }
+        
+        if not questions:
+            errors = "; ".join(f"{name}: {item['error']}" for name, item in type_stats.items() if item["error"])
+            raise Exception(f"Error generating mixed questions: {errors or 'no questions generated'}")
+        
+        return questions[:num_questions], stats
     
     def _parse_mcq_response(self, response: str) -> List[Dict[str, Any]]:
         """Parse MCQ response from AI"""
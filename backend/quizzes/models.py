@@ -1,9 +1,10 @@
 """
 Quiz models for quiz generation and evaluation
 """
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
 import uuid
 import enum
 from config.database import Base
@@ -30,6 +31,10 @@ class Quiz(Base):
     document_references = Column(JSONB)  # Array of document IDs
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    # Children are removed by the ON DELETE CASCADE foreign keys
+    questions = relationship("QuizQuestion", back_populates="quiz", passive_deletes=True)
+    attempts = relationship("QuizAttempt", back_populates="quiz", passive_deletes=True)
+    
     def __repr__(self):
         return f"<Quiz {self.title}>"
 
@@ -45,6 +50,8 @@ class QuizQuestion(Base):
     explanation = Column(Text)
     difficulty = Column(SQLEnum(DifficultyLevel), default=DifficultyLevel.MEDIUM)
     
+    quiz = relationship("Quiz", back_populates="questions")
+    
     def __repr__(self):
         return f"<QuizQuestion {self.id} - {self.question_type}>"
 
@@ -62,5 +69,29 @@ class QuizAttempt(Base):
     completed_at = Column(DateTime(timezone=True))
     time_taken = Column(Integer)  # in seconds
     
+    quiz = relationship("Quiz", back_populates="attempts")
+    
     def __repr__(self):
         return f"<QuizAttempt {self.id} - Score: {self.score}>"
+
+class QuestionBankItem(Base):
+    """Pre-generated question for a document, copied into quizzes on demand"""
+    __tablename__ = "question_bank"
+    __table_args__ = (
+        Index("ix_question_bank_pool", "document_id", "question_type", "difficulty"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    question_text = Column(Text, nullable=False)
+    question_type = Column(SQLEnum(QuestionType), nullable=False)
+    options = Column(JSONB)
+    correct_answer = Column(Text, nullable=False)
+    explanation = Column(Text)
+    difficulty = Column(SQLEnum(DifficultyLevel), nullable=False, default=DifficultyLevel.MEDIUM)
+    question_hash = Column(String(64), nullable=False)  # Normalized question text, for de-duplication
+    times_served = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<QuestionBankItem {self.id} - {self.question_type}/{self.difficulty}>"
@@ -0,0 +1,301 @@
+"""
+Question bank
+Pre-generated questions per document, question type and difficulty, filled by
+background jobs so quiz creation is a database read instead of an LLM call
+"""
+import re
+from typing import Dict, List, Any, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from config.settings import settings
+from documents.extraction_cache import extraction_cache
+from documents.job_queue import job_queue
+from documents.models import Document, ProcessingJob, JobStatus
+from quizzes.generator import quiz_generator
+from quizzes.models import QuestionBankItem, QuestionType, DifficultyLevel
+from utils.helpers import hash_string
+from utils.logger import logger
+
+BANK_QUESTION_TYPES = ["mcq", "short", "true_false", "fill_blank"]
+FILL_JOB_TYPE = "fill_question_bank"
+
+class QuestionBank:
+    """
+    Pools of ready-made questions keyed by (document, question type, difficulty)
+    
+    - Quiz creation samples the least-served questions of the requested
+      documents; a question is retired after QUESTION_BANK_MAX_SERVES uses
+    - Pools are filled by fill_question_bank jobs after document processing
+      and topped up whenever a quiz leaves one below QUESTION_BANK_LOW_WATERMARK
+    """
+    
+    def __init__(self):
+        self.generators = {
+            "mcq": quiz_generator.generate_mcq_questions,
+            "short": quiz_generator.generate_short_answer_questions,
+            "true_false": quiz_generator.generate_true_false_questions,
+            "fill_blank": quiz_generator.generate_fill_blank_questions,
+        }
+    
+    @staticmethod
+    def _question_hash(text: str) -> str:
+        return hash_string(" ".join(re.findall(r"\w+", text.lower())))
+    
+    @staticmethod
+    def _type_plan(question_type: str, num_questions: int) -> Dict[str, int]:
+        """Questions needed per type (mixed quizzes use the generator's split)"""
+        if question_type != "mixed":
+            return {question_type: num_questions}
+        per_type, remainder = divmod(num_questions, len(BANK_QUESTION_TYPES))
+        plan = {
+            name: per_type + (1 if i < remainder else 0)
+            for i, name in enumerate(BANK_QUESTION_TYPES)
+        }
+        return {name: count for name, count in plan.items() if count > 0}
+    
+    @staticmethod
+    def _fresh(query):
+        return query.filter(QuestionBankItem.times_served < settings.QUESTION_BANK_MAX_SERVES)
+    
+    def pool_sizes(self, db: Session, document_ids: List, difficulty: str) -> Dict[tuple, int]:
+        """
+        Count servable questions per pool
+        
+        Args:
+            db: Database session
+            document_ids: Documents to count
+            difficulty: Difficulty level
+        
+        Returns:
+            Mapping of (document_id, question_type) to question count
+        """
+        rows = self._fresh(
+            db.query(
+                QuestionBankItem.document_id,
+                QuestionBankItem.question_type,
+                func.count(QuestionBankItem.id)
+            ).filter(
+                QuestionBankItem.document_id.in_(document_ids),
+                QuestionBankItem.difficulty == DifficultyLevel(difficulty)
+            )
+        ).group_by(QuestionBankItem.document_id, QuestionBankItem.question_type).all()
+        return {(str(document_id), qtype.value): count for document_id, qtype, count in rows}
+    
+    def sample(
+        self,
+        db: Session,
+        document_ids: List,
+        question_type: str,
+        difficulty: str,
+        num_questions: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Take questions for a quiz from the bank
+        
+        Least-served questions come first (ties broken randomly), so repeated
+        quizzes on the same documents rotate through the pool. The serve
+        counts are committed together with the caller's quiz.
+        
+        Args:
+            db: Database session
+            document_ids: Documents the quiz covers
+            question_type: Question type or "mixed"
+            difficulty: Difficulty level
+            num_questions: Number of questions wanted
+        
+        Returns:
+            Up to num_questions questions in the generator's format
+        """
+        questions = []
+        for qtype, count in self._type_plan(question_type, num_questions).items():
+            items = self._fresh(
+                db.query(QuestionBankItem).filter(
+                    QuestionBankItem.document_id.in_(document_ids),
+                    QuestionBankItem.question_type == QuestionType(qtype),
+                    QuestionBankItem.difficulty == DifficultyLevel(difficulty)
+                )
+            ).order_by(QuestionBankItem.times_served, func.random()).limit(count).all()
+            
+            for item in items:
+                item.times_served = QuestionBankItem.times_served + 1
+                questions.append({
+                    'question_text': item.question_text,
+                    'question_type': qtype,
+                    'options': item.options,
+                    'correct_answer': item.correct_answer,
+                    'explanation': item.explanation or ''
+                })
+        return questions
+    
+    def schedule_fill(
+        self,
+        db: Session,
+        document_id,
+        difficulty: str,
+        question_types: Optional[List[str]] = None
+    ) -> bool:
+        """
+        Queue a fill job unless one is already pending for the document and difficulty
+        
+        Args:
+            db: Database session
+            document_id: Document to fill pools for
+            difficulty: Difficulty level
+            question_types: Types to fill (all when omitted)
+        
+        Returns:
+            True if a job was queued
+        """
+        pending = db.query(ProcessingJob.id).filter(
+            ProcessingJob.document_id == document_id,
+            ProcessingJob.job_type == FILL_JOB_TYPE,
+            ProcessingJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+            ProcessingJob.payload["difficulty"].astext == difficulty
+        ).first()
+        if pending:
+            return False
+        
+        job_queue.enqueue(
+            db,
+            document_id,
+            job_type=FILL_JOB_TYPE,
+            payload={"difficulty": difficulty, "question_types": question_types or BANK_QUESTION_TYPES}
+        )
+        return True
+    
+    def prefill(self, db: Session, document_id):
+        """
+        Queue the initial fill for a newly processed document
+        
+        Args:
+            db: Database session
+            document_id: Document ID
+        """
+        if not settings.QUESTION_BANK_ENABLED:
+            return
+        for difficulty in settings.question_bank_prefill_difficulties:
+            self.schedule_fill(db, document_id, difficulty)
+    
+    def replenish(self, db: Session, document_ids: List, question_type: str, difficulty: str):
+        """
+        Queue top-ups for the pools a quiz drew from that are running low
+        
+        Args:
+            db: Database session
+            document_ids: Documents the quiz covered
+            question_type: Question type or "mixed"
+            difficulty: Difficulty level
+        """
+        try:
+            sizes = self.pool_sizes(db, document_ids, difficulty)
+            for document_id in document_ids:
+                low_types = [
+                    qtype for qtype in self._type_plan(question_type, len(BANK_QUESTION_TYPES))
+                    if sizes.get((str(document_id), qtype), 0) < settings.QUESTION_BANK_LOW_WATERMARK
+                ]
+                if low_types:
+                    self.schedule_fill(db, document_id, difficulty, low_types)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error scheduling question bank top-up: {str(e)}")
+    
+    def fill(
+        self,
+        db: Session,
+        document_id,
+        difficulty: str,
+        question_types: Optional[List[str]] = None
+    ) -> int:
+        """
+        Generate questions until each pool reaches QUESTION_BANK_POOL_SIZE
+        
+        Args:
+            db: Database session
+            document_id: Document ID
+            difficulty: Difficulty level
+            question_types: Types to fill (all when omitted)
+        
+        Returns:
+            Number of questions added
+        """
+        doc = db.query(Document).filter(Document.id == document_id).first()
+        if not doc:
+            return 0
+        
+        sizes = self.pool_sizes(db, [doc.id], difficulty)
+        needed = {
+            qtype: settings.QUESTION_BANK_POOL_SIZE - sizes.get((str(doc.id), qtype), 0)
+            for qtype in (question_types or BANK_QUESTION_TYPES)
+        }
+        needed = {qtype: count for qtype, count in needed.items() if count > 0}
+        if not needed:
+            return 0
+        
+        result = extraction_cache.get_content(doc, db)
+        if not result.get("success"):
+            raise Exception(f"Error extracting content for question bank: {result.get('error')}")
+        content = result.get("text") or ""
+        if len(content) < 200:
+            logger.info(f"Document {doc.id} has too little content for a question bank")
+            return 0
+        
+        # Retired questions make room for the new ones
+        db.query(QuestionBankItem).filter(
+            QuestionBankItem.document_id == doc.id,
+            QuestionBankItem.difficulty == DifficultyLevel(difficulty),
+            QuestionBankItem.times_served >= settings.QUESTION_BANK_MAX_SERVES
+        ).delete(synchronize_session=False)
+        
+        seen = {
+            question_hash for (question_hash,) in db.query(QuestionBankItem.question_hash).filter(
+                QuestionBankItem.document_id == doc.id
+            )
+        }
+        focus_terms = (doc.topics or []) + (doc.keywords or [])
+        
+        added = 0
+        errors = []
+        for qtype, count in needed.items():
+            try:
+                generated = self.generators[qtype](content, count, difficulty, focus_terms=focus_terms)
+            except Exception as e:
+                errors.append(f"{qtype}: {str(e)}")
+                continue
+            
+            for q_data in generated:
+                question_hash = self._question_hash(q_data['question_text'])
+                if question_hash in seen:
+                    continue
+                seen.add(question_hash)
+                db.add(QuestionBankItem(
+                    document_id=doc.id,
+                    question_text=q_data['question_text'],
+                    question_type=QuestionType(q_data['question_type']),
+                    options=q_data.get('options'),
+                    correct_answer=q_data['correct_answer'],
+                    explanation=q_data.get('explanation', ''),
+                    difficulty=DifficultyLevel(difficulty),
+                    question_hash=question_hash
+                ))
+                added += 1
+        db.commit()
+        
+        logger.info(f"Question bank: added {added} {difficulty} questions for document {doc.id}")
+        if errors and not added:
+            raise Exception(f"Error filling question bank: {'; '.join(errors)}")
+        return added
+
+def fill_question_bank_job(db: Session, job: ProcessingJob):
+    """Job queue handler for fill_question_bank jobs"""
+    payload = job.payload or {}
+    question_bank.fill(
+        db,
+        job.document_id,
+        payload.get("difficulty", "medium"),
+        payload.get("question_types")
+    )
+
+# Global question bank instance
+question_bank = QuestionBank()
+
+job_queue.register(FILL_JOB_TYPE, fill_question_bank_job)
@@ -48,6 +48,7 @@ class QuizResponse(BaseModel):
     question_type: str
     created_at: datetime
     questions: List[QuestionResponse] = []
+    generation_stats: Optional[Dict[str, Any]] = None  # Per-type timing, set on mixed quiz generation
     
     # Computed fields for frontend compatibility
     @computed_field
@@ -1,11 +1,12 @@
 """
 Quiz API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Tuple
 from datetime import datetime, timezone
 from config.database import get_db
+from config.settings import settings
 from quizzes.models import Quiz, QuizQuestion, QuizAttempt, DifficultyLevel, QuestionType
 from quizzes.schemas import (
     QuizCreate, QuizResponse, QuestionResponse, QuizSubmission,
@@ -16,70 +17,39 @@ from users.auth import get_current_user
 from users.models import User
 from quizzes.generator import quiz_generator
 from quizzes.evaluator import quiz_evaluator
-from core.rag_pipeline import rag_pipeline
-from documents.upload_handler import upload_handler
+from quizzes.question_bank import question_bank
+from progress.dashboard_cache import dashboard_cache
+from documents.extraction_cache import extraction_cache
 from utils.logger import logger
 
 router = APIRouter(prefix="/api/quizzes", tags=["quizzes"])
 
-@router.post("/generate", response_model=QuizResponse, status_code=status.HTTP_201_CREATED)
-def generate_quiz(
+def _generate_questions(
     quiz_data: QuizCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+    documents: List[Document],
+    num_questions: int,
+    db: Session
+) -> Tuple[List[dict], Optional[dict]]:
     """
-    Generate a new quiz from documents with on-demand content extraction
+    Generate quiz questions with the LLM from the documents' content
     
     Args:
         quiz_data: Quiz creation data
-        current_user: Current authenticated user
+        documents: Documents to draw content from
+        num_questions: Number of questions to generate
         db: Database session
         
     Returns:
-        Generated quiz with questions
+        Tuple of (questions, generation stats for mixed quizzes)
     """
-    logger.info(f"Generating quiz for user {current_user.email}")
-    logger.info(f"Document IDs: {quiz_data.document_ids}")
-    logger.info(f"Question type: {quiz_data.question_type.value}, Difficulty: {quiz_data.difficulty.value}")
-    
-    # Validate documents
-    documents = db.query(Document).filter(
-        Document.id.in_([str(doc_id) for doc_id in quiz_data.document_ids]),
-        Document.user_id == current_user.id
-    ).all()
-    
-    if not documents:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No documents found"
-        )
-    
-    logger.info(f"Found {len(documents)} documents")
-    
-    # Extract content from all documents on-demand
+    # Extract content from all documents on-demand (read through the extraction cache)
     extracted_contents = []
     for doc in documents:
         try:
             content = None
-            if doc.content_type.value == "youtube":
-                logger.info(f"Extracting YouTube content from {doc.file_url}")
-                result = rag_pipeline.process_youtube(doc.file_url)
-                if result.get("success"):
-                    content = result.get("text")
-            elif doc.content_type.value == "article":
-                logger.info(f"Extracting web article content from {doc.file_url}")
-                result = rag_pipeline.process_webpage(doc.file_url)
-                if result.get("success"):
-                    content = result.get("text")
-            elif doc.file_path:
-                logger.info(f"Extracting file content from {doc.file_path}")
-                result = upload_handler.extract_content_on_demand(
-                    doc.file_path, 
-                    doc.content_type.value
-                )
-                if result.get("success"):
-                    content = result.get("text")
+            result = extraction_cache.get_content(doc, db)
+            if result.get("success"):
+                content = result.get("text")
             
             if content and len(content) > 100:
                 extracted_contents.append(content)
@@ -99,6 +69,11 @@ def generate_quiz(
     combined_content = "\n\n".join(extracted_contents)
     logger.info(f"Combined content length: {len(combined_content)} characters")
     
+    # Document topics and keywords steer which parts of the content reach the prompt
+    focus_terms = []
+    for doc in documents:
+        focus_terms.extend((doc.topics or []) + (doc.keywords or []))
+    
     if len(combined_content) < 200:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -106,43 +81,122 @@ def generate_quiz(
         )
     
     # Generate questions based on type
+    generation_stats = None
     try:
         if quiz_data.question_type.value == "mcq":
             generated_questions = quiz_generator.generate_mcq_questions(
                 combined_content,
-                quiz_data.num_questions,
-                quiz_data.difficulty.value
+                num_questions,
+                quiz_data.difficulty.value,
+                focus_terms=focus_terms
             )
         elif quiz_data.question_type.value == "short":
             generated_questions = quiz_generator.generate_short_answer_questions(
                 combined_content,
-                quiz_data.num_questions,
-                quiz_data.difficulty.value
+                num_questions,
+                quiz_data.difficulty.value,
+                focus_terms=focus_terms
             )
         elif quiz_data.question_type.value == "true_false":
             generated_questions = quiz_generator.generate_true_false_questions(
                 combined_content,
-                quiz_data.num_questions,
-                quiz_data.difficulty.value
+                num_questions,
+                quiz_data.difficulty.value,
+                focus_terms=focus_terms
             )
         elif quiz_data.question_type.value == "fill_blank":
             generated_questions = quiz_generator.generate_fill_blank_questions(
                 combined_content,
-                quiz_data.num_questions,
-                quiz_data.difficulty.value
+                num_questions,
+                quiz_data.difficulty.value,
+                focus_terms=focus_terms
             )
         else:  # mixed
-            generated_questions = quiz_generator.generate_mixed_questions(
+            generated_questions, generation_stats = quiz_generator.generate_mixed_questions_with_stats(
                 combined_content,
-                quiz_data.num_questions,
-                quiz_data.difficulty.value
+                num_questions,
+                quiz_data.difficulty.value,
+                focus_terms=focus_terms
             )
+            logger.info(f"Mixed quiz generation stats: {generation_stats}")
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate quiz: {str(e)}"
         )
     
+    return generated_questions, generation_stats
+
+@router.post("/generate", response_model=QuizResponse, status_code=status.HTTP_201_CREATED)
+def generate_quiz(
+    quiz_data: QuizCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate a new quiz from documents
+    
+    Questions come from the pre-generated question bank; only a shortfall
+    is generated with the LLM (with on-demand content extraction).
+    
+    Args:
+        quiz_data: Quiz creation data
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        Generated quiz with questions
+    """
+    logger.info(f"Generating quiz for user {current_user.email}")
+    logger.info(f"Document IDs: {quiz_data.document_ids}")
+    logger.info(f"Question type: {quiz_data.question_type.value}, Difficulty: {quiz_data.difficulty.value}")
+    
+    # Validate documents
+    documents = db.query(Document).filter(
+        Document.id.in_([str(doc_id) for doc_id in quiz_data.document_ids]),
+        Document.user_id == current_user.id
+    ).all()
+    
+    if not documents:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No documents found"
+        )
+    
+    logger.info(f"Found {len(documents)} documents")
+    
+    # Serve what we can from the pre-generated question bank
+    document_ids = [doc.id for doc in documents]
+    banked_questions = []
+    if settings.QUESTION_BANK_ENABLED:
+        banked_questions = question_bank.sample(
+            db,
+            document_ids,
+            quiz_data.question_type.value,
+            quiz_data.difficulty.value,
+            quiz_data.num_questions
+        )
+        logger.info(f"Question bank supplied {len(banked_questions)}/{quiz_data.num_questions} questions")
+    
+    # Generate the rest with the LLM
+    generated_questions, generation_stats = [], None
+    shortfall = quiz_data.num_questions - len(banked_questions)
+    if shortfall > 0:
+        try:
+            generated_questions, generation_stats = _generate_questions(quiz_data, documents, shortfall, db)
+        except HTTPException as e:
+            if not banked_questions:
+                raise
+            logger.warning(f"Live generation failed, serving {len(banked_questions)} banked questions: {e.detail}")
+    
+    if banked_questions:
+        generation_stats = {
+            **(generation_stats or {}),
+            "bank_questions": len(banked_questions),
+            "generated_questions": len(generated_questions)
+        }
+    generated_questions = banked_questions + generated_questions
+    
     if not generated_questions:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -179,6 +233,10 @@ def generate_quiz(
     db.commit()
     db.refresh(new_quiz)
     
+    # Top up the pools this quiz drew from in the background
+    if settings.QUESTION_BANK_ENABLED:
+        question_bank.replenish(db, document_ids, quiz_data.question_type.value, quiz_data.difficulty.value)
+    
     # Prepare response
     return QuizResponse(
         id=new_quiz.id,
@@ -196,7 +254,8 @@ def generate_quiz(
                 options=q.options,
                 difficulty=q.difficulty
             ) for q in question_objects
-        ]
+        ],
+        generation_stats=generation_stats
     )
 
 @router.get("/", response_model=List[QuizResponse])
@@ -214,16 +273,15 @@ def list_quizzes(
     Returns:
         List of quizzes
     """
-    quizzes = db.query(Quiz).filter(
+    # Questions for all quizzes are loaded in one extra query
+    quizzes = db.query(Quiz).options(
+        selectinload(Quiz.questions)
+    ).filter(
         Quiz.user_id == current_user.id
     ).order_by(Quiz.created_at.desc()).all()
     
     result = []
     for quiz in quizzes:
-        questions = db.query(QuizQuestion).filter(
-            QuizQuestion.quiz_id == quiz.id
-        ).all()
-        
         result.append(QuizResponse(
             id=quiz.id,
             user_id=quiz.user_id,
@@ -239,80 +297,101 @@ def list_quizzes(
                     question_type=q.question_type,
                     options=q.options,
                     difficulty=q.difficulty
-                ) for q in questions
+                ) for q in quiz.questions
             ]
         ))
     
     return result
 
+def _compute_quiz_analytics(db: Session, user_id) -> dict:
+    """
+    Aggregate a user's quiz totals, scores and per-topic performance
+    
+    Args:
+        db: Database session
+        user_id: User ID
+        
+    Returns:
+        Quiz analytics dict
+    """
+    from sqlalchemy import func
+    
+    # Get total quizzes
+    total_quizzes = db.query(Quiz).filter(
+        Quiz.user_id == user_id
+    ).count()
+    
+    # Get total attempts
+    total_attempts = db.query(QuizAttempt).filter(
+        QuizAttempt.user_id == user_id
+    ).count()
+    
+    # Get average and best scores
+    score_stats = db.query(
+        func.avg(QuizAttempt.score).label('avg_score'),
+        func.max(QuizAttempt.score).label('max_score')
+    ).filter(
+        QuizAttempt.user_id == user_id,
+        QuizAttempt.completed_at.isnot(None)
+    ).first()
+    
+    average_score = float(score_stats.avg_score) if score_stats.avg_score else 0.0
+    best_score = float(score_stats.max_score) if score_stats.max_score else 0.0
+    
+    # Get topic performance
+    topics_data = db.query(
+        Quiz.title,
+        func.count(QuizAttempt.id).label('attempt_count'),
+        func.avg(QuizAttempt.score).label('avg_score')
+    ).join(
+        QuizAttempt, Quiz.id == QuizAttempt.quiz_id
+    ).filter(
+        Quiz.user_id == user_id,
+        QuizAttempt.completed_at.isnot(None)
+    ).group_by(Quiz.title).all()
+    
+    topics = [
+        {
+            'topic': topic[0] or 'General',
+            'count': topic[1],
+            'average_score': float(topic[2]) if topic[2] else 0.0
+        }
+        for topic in topics_data
+    ]
+    
+    return {
+        'total_quizzes': total_quizzes,
+        'total_attempts': total_attempts,
+        'average_score': average_score,
+        'best_score': best_score,
+        'topics': topics
+    }
+
 @router.get("/analytics", response_model=dict)
 def get_quiz_analytics(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get quiz analytics for current user
     
+    Served from the per-user dashboard cache with an ETag; errors fall back
+    to zeroed analytics and are not cached.
+    
     Args:
+        request: Incoming request
         current_user: Current authenticated user
         db: Database session
         
     Returns:
         Quiz analytics including total quizzes, attempts, scores, and topic performance
     """
-    from sqlalchemy import func
-    
     try:
-        # Get total quizzes
-        total_quizzes = db.query(Quiz).filter(
-            Quiz.user_id == current_user.id
-        ).count()
-        
-        # Get total attempts
-        total_attempts = db.query(QuizAttempt).filter(
-            QuizAttempt.user_id == current_user.id
-        ).count()
-        
-        # Get average and best scores
-        score_stats = db.query(
-            func.avg(QuizAttempt.score).label('avg_score'),
-            func.max(QuizAttempt.score).label('max_score')
-        ).filter(
-            QuizAttempt.user_id == current_user.id,
-            QuizAttempt.completed_at.isnot(None)
-        ).first()
-        
-        average_score = float(score_stats.avg_score) if score_stats.avg_score else 0.0
-        best_score = float(score_stats.max_score) if score_stats.max_score else 0.0
-        
-        # Get topic performance
-        topics_data = db.query(
-            Quiz.title,
-            func.count(QuizAttempt.id).label('attempt_count'),
-            func.avg(QuizAttempt.score).label('avg_score')
-        ).join(
-            QuizAttempt, Quiz.id == QuizAttempt.quiz_id
-        ).filter(
-            Quiz.user_id == current_user.id,
-            QuizAttempt.completed_at.isnot(None)
-        ).group_by(Quiz.title).all()
-        
-        topics = [
-            {
-                'topic': topic[0] or 'General',
-                'count': topic[1],
-                'average_score': float(topic[2]) if topic[2] else 0.0
-            }
-            for topic in topics_data
-        ]
-        
-        return {
-            'total_quizzes': total_quizzes,
-            'total_attempts': total_attempts,
-            'average_score': average_score,
-            'best_score': best_score,
-            'topics': topics
-        }
+        return dashboard_cache.respond(
+            request, current_user.id, "quiz_analytics",
+            lambda: _compute_quiz_analytics(db, current_user.id)
+        )
     except Exception as e:
         logger.error(f"Error fetching quiz analytics: {str(e)}", exc_info=True)
         # Return default values on error
@@ -560,6 +639,12 @@ def submit_quiz(
             logger.info(f"Evaluating quiz {quiz_id} for user {current_user.email}")
             evaluation = quiz_evaluator.evaluate_quiz(question_data, answer_data)
             logger.info(f"Evaluation complete: Score {evaluation['score']}%, Correct: {evaluation['correct_answers']}/{evaluation['total_questions']}")
+            if evaluation['short_answers_total']:
+                logger.info(
+                    f"Short answers graded locally: {evaluation['short_answers_graded_locally']}/"
+                    f"{evaluation['short_answers_total']} (overall local fraction "
+                    f"{quiz_evaluator.grading_stats()['local_fraction']})"
+                )
         except Exception as e:
             logger.error(f"Error evaluating quiz: {str(e)}", exc_info=True)
             raise HTTPException(
@@ -765,10 +850,8 @@ def delete_quiz(
                 detail="Quiz not found"
             )
         
-        # Delete associated questions and attempts
-        db.query(QuizQuestion).filter(QuizQuestion.quiz_id == uuid_obj).delete()
-        db.query(QuizAttempt).filter(QuizAttempt.quiz_id == uuid_obj).delete()
-        
+        # Questions and attempts are removed by ON DELETE CASCADE (after the
+        # progress counters have subtracted the attempts)
         db.delete(quiz)
         db.commit()
         logger.info(f"Quiz {quiz_id} deleted successfully by user {current_user.email}")
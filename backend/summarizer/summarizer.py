@@ -1,27 +1,174 @@
 """
 Summarizer using RAG and Gemini
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, AsyncIterator
+from config.settings import settings
+from core.context_builder import context_builder
+from core.vector_store import vector_store
 from utils.gemini_client import gemini_client
+from utils.helpers import CHARS_PER_TOKEN, estimate_tokens, hash_string
+from utils.llm_cache import LLMCache
 from utils.logger import logger
 
+# Bump to invalidate cached partial summaries after changing the map prompt
+PARTIAL_SUMMARY_VERSION = "1"
+
+MAP_PROMPT = """You are summarizing one section of a longer document. Another step will
+combine the summaries of all sections, so keep every key concept, definition, fact,
+figure, formula and example from this section. Use concise bullet points and do not
+add an introduction or conclusion.
+
+SECTION:
+{chunk}
+
+SECTION SUMMARY:"""
+
 class Summarizer:
     """Generate summaries from content"""
     
     def __init__(self):
         self.gemini_client = gemini_client
+        self.context_builder = context_builder
+        self.vector_store = vector_store
+        # Partial (per-chunk) summaries are length-independent, so short, medium
+        # and detailed requests for the same document all reuse them
+        self.partial_cache = LLMCache(path=settings.SUMMARY_PARTIAL_CACHE_PATH)
+    
+    def _needs_map_reduce(self, content: str) -> bool:
+        return estimate_tokens(content) > settings.SUMMARY_CONTEXT_TOKENS
+    
+    def _split(self, content: str) -> List[str]:
+        return self.vector_store.chunk_text(
+            content,
+            max_tokens=settings.SUMMARY_CHUNK_CHARS // CHARS_PER_TOKEN,
+            overlap_tokens=settings.SUMMARY_CHUNK_OVERLAP // CHARS_PER_TOKEN
+        )
+    
+    @staticmethod
+    def _partial_key(chunk: str) -> str:
+        return hash_string(f"{PARTIAL_SUMMARY_VERSION}:{settings.GEMINI_MODEL}:{chunk}")
+    
+    def _summarize_chunk(self, chunk: str) -> str:
+        """Map step for one chunk, served from the partial cache when possible"""
+        key = self._partial_key(chunk)
+        cached = self.partial_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        partial = self.gemini_client.generate_text(MAP_PROMPT.format(chunk=chunk), temperature=0.2)
+        self.partial_cache.set(key, partial)
+        return partial
     
-    def generate_summary(self, content: str, length: str = "medium", custom_prompt: str = None) -> str:
+    async def _summarize_chunk_async(self, chunk: str, limiter: asyncio.Semaphore) -> str:
+        """Async map step for one chunk (the SQLite cache is used off the event loop)"""
+        key = self._partial_key(chunk)
+        cached = await asyncio.to_thread(self.partial_cache.get, key)
+        if cached is not None:
+            return cached
+        
+        async with limiter:
+            partial = await self.gemini_client.generate_text_async(MAP_PROMPT.format(chunk=chunk), temperature=0.2)
+        await asyncio.to_thread(self.partial_cache.set, key, partial)
+        return partial
+    
+    @staticmethod
+    def _combine(partials: List[str]) -> str:
+        sections = [f"[Section {i + 1}]\n{partial.strip()}" for i, partial in enumerate(partials)]
+        return (
+            "The following are summaries of consecutive sections of one long document, in order.\n\n"
+            + "\n\n".join(sections)
+        )
+    
+    def condense(self, content: str) -> str:
         """
-        Generate summary from content
+        Map stage of map-reduce summarization
+        
+        Content over SUMMARY_CONTEXT_TOKENS is split into chunks that are
+        summarized concurrently (SUMMARY_MAP_CONCURRENCY at a time); the
+        partial summaries replace the content, repeating level by level until
+        they fit the budget. The reduce step is the normal summary prompt.
+        
+        Args:
+            content: Document content
+            
+        Returns:
+            Content, or combined partial summaries covering all of it
+        """
+        level = 0
+        while self._needs_map_reduce(content):
+            chunks = self._split(content)
+            if len(chunks) < 2 and level > 0:
+                break
+            level += 1
+            logger.info(f"Map-reduce summary level {level}: {len(chunks)} chunks")
+            
+            with ThreadPoolExecutor(max_workers=settings.SUMMARY_MAP_CONCURRENCY) as executor:
+                partials = list(executor.map(self._summarize_chunk, chunks))
+            
+            condensed = self._combine(partials)
+            if len(condensed) >= len(content):
+                # Not shrinking - let the context builder select from what we have
+                break
+            content = condensed
+        return content
+    
+    async def condense_async(self, content: str) -> str:
+        """
+        Async version of condense
+        
+        Args:
+            content: Document content
+            
+        Returns:
+            Content, or combined partial summaries covering all of it
+        """
+        level = 0
+        while self._needs_map_reduce(content):
+            chunks = self._split(content)
+            if len(chunks) < 2 and level > 0:
+                break
+            level += 1
+            logger.info(f"Map-reduce summary level {level}: {len(chunks)} chunks")
+            
+            limiter = asyncio.Semaphore(settings.SUMMARY_MAP_CONCURRENCY)
+            partials = await asyncio.gather(
+                *(self._summarize_chunk_async(chunk, limiter) for chunk in chunks)
+            )
+            
+            condensed = self._combine(list(partials))
+            if len(condensed) >= len(content):
+                break
+            content = condensed
+        return content
+    
+    def build_prompt(
+        self, 
+        content: str, 
+        length: str = "medium", 
+        custom_prompt: str = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> str:
+        """
+        Build the summary prompt for content
         
         Args:
             content: Document content
             length: Summary length (short, medium, detailed)
             custom_prompt: Optional custom instructions
+            focus_terms: Document topics/keywords used to pick relevant content
             
         Returns:
-            Generated summary
+            Prompt text
         """
+        # Keep the prompt within budget by selecting the most relevant content
+        content = self.context_builder.build_context(
+            content,
+            settings.SUMMARY_CONTEXT_TOKENS,
+            focus_terms=focus_terms
+        )
+        
         # Define summary styles based on length
         length_configs = {
             "short": {
@@ -60,14 +207,80 @@ CONTENT TO SUMMARIZE:
 
 SUMMARY:"""
         
+        return prompt
+    
+    def generate_summary(
+        self, 
+        content: str, 
+        length: str = "medium", 
+        custom_prompt: str = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> str:
+        """
+        Generate summary from content
+        
+        Args:
+            content: Document content
+            length: Summary length (short, medium, detailed)
+            custom_prompt: Optional custom instructions
+            focus_terms: Document topics/keywords used to pick relevant content
+            
+        Returns:
+            Generated summary
+        """
         try:
-            logger.info(f"Generating {length} summary, content length: {len(content)} characters")
+            prompt = self.build_prompt(self.condense(content), length, custom_prompt, focus_terms)
+            logger.info(f"Generating {length} summary, prompt length: {len(prompt)} characters")
             summary = self.gemini_client.generate_text(prompt, temperature=0.3)
             logger.info(f"Summary generated: {len(summary)} characters")
             return summary
         except Exception as e:
             logger.error(f"Error generating summary: {str(e)}")
             raise Exception(f"Error generating summary: {str(e)}")
+    
+    async def generate_summary_async(
+        self, 
+        content: str, 
+        length: str = "medium", 
+        custom_prompt: str = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> str:
+        """
+        Generate summary without blocking the event loop (same arguments as generate_summary)
+        
+        Returns:
+            Generated summary
+        """
+        try:
+            content = await self.condense_async(content)
+            prompt = self.build_prompt(content, length, custom_prompt, focus_terms)
+            logger.info(f"Generating {length} summary, prompt length: {len(prompt)} characters")
+            summary = await self.gemini_client.generate_text_async(prompt, temperature=0.3)
+            logger.info(f"Summary generated: {len(summary)} characters")
+            return summary
+        except Exception as e:
+            logger.error(f"Error generating summary: {str(e)}")
+            raise Exception(f"Error generating summary: {str(e)}")
+
+    async def stream_summary(
+        self, 
+        content: str, 
+        length: str = "medium", 
+        custom_prompt: str = None,
+        focus_terms: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a summary as Gemini generates it (same arguments as generate_summary)
+        
+        Yields:
+            Summary text chunks in order
+        """
+        content = await self.condense_async(content)
+        prompt = self.build_prompt(content, length, custom_prompt, focus_terms)
+        logger.info(f"Streaming {length} summary, prompt length: {len(prompt)} characters")
+        
+        async for chunk in self.gemini_client.stream_text_async(prompt, temperature=0.3):
+            yield chunk
 
 # Global summarizer instance
 summarizer = Summarizer()
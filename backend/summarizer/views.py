@@ -2,20 +2,83 @@
 Summary API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from config.database import get_db
+from config.database import get_db, save_in_new_session
 from summarizer.models import Summary
 from summarizer.schemas import SummaryCreate, SummaryResponse
 from documents.models import Document, ProcessingStatus
-from documents.upload_handler import upload_handler
+from documents.extraction_cache import extraction_cache
 from users.auth import get_current_user
 from users.models import User
 from summarizer.summarizer import summarizer
-from core.rag_pipeline import rag_pipeline
+from utils.helpers import format_sse
 from utils.logger import logger
 
 router = APIRouter(prefix="/api/summaries", tags=["summaries"])
 
+async def _load_document_content(summary_data: SummaryCreate, current_user: User, db: Session):
+    """
+    Get the user's document and its extracted content
+    
+    Args:
+        summary_data: Summary creation data
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        Tuple of (document, content)
+    """
+    # Check if document exists and belongs to user
+    document = db.query(Document).filter(
+        Document.id == summary_data.document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    logger.info(f"Generating summary for document {document.id} by user {current_user.email}")
+    logger.info(f"Summary type: {summary_data.summary_length.value}")
+    
+    # Extract content on-demand (served from the extraction cache when possible)
+    # Extraction can parse files or fetch URLs, so run it off the event loop
+    content = None
+    try:
+        result = await run_in_threadpool(extraction_cache.get_content, document, db)
+        if result.get("success"):
+            content = result.get("text")
+        else:
+            logger.error(f"Content extraction failed: {result.get('error')}")
+    except Exception as extract_error:
+        logger.error(f"Content extraction error: {extract_error}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to extract document content: {str(extract_error)}"
+        )
+    
+    if not content:
+        logger.error("No content extracted from document")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not extract content from document. Please ensure the document is accessible and has content."
+        )
+    
+    logger.info(f"Content extracted successfully, length: {len(content)} characters")
+    
+    # Check minimum content length
+    if len(content) < 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Document content is too short for summarization (minimum 100 characters required)"
+        )
+    
+    return document, content
+
 @router.post("/generate", response_model=SummaryResponse, status_code=status.HTTP_201_CREATED)
 async def generate_summary(
     summary_data: SummaryCreate,
@@ -34,77 +97,15 @@ async def generate_summary(
         Generated summary
     """
     try:
-        # Check if document exists and belongs to user
-        document = db.query(Document).filter(
-            Document.id == summary_data.document_id,
-            Document.user_id == current_user.id
-        ).first()
-        
-        if not document:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Document not found"
-            )
-        
-        logger.info(f"Generating summary for document {document.id} by user {current_user.email}")
-        logger.info(f"Summary type: {summary_data.summary_length.value}")
-        
-        # Extract content on-demand based on document type
-        content = None
-        try:
-            if document.content_type.value == "youtube":
-                logger.info(f"Extracting YouTube content from {document.file_url}")
-                result = rag_pipeline.process_youtube(document.file_url)
-                if result.get("success"):
-                    content = result.get("text")
-                else:
-                    logger.error(f"YouTube extraction failed: {result.get('error')}")
-            elif document.content_type.value == "article":
-                logger.info(f"Extracting web article content from {document.file_url}")
-                result = rag_pipeline.process_webpage(document.file_url)
-                if result.get("success"):
-                    content = result.get("text")
-                else:
-                    logger.error(f"Article extraction failed: {result.get('error')}")
-            elif document.file_path:
-                logger.info(f"Extracting file content from {document.file_path}")
-                result = upload_handler.extract_content_on_demand(
-                    document.file_path, 
-                    document.content_type.value
-                )
-                if result.get("success"):
-                    content = result.get("text")
-                else:
-                    logger.error(f"File extraction failed: {result.get('error')}")
-        except Exception as extract_error:
-            logger.error(f"Content extraction error: {extract_error}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to extract document content: {str(extract_error)}"
-            )
-        
-        if not content:
-            logger.error("No content extracted from document")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Could not extract content from document. Please ensure the document is accessible and has content."
-            )
-        
-        logger.info(f"Content extracted successfully, length: {len(content)} characters")
-        
-        # Check minimum content length
-        if len(content) < 100:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Document content is too short for summarization (minimum 100 characters required)"
-            )
+        document, content = await _load_document_content(summary_data, current_user, db)
         
         # Generate summary using Gemini AI
         try:
             logger.info(f"Starting AI summary generation...")
-            summary_text = summarizer.generate_summary(
+            summary_text = await summarizer.generate_summary_async(
                 content,
-                summary_data.summary_length.value
+                summary_data.summary_length.value,
+                focus_terms=(document.topics or []) + (document.keywords or [])
             )
             logger.info(f"Summary generated successfully, length: {len(summary_text)} characters")
         except Exception as gen_error:
@@ -139,6 +140,60 @@ async def generate_summary(
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+@router.post("/generate/stream")
+async def generate_summary_stream(
+    summary_data: SummaryCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate a summary and stream it as Server-Sent Events
+    
+    Events: "chunk" ({"text": ...}) as Gemini produces text, then "done" with
+    the saved summary, or "error" ({"detail": ...}) if generation fails.
+    
+    Args:
+        summary_data: Summary creation data
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        text/event-stream response
+    """
+    document, content = await _load_document_content(summary_data, current_user, db)
+    focus_terms = (document.topics or []) + (document.keywords or [])
+    user_id = current_user.id
+    
+    async def event_stream():
+        parts = []
+        try:
+            async for chunk in summarizer.stream_summary(
+                content,
+                summary_data.summary_length.value,
+                focus_terms=focus_terms
+            ):
+                parts.append(chunk)
+                yield format_sse("chunk", {"text": chunk})
+            
+            # The request session is closed once streaming starts - save with a new one
+            new_summary = await run_in_threadpool(save_in_new_session, Summary(
+                user_id=user_id,
+                document_id=summary_data.document_id,
+                summary_text="".join(parts),
+                summary_length=summary_data.summary_length
+            ))
+            logger.info(f"Streamed summary saved to database with ID: {new_summary.id}")
+            yield format_sse("done", SummaryResponse.from_orm(new_summary).model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"Streaming summary generation failed: {e}", exc_info=True)
+            yield format_sse("error", {"detail": f"Failed to generate summary: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/", response_model=list[SummaryResponse])
 def get_all_summaries(
     current_user: User = Depends(get_current_user),
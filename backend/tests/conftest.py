@@ -0,0 +1,9 @@
+"""
+Shared test setup
+"""
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
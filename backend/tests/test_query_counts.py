@@ -0,0 +1,125 @@
+"""
+Query-count regression tests: quiz listing and progress analytics must issue
+the same number of SQL statements however many quizzes and attempts a user has
+
+Needs PostgreSQL (UUID/JSONB columns); set TEST_DATABASE_URL or the test is
+skipped. Every test runs in a transaction that is rolled back.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from config.database import Base
+from users.models import User
+from documents.models import Document, ProcessingJob
+from notes.models import Note
+from summarizer.models import Summary
+from quizzes.models import Quiz, QuizQuestion, QuizAttempt, QuestionType, QuestionBankItem
+from progress.models import UserProgress, ActivityLog, UserDailyActivity
+from career.models import Resume, ResumeAnalysis, CareerRecommendation
+from quizzes.views import list_quizzes, _compute_quiz_analytics
+from progress.analytics import progress_analytics
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+@pytest.fixture
+def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL)
+    try:
+        connection = engine.connect()
+    except OperationalError as e:
+        pytest.skip(f"Test database unavailable: {e}")
+    
+    # Every model is imported above, so this creates the full schema
+    Base.metadata.create_all(bind=connection)
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+@contextmanager
+def count_queries(session: Session):
+    """Count SQL statements sent on the session's connection"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def add_quiz(db: Session, user: User, title: str, attempts: int) -> Quiz:
+    """Create a quiz with two questions and the given number of completed attempts"""
+    quiz = Quiz(user_id=user.id, title=title, question_type="mixed")
+    db.add(quiz)
+    db.flush()
+    for i in range(2):
+        db.add(QuizQuestion(
+            quiz_id=quiz.id,
+            question_text=f"Question {i}",
+            question_type=QuestionType.SHORT_ANSWER,
+            correct_answer="Answer"
+        ))
+    now = datetime.now(timezone.utc)
+    for i in range(attempts):
+        db.add(QuizAttempt(
+            quiz_id=quiz.id,
+            user_id=user.id,
+            score=50.0 + i % 50,
+            total_questions=2,
+            correct_answers=1,
+            answers={},
+            completed_at=now - timedelta(hours=i)
+        ))
+    db.flush()
+    return quiz
+
+def measure(db: Session, user: User) -> dict:
+    """Statements issued by each read path for the user"""
+    db.expire_all()
+    user_id = user.id  # Reload the user outside the counted blocks
+    counts = {}
+    readers = {
+        "list_quizzes": lambda: list_quizzes(current_user=user, db=db),
+        "quiz_analytics": lambda: _compute_quiz_analytics(db, user_id),
+        "performance_metrics": lambda: progress_analytics.get_performance_metrics(db, user_id),
+        "detailed_analytics": lambda: progress_analytics.get_detailed_analytics(db, user_id),
+    }
+    for name, read in readers.items():
+        with count_queries(db) as statements:
+            read()
+        counts[name] = len(statements)
+    return counts
+
+def test_query_count_does_not_grow_with_attempts(db):
+    user = User(email=f"{uuid.uuid4()}@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    add_quiz(db, user, "Biology", attempts=1)
+    
+    # Create the progress row first so no read path has to insert it
+    progress_analytics.get_or_create_progress(db, user.id)
+    db.flush()
+    one_attempt = measure(db, user)
+    
+    add_quiz(db, user, "Biology", attempts=30)
+    add_quiz(db, user, "Chemistry", attempts=25)
+    add_quiz(db, user, "Physics", attempts=0)
+    many_attempts = measure(db, user)
+    
+    assert many_attempts == one_attempt
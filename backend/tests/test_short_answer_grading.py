@@ -0,0 +1,40 @@
+"""
+Tests for local short answer pre-grading
+"""
+import pytest
+from quizzes.evaluator import quiz_evaluator
+
+EXPECTED = "Mitochondria produce ATP"
+
+@pytest.mark.parametrize("answer", [
+    "Mitochondria do not produce ATP",
+    "Mitochondria never produce ATP",
+    "Mitochondria don't produce ATP",
+    "Ribosomes, not mitochondria, produce ATP",
+    "Ribosomes produce ATP",
+    "Mitochondria produce ATP without oxygen",
+])
+def test_contradicting_answers_are_never_auto_accepted(answer):
+    result = quiz_evaluator.pre_grade(answer, EXPECTED, "What do mitochondria produce?")
+    assert result is None or not result["is_correct"]
+
+def test_negations_are_grading_terms():
+    assert "not" in quiz_evaluator._terms("Mitochondria do not produce ATP")
+    assert "not" in quiz_evaluator._terms("Mitochondria don't produce ATP")
+    assert "never" in quiz_evaluator._terms("Mitochondria never produce ATP")
+
+def test_exact_normalized_match_is_accepted():
+    result = quiz_evaluator.pre_grade("mitochondria produce ATP.", EXPECTED)
+    assert result["is_correct"] and result["points_earned"] == 1.0
+
+def test_same_terms_are_accepted_locally():
+    result = quiz_evaluator.pre_grade("Mitochondria produce the ATP", EXPECTED)
+    assert result is not None and result["points_earned"] == 1.0
+
+def test_unrelated_answer_is_rejected_locally():
+    result = quiz_evaluator.pre_grade("Photosynthesis happens in leaves", EXPECTED)
+    assert result is not None and result["points_earned"] == 0.0
+
+def test_empty_answer_is_rejected_locally():
+    result = quiz_evaluator.pre_grade("   ", EXPECTED)
+    assert result["points_earned"] == 0.0
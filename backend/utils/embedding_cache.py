@@ -0,0 +1,176 @@
+"""
+Content-addressed embedding cache
+Vectors are stored as float32 BLOBs in SQLite keyed by (model, SHA-256 of the
+text), so identical chunks are embedded once across users and re-uploads
+"""
+import sqlite3
+from array import array
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+from config.settings import settings
+from utils.helpers import hash_string
+from utils.logger import logger
+
+# Stay under SQLite's bound-parameter limit in IN (...) lookups
+LOOKUP_BATCH_SIZE = 500
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache with bulk lookup
+    
+    Entries are evicted least-recently-used once the table grows past
+    EMBEDDING_CACHE_MAX_ENTRIES.
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = Path(path or settings.EMBEDDING_CACHE_PATH)
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite file on first use (caller holds the lock)"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings (accessed_at)")
+            self._conn.commit()
+        return self._conn
+    
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Look up the cached embeddings of many texts at once
+        
+        Args:
+            model: Embedding model (and task type) the vectors came from
+            texts: Texts to look up
+        
+        Returns:
+            One embedding or None per text, in the same order
+        """
+        hashes = [hash_string(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        
+        with self._lock:
+            try:
+                conn = self._connect()
+                unique = list(dict.fromkeys(hashes))
+                for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+                    batch = unique[start:start + LOOKUP_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings "
+                        f"WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *batch]
+                    ).fetchall()
+                    for text_hash, blob in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        found[text_hash] = vector.tolist()
+                if found:
+                    conn.executemany(
+                        "UPDATE embeddings SET accessed_at = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, text_hash) for text_hash in found]
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+            
+            results = [found.get(text_hash) for text_hash in hashes]
+            hits = sum(1 for vector in results if vector is not None)
+            self.counters["hits"] += hits
+            self.counters["misses"] += len(results) - hits
+        return results
+    
+    def set_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """
+        Store embeddings for many texts
+        
+        Args:
+            model: Embedding model (and task type) the vectors came from
+            texts: Embedded texts
+            vectors: Their embeddings, in the same order
+        """
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            packed = array("f", vector)
+            rows.append((model, hash_string(text), len(packed), packed.tobytes(), now))
+        if not rows:
+            return
+        
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+                self.counters["writes"] += len(rows)
+                
+                self._writes_since_evict += len(rows)
+                if self._writes_since_evict >= 1000:
+                    self._writes_since_evict = 0
+                    self._evict(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+    
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop the least recently used entries over max_entries"""
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY accessed_at LIMIT ?)",
+            (excess,)
+        )
+        conn.commit()
+        self.counters["evicted"] += excess
+        logger.info(f"Embedding cache: evicted {excess} entries")
+    
+    def clear(self):
+        """Remove every cached embedding"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache clear failed: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit/miss counters
+        
+        Returns:
+            Counters plus overall hit rate
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 3) if lookups else 0.0
+        return counters
+
+# Global embedding cache instance
+embedding_cache = EmbeddingCache()
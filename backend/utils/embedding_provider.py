@@ -0,0 +1,127 @@
+"""
+Pluggable embedding backends
+The vector store embeds through an EmbeddingProvider chosen by
+settings.EMBEDDING_PROVIDER: Gemini (default) or a deterministic local
+vectorizer that needs no network
+"""
+import hashlib
+import math
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+from core.bm25 import tokenize
+from utils.gemini_client import gemini_client
+
+class EmbeddingProvider(ABC):
+    """Interface for embedding backends"""
+    
+    # Identifies the vector space; vectors from different providers never share a collection
+    name: str = ""
+    collection_suffix: str = ""
+    
+    @abstractmethod
+    def embed(self, text: str, task_type: str = "retrieval_document") -> List[float]:
+        """
+        Embed one text
+        
+        Args:
+            text: Input text
+            task_type: Embedding task type (retrieval_document or retrieval_query)
+        
+        Returns:
+            Embedding vector
+        """
+    
+    def embed_batch(self, texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+        """
+        Embed many texts
+        
+        Args:
+            texts: Input texts
+            task_type: Embedding task type (retrieval_document or retrieval_query)
+        
+        Returns:
+            Embedding vectors, in the same order as texts
+        """
+        return [self.embed(text, task_type) for text in texts]
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Remote Gemini embeddings (cached by content hash in GeminiClient)"""
+    
+    def __init__(self, client=None):
+        self.client = client or gemini_client
+        self.name = self.client.embedding_model_name
+    
+    def embed(self, text: str, task_type: str = "retrieval_document") -> List[float]:
+        return self.client.generate_embeddings(text, task_type=task_type)
+    
+    def embed_batch(self, texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+        return self.client.generate_embeddings_batch(texts, task_type=task_type)
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic offline embeddings for tests, benchmarks and air-gapped use
+    
+    Terms and adjacent term pairs are weighted by sublinear TF (1 + log tf)
+    and folded into `dim` dimensions with the signed hashing trick, which
+    is a sparse random projection of the TF vector. Vectors are L2-normalized,
+    so cosine similarity approximates weighted term overlap. Identical input
+    always gives the identical vector, across processes and machines.
+    """
+    
+    collection_suffix = "__local"
+    
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.LOCAL_EMBEDDING_DIM
+        self.name = f"local-hashing-{self.dim}"
+    
+    def _features(self, text: str) -> Dict[str, float]:
+        """Sublinear TF weights of terms, and of term pairs at half weight"""
+        terms = tokenize(text)
+        pairs = Counter(f"{first} {second}" for first, second in zip(terms, terms[1:]))
+        features = {term: 1.0 + math.log(count) for term, count in Counter(terms).items()}
+        features.update({pair: 0.5 * (1.0 + math.log(count)) for pair, count in pairs.items()})
+        return features
+    
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        """Stable dimension and sign of a feature (Python's hash() is salted per process)"""
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if (digest >> 63) & 1 else -1.0
+    
+    def embed(self, text: str, task_type: str = "retrieval_document") -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        features = self._features(text)
+        if not features:
+            # A zero vector has no cosine similarity; give empty text a fixed direction
+            features = {"": 1.0}
+        
+        for feature, weight in features.items():
+            index, sign = self._bucket(feature)
+            vector[index] += sign * weight
+        
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+def create_embedding_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Build the embedding provider selected in settings
+    
+    Args:
+        name: Provider name (defaults to settings.EMBEDDING_PROVIDER)
+    
+    Returns:
+        Embedding provider
+    """
+    name = (name or settings.EMBEDDING_PROVIDER).lower()
+    if name == "gemini":
+        return GeminiEmbeddingProvider()
+    if name == "local":
+        return LocalEmbeddingProvider()
+    raise ValueError(f"Unknown embedding provider: {name}")
+
+# Global embedding provider instance
+embedding_provider = create_embedding_provider()
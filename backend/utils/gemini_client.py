@@ -1,14 +1,34 @@
 """
 Gemini API client for AI operations
 """
+import asyncio
 import os
-from typing import Optional, List, Dict, Any
+import threading
+import time
+from typing import Optional, List, Dict, Any, AsyncIterator
 from pathlib import Path
 import google.generativeai as genai
 from langdetect import detect, LangDetectException
 from config.settings import settings
+from utils.helpers import calculate_file_hash, estimate_tokens
+from utils.llm_cache import llm_cache
+from utils.embedding_cache import embedding_cache
+from utils.logger import logger
+from utils.single_flight import single_flight
+from utils.resilience import TokenBucket, CircuitBreaker, is_retryable, backoff_delay
 from PIL import Image
 
+# Increase token limit for long notes
+MAX_OUTPUT_TOKENS = 8000
+
+# Configure safety settings to be more lenient for educational content
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_ONLY_HIGH"},
+]
+
 class GeminiClient:
     """Client for interacting with Google Gemini API"""
     
@@ -17,86 +37,469 @@ class GeminiClient:
         genai.configure(api_key=settings.GOOGLE_API_KEY)
         self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
         self.embedding_model_name = settings.GEMINI_EMBEDDING_MODEL
+        
+        # Bound concurrent generate calls - one limiter for worker threads,
+        # one for the event loop, both sized by GEMINI_MAX_CONCURRENCY
+        self.max_concurrency = max(1, settings.GEMINI_MAX_CONCURRENCY)
+        self._sync_limiter = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_limiter: Optional[asyncio.Semaphore] = None
+        self._async_limiter_loop = None
+        
+        # Opt-in response cache (LLM_CACHE_ENABLED)
+        self.cache = llm_cache
+        # Embeddings keyed by content hash (EMBEDDING_CACHE_ENABLED)
+        self.embedding_cache = embedding_cache
+        
+        # Shared rate limits and circuit breaker for every Gemini call in this process
+        self.request_bucket = TokenBucket(settings.GEMINI_REQUESTS_PER_MINUTE)
+        self.token_bucket = TokenBucket(settings.GEMINI_TOKENS_PER_MINUTE)
+        self.circuit = CircuitBreaker(
+            "Gemini",
+            failure_threshold=settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.GEMINI_CIRCUIT_RESET_SECONDS
+        )
+        self.request_options = {"timeout": settings.GEMINI_REQUEST_TIMEOUT_SECONDS}
+    
+    def _build_request(self, prompt: str, temperature: float, image_path: Optional[str] = None):
+        """
+        Build the content and configs for a generate_content call
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            image_path: Optional path to image file for vision analysis
+            
+        Returns:
+            Tuple of (content, generation_config, safety_settings)
+        """
+        generation_config = genai.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+        )
+        safety_settings = SAFETY_SETTINGS
+        
+        # Prepare content for API call
+        content = []
+        
+        # If image path is provided, use Gemini Vision
+        if image_path:
+            try:
+                # Load image
+                image = Image.open(image_path)
+                content.append(prompt)
+                content.append(image)
+                print(f"Processing image with Gemini Vision: {image_path}")
+            except Exception as img_error:
+                print(f"Error loading image: {img_error}")
+                raise Exception(f"Failed to load image for Gemini Vision: {str(img_error)}")
+        else:
+            content = prompt
+        
+        return content, generation_config, safety_settings
+    
+    @staticmethod
+    def _response_text(response) -> str:
+        """Get the text of a response, raising if it was blocked or empty"""
+        if not response.text:
+            # Try to get the reason if blocked
+            if hasattr(response, 'prompt_feedback'):
+                raise Exception(f"Content generation blocked: {response.prompt_feedback}")
+            raise Exception("Content generation returned empty response")
+        return response.text
+    
+    def _request_key(
+        self,
+        prompt: str,
+        temperature: float,
+        image_path: Optional[str],
+        use_cache: Optional[bool]
+    ) -> Optional[str]:
+        """
+        Key identifying a request whose response may be reused, or None
+        
+        The same key drives the response cache and in-flight coalescing.
+        use_cache=False, or a temperature above LLM_CACHE_MAX_TEMPERATURE
+        with use_cache unset, opts the call out of both.
+        """
+        if use_cache is False:
+            return None
+        if use_cache is None and temperature > settings.LLM_CACHE_MAX_TEMPERATURE:
+            return None
+        
+        image_hash = None
+        if image_path:
+            try:
+                image_hash = calculate_file_hash(image_path)
+            except OSError:
+                return None
+        
+        return self.cache.make_key(
+            settings.GEMINI_MODEL,
+            prompt,
+            temperature,
+            image_hash=image_hash,
+            config={"max_output_tokens": MAX_OUTPUT_TOKENS, "safety_settings": SAFETY_SETTINGS}
+        )
     
-    def generate_text(self, prompt: str, temperature: float = 0.3, image_path: Optional[str] = None) -> str:
+    @staticmethod
+    def _use_cache(use_cache: Optional[bool]) -> bool:
+        """Whether to read/write the response cache (LLM_CACHE_ENABLED unless forced)"""
+        return settings.LLM_CACHE_ENABLED if use_cache is None else use_cache
+    
+    def _on_error(self, error: Exception, attempt: int) -> float:
+        """
+        Record a failed attempt and decide whether to retry
+        
+        Args:
+            error: Exception raised by the API call
+            attempt: Number of the attempt that failed, starting at 1
+            
+        Returns:
+            Seconds to wait before retrying (re-raises when not retrying)
+        """
+        if not is_retryable(error):
+            # Gemini answered - invalid request or blocked content, not an outage
+            self.circuit.record_success()
+            raise error
+        
+        self.circuit.record_failure()
+        if attempt > settings.GEMINI_MAX_RETRIES:
+            raise error
+        
+        delay = backoff_delay(attempt, settings.GEMINI_RETRY_BASE_SECONDS, settings.GEMINI_RETRY_MAX_SECONDS)
+        logger.warning(f"Gemini call failed (attempt {attempt}): {error} - retrying in {delay:.1f}s")
+        return delay
+    
+    def _call(self, fn, tokens: int = 0):
+        """
+        Run a blocking API call through the circuit breaker, rate limits and retry policy
+        
+        Args:
+            fn: Callable making one API request
+            tokens: Estimated prompt tokens to take from the tokens-per-minute bucket
+            
+        Returns:
+            Result of fn
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.circuit.before_call()
+            self.request_bucket.acquire(1, timeout=settings.GEMINI_RATE_LIMIT_TIMEOUT_SECONDS)
+            if tokens:
+                self.token_bucket.acquire(tokens, timeout=settings.GEMINI_RATE_LIMIT_TIMEOUT_SECONDS)
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self._on_error(e, attempt))
+                continue
+            self.circuit.record_success()
+            return result
+    
+    async def _call_async(self, fn, tokens: int = 0):
+        """
+        Async version of _call
+        
+        Args:
+            fn: Callable returning a coroutine that makes one API request
+            tokens: Estimated prompt tokens to take from the tokens-per-minute bucket
+            
+        Returns:
+            Result of the awaited coroutine
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.circuit.before_call()
+            await self.request_bucket.acquire_async(1, timeout=settings.GEMINI_RATE_LIMIT_TIMEOUT_SECONDS)
+            if tokens:
+                await self.token_bucket.acquire_async(tokens, timeout=settings.GEMINI_RATE_LIMIT_TIMEOUT_SECONDS)
+            try:
+                result = await fn()
+            except Exception as e:
+                await asyncio.sleep(self._on_error(e, attempt))
+                continue
+            self.circuit.record_success()
+            return result
+    
+    def _get_async_limiter(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent async calls on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_limiter is None or self._async_limiter_loop is not loop:
+            self._async_limiter = asyncio.Semaphore(self.max_concurrency)
+            self._async_limiter_loop = loop
+        return self._async_limiter
+    
+    def generate_text(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        image_path: Optional[str] = None,
+        use_cache: Optional[bool] = None
+    ) -> str:
         """
         Generate text using Gemini (with optional image input for Vision API)
         
+        Blocking - from async code use generate_text_async instead.
+        
         Args:
             prompt: Input prompt
             temperature: Sampling temperature
             image_path: Optional path to image file for vision analysis
+            use_cache: Force the response cache on/off (default: by settings and temperature)
             
         Returns:
             Generated text
         """
         try:
-            generation_config = genai.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=8000,  # Increase token limit for long notes
-            )
+            request_key = self._request_key(prompt, temperature, image_path, use_cache)
+            cache_key = request_key if request_key and self._use_cache(use_cache) else None
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
-            # Configure safety settings to be more lenient for educational content
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_ONLY_HIGH"},
-            ]
-            
-            # Prepare content for API call
-            content = []
-            
-            # If image path is provided, use Gemini Vision
-            if image_path:
-                try:
-                    # Load image
-                    image = Image.open(image_path)
-                    content.append(prompt)
-                    content.append(image)
-                    print(f"Processing image with Gemini Vision: {image_path}")
-                except Exception as img_error:
-                    print(f"Error loading image: {img_error}")
-                    raise Exception(f"Failed to load image for Gemini Vision: {str(img_error)}")
-            else:
-                content = prompt
-            
-            response = self.model.generate_content(
-                content, 
-                generation_config=generation_config,
-                safety_settings=safety_settings
+            if not request_key:
+                return self._generate(prompt, temperature, image_path)
+            
+            # Identical prompts already in flight share one Gemini call
+            return single_flight.do(
+                f"llm:{request_key}",
+                lambda: self._generate(prompt, temperature, image_path, cache_key)
             )
+        except Exception as e:
+            raise Exception(f"Error generating text: {str(e)}")
+    
+    def _generate(
+        self,
+        prompt: str,
+        temperature: float,
+        image_path: Optional[str],
+        cache_key: Optional[str] = None
+    ) -> str:
+        """Make the generate_content call and store the response when cache_key is given"""
+        content, generation_config, safety_settings = self._build_request(prompt, temperature, image_path)
+        
+        def request():
+            with self._sync_limiter:
+                return self.model.generate_content(
+                    content, 
+                    generation_config=generation_config,
+                    safety_settings=safety_settings,
+                    request_options=self.request_options
+                )
+        
+        response = self._call(request, tokens=estimate_tokens(prompt))
+        
+        text = self._response_text(response)
+        if cache_key:
+            self.cache.set(cache_key, text)
+        return text
+    
+    async def generate_text_async(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        image_path: Optional[str] = None,
+        use_cache: Optional[bool] = None
+    ) -> str:
+        """
+        Generate text using Gemini without blocking the event loop
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            image_path: Optional path to image file for vision analysis
+            use_cache: Force the response cache on/off (default: by settings and temperature)
             
-            # Check if response was blocked
-            if not response.text:
-                # Try to get the reason if blocked
-                if hasattr(response, 'prompt_feedback'):
-                    raise Exception(f"Content generation blocked: {response.prompt_feedback}")
-                raise Exception("Content generation returned empty response")
+        Returns:
+            Generated text
+        """
+        try:
+            request_key = self._request_key(prompt, temperature, image_path, use_cache)
+            cache_key = request_key if request_key and self._use_cache(use_cache) else None
+            if cache_key:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    return cached
             
-            return response.text
+            if not request_key:
+                return await self._generate_async(prompt, temperature, image_path)
+            
+            # Identical prompts already in flight share one Gemini call
+            return await single_flight.do_async(
+                f"llm:{request_key}",
+                lambda: self._generate_async(prompt, temperature, image_path, cache_key)
+            )
         except Exception as e:
             raise Exception(f"Error generating text: {str(e)}")
     
-    def generate_embeddings(self, text: str) -> List[float]:
+    async def _generate_async(
+        self,
+        prompt: str,
+        temperature: float,
+        image_path: Optional[str],
+        cache_key: Optional[str] = None
+    ) -> str:
+        """Async version of _generate"""
+        content, generation_config, safety_settings = self._build_request(prompt, temperature, image_path)
+        
+        async def request():
+            async with self._get_async_limiter():
+                return await self.model.generate_content_async(
+                    content,
+                    generation_config=generation_config,
+                    safety_settings=safety_settings,
+                    request_options=self.request_options
+                )
+        
+        response = await self._call_async(request, tokens=estimate_tokens(prompt))
+        
+        text = self._response_text(response)
+        if cache_key:
+            await asyncio.to_thread(self.cache.set, cache_key, text)
+        return text
+    
+    async def stream_text_async(self, prompt: str, temperature: float = 0.3) -> AsyncIterator[str]:
+        """
+        Stream generated text from Gemini as it is produced
+        
+        Cached responses (see generate_text) are yielded as a single chunk;
+        completed streams are written to the cache like normal responses.
+        The SQLite-backed cache is read and written off the event loop.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            
+        Yields:
+            Text chunks in order
+        """
+        request_key = self._request_key(prompt, temperature, None, None)
+        cache_key = request_key if request_key and self._use_cache(None) else None
+        if cache_key:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        try:
+            content, generation_config, safety_settings = self._build_request(prompt, temperature)
+            parts = []
+            
+            # Hold a concurrency slot for the whole stream, not just the first response
+            async with self._get_async_limiter():
+                response = await self._call_async(
+                    lambda: self.model.generate_content_async(
+                        content,
+                        generation_config=generation_config,
+                        safety_settings=safety_settings,
+                        stream=True,
+                        request_options=self.request_options
+                    ),
+                    tokens=estimate_tokens(prompt)
+                )
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunk without text parts (e.g. final chunk carrying only metadata)
+                        continue
+                    if text:
+                        parts.append(text)
+                        yield text
+        except Exception as e:
+            raise Exception(f"Error streaming text: {str(e)}")
+        
+        if not parts:
+            raise Exception("Error streaming text: Content generation returned empty response")
+        if cache_key:
+            await asyncio.to_thread(self.cache.set, cache_key, "".join(parts))
+    
+    def _embedding_cache_model(self, task_type: str) -> str:
+        """Embedding cache namespace - vectors differ per model and task type"""
+        return f"{self.embedding_model_name}:{task_type}"
+    
+    def generate_embeddings(self, text: str, task_type: str = "retrieval_document") -> List[float]:
         """
         Generate embeddings for text
         
         Args:
             text: Input text
+            task_type: Embedding task type (retrieval_document or retrieval_query)
             
         Returns:
             List of embedding values
         """
+        cache_model = self._embedding_cache_model(task_type)
+        if settings.EMBEDDING_CACHE_ENABLED:
+            cached = self.embedding_cache.get_many(cache_model, [text])[0]
+            if cached is not None:
+                return cached
+        
         try:
-            result = genai.embed_content(
+            result = self._call(lambda: genai.embed_content(
                 model=self.embedding_model_name,
                 content=text,
-                task_type="retrieval_document"
-            )
-            return result['embedding']
+                task_type=task_type,
+                request_options=self.request_options
+            ))
         except Exception as e:
             raise Exception(f"Error generating embeddings: {str(e)}")
+        
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.embedding_cache.set_many(cache_model, [text], [result['embedding']])
+        return result['embedding']
+    
+    def generate_embeddings_batch(
+        self, 
+        texts: List[str], 
+        task_type: str = "retrieval_document",
+        batch_size: Optional[int] = None
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for many texts, sending them in batches
+        
+        Cached vectors are looked up in bulk first; only distinct uncached
+        texts are sent to the API, and their vectors are cached.
+        
+        Args:
+            texts: Input texts
+            task_type: Embedding task type (retrieval_document or retrieval_query)
+            batch_size: Texts per API call (defaults to settings.EMBEDDING_BATCH_SIZE)
+            
+        Returns:
+            List of embeddings, in the same order as texts
+        """
+        batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        cache_model = self._embedding_cache_model(task_type)
+        use_cache = settings.EMBEDDING_CACHE_ENABLED
+        
+        embeddings = self.embedding_cache.get_many(cache_model, texts) if use_cache else [None] * len(texts)
+        missing = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        fresh = {}
+        
+        try:
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                result = self._call(lambda: genai.embed_content(
+                    model=self.embedding_model_name,
+                    content=batch,
+                    task_type=task_type,
+                    request_options=self.request_options
+                ))
+                fresh.update(zip(batch, result['embedding']))
+                if use_cache:
+                    self.embedding_cache.set_many(cache_model, batch, result['embedding'])
+        except Exception as e:
+            raise Exception(f"Error generating batch embeddings: {str(e)}")
+        
+        return [
+            embedding if embedding is not None else fresh[text]
+            for text, embedding in zip(texts, embeddings)
+        ]
     
     def detect_language(self, text: str) -> str:
         """
@@ -4,9 +4,13 @@ Helper utility functions
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import hashlib
+import json
 import secrets
 import uuid
 
+# Rough characters per LLM token for English text
+CHARS_PER_TOKEN = 4
+
 def generate_unique_id() -> str:
     """
     Generate unique identifier
@@ -56,33 +60,30 @@ def calculate_file_hash(file_path: str) -> str:
             hasher.update(chunk)
     return hasher.hexdigest()
 
-def chunk_text(
-    text: str, 
-    chunk_size: int = 1000, 
-    overlap: int = 200
-) -> List[str]:
+def estimate_tokens(text: str) -> int:
     """
-    Split text into overlapping chunks
+    Estimate LLM token count (roughly 4 characters per token for English)
     
     Args:
-        text: Text to chunk
-        chunk_size: Size of each chunk in characters
-        overlap: Overlap between chunks
+        text: Input text
         
     Returns:
-        List of text chunks
+        Estimated number of tokens
     """
-    chunks = []
-    start = 0
-    text_length = len(text)
-    
-    while start < text_length:
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start += chunk_size - overlap
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format a Server-Sent Events message
     
-    return chunks
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+        
+    Returns:
+        SSE frame (event and data lines followed by a blank line)
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 def format_file_size(size_bytes: int) -> str:
     """
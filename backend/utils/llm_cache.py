@@ -0,0 +1,226 @@
+"""
+Response cache for Gemini text generation
+In-memory LRU in front of a SQLite file so identical prompts are answered
+without another API call, across requests and restarts
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+from config.settings import settings
+from utils.helpers import hash_string
+from utils.logger import logger
+
+class LLMCache:
+    """
+    Two-tier cache of generated text keyed by the full request
+    
+    - Memory tier: LRU of the most recent LLM_CACHE_MEMORY_ITEMS responses
+    - SQLite tier: persistent, evicted by TTL and then least-recently-used
+      until under LLM_CACHE_MAX_ENTRIES / LLM_CACHE_MAX_SIZE_MB
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_items: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_size_mb: Optional[float] = None,
+        ttl_hours: Optional[float] = None
+    ):
+        self.path = Path(path or settings.LLM_CACHE_PATH)
+        self.memory_items = memory_items or settings.LLM_CACHE_MEMORY_ITEMS
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.max_bytes = int((max_size_mb or settings.LLM_CACHE_MAX_SIZE_MB) * 1024 * 1024)
+        self.ttl_seconds = (ttl_hours or settings.LLM_CACHE_TTL_HOURS) * 3600
+        
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evicted": 0
+        }
+    
+    @staticmethod
+    def make_key(
+        model: str,
+        prompt: str,
+        temperature: float,
+        image_hash: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Build the cache key for a generation request
+        
+        Args:
+            model: Model name
+            prompt: Prompt text
+            temperature: Sampling temperature
+            image_hash: Content hash of the input image, if any
+            config: Other generation settings (token limit, safety settings)
+        
+        Returns:
+            Hex digest covering every input that changes the response
+        """
+        return hash_string(json.dumps({
+            "model": model,
+            "prompt": prompt,
+            "temperature": round(float(temperature), 3),
+            "image": image_hash,
+            "config": config or {}
+        }, sort_keys=True))
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite file on first use (caller holds the lock)"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn.commit()
+        return self._conn
+    
+    def _remember(self, key: str, response: str, created_at: float):
+        """Put an entry in the memory tier (caller holds the lock)"""
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+        
+        Args:
+            key: Key from make_key
+        
+        Returns:
+            Cached text, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+            
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return row[0]
+                if row:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache read failed: {e}")
+            
+            self.counters["misses"] += 1
+            return None
+    
+    def set(self, key: str, response: str):
+        """
+        Store a response in both tiers
+        
+        Args:
+            key: Key from make_key
+            response: Generated text
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, response, len(response.encode("utf-8")), now, now)
+                )
+                conn.commit()
+                self.counters["writes"] += 1
+                
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= 50:
+                    self._writes_since_evict = 0
+                    self._evict(conn, now)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache write failed: {e}")
+    
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired entries, then least recently used ones over the limits"""
+        removed = conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count > self.max_entries or total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall()
+            stale_keys = []
+            for key, size in rows:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                stale_keys.append((key,))
+                count -= 1
+                total -= size
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
+            removed += len(stale_keys)
+        
+        conn.commit()
+        if removed:
+            self.counters["evicted"] += removed
+            logger.info(f"LLM cache: evicted {removed} entries")
+    
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache clear failed: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit/miss counters
+        
+        Returns:
+            Counters plus overall hit rate
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            counters["memory_entries"] = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        counters["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return counters
+
+# Global LLM cache instance
+llm_cache = LLMCache()
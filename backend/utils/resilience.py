@@ -0,0 +1,190 @@
+"""
+Rate limiting, retries and circuit breaking for external API calls
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Optional
+from google.api_core import exceptions as google_exceptions
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service while its circuit is open"""
+    pass
+
+class RateLimitTimeout(Exception):
+    """Raised when a token bucket cannot grant capacity within the timeout"""
+    pass
+
+# Transient failures worth retrying (rate limits, overload, timeouts, network errors)
+RETRYABLE_EXCEPTIONS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.BadGateway,
+    ConnectionError,
+    TimeoutError,
+)
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Classify an API error as transient
+    
+    Args:
+        error: Exception raised by the call
+    
+    Returns:
+        True for rate limits, server errors and network failures; False for
+        client errors such as invalid arguments, auth failures or blocked content
+    """
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    if isinstance(error, google_exceptions.GoogleAPICallError):
+        return False
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "503", "500 internal", "deadline", "timed out", "temporarily"))
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """
+    Exponential backoff with full jitter
+    
+    Args:
+        attempt: Retry number, starting at 1
+        base: Delay of the first retry in seconds
+        maximum: Upper bound in seconds
+    
+    Returns:
+        Seconds to wait before the retry
+    """
+    return random.uniform(0, min(maximum, base * (2 ** (attempt - 1))))
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute
+    
+    One bucket limits requests per minute (one token per call); another
+    limits tokens per minute (estimated prompt tokens per call).
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: Refill rate; 0 or less disables limiting
+            capacity: Burst size (defaults to one minute's worth)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+    
+    def _reserve(self, amount: float) -> float:
+        """Take tokens if available, otherwise return the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            
+            # Oversized requests only need a full bucket, not more than it can hold
+            amount = min(amount, self.capacity)
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+    
+    def acquire(self, amount: float = 1, timeout: Optional[float] = None):
+        """
+        Block until the tokens are available
+        
+        Args:
+            amount: Tokens to take
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        """
+        if not self.enabled:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(amount)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitTimeout("Rate limit wait exceeds timeout")
+            time.sleep(wait)
+    
+    async def acquire_async(self, amount: float = 1, timeout: Optional[float] = None):
+        """Async version of acquire that sleeps without blocking the event loop"""
+        if not self.enabled:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(amount)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitTimeout("Rate limit wait exceeds timeout")
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Fail fast while a service is down
+    
+    Closed: calls pass through; consecutive transient failures are counted.
+    Open: after failure_threshold failures, calls raise CircuitOpenError
+    immediately for reset_timeout seconds.
+    Half-open: one trial call is let through; success closes the circuit,
+    failure opens it again.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """Raise CircuitOpenError if the call should not be attempted"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            
+            if self.state == self.HALF_OPEN:
+                # A trial that never reported back (e.g. cancelled) stops blocking after reset_timeout
+                if self._trial_in_flight and time.monotonic() - self._trial_started < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit half-open)")
+                self._trial_in_flight = True
+                self._trial_started = time.monotonic()
+    
+    def record_success(self):
+        """Close the circuit after the service answered (including client errors)"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        """Count a transient failure, opening the circuit at the threshold"""
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
@@ -0,0 +1,125 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one execution and its result
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    """An execution in progress, awaited by every caller with the same key"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight work (transcript fetches, page extraction,
+    document parsing, identical LLM prompts)
+    
+    The first caller for a key runs the function; callers arriving while it
+    runs wait and receive the same result or exception. Nothing is kept once
+    the call finishes - persistent reuse is the caches' job. Keys are the
+    same content keys the caches use, prefixed with the kind of work.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[Any, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"executed": 0, "shared": 0}
+    
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run fn, or wait for the identical call already running in another thread
+        
+        Args:
+            key: Identity of the work
+            fn: Callable doing the work
+        
+        Returns:
+            Result of fn (shared between coalesced callers)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.counters["executed"] += 1
+            else:
+                self.counters["shared"] += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+    
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn(), or the identical call already running on this event loop
+        
+        Args:
+            key: Identity of the work
+            fn: Callable returning the coroutine doing the work
+        
+        Returns:
+            Result of the coroutine (shared between coalesced callers)
+        """
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        
+        future = self._async_calls.get(call_key)
+        if future is not None:
+            self.counters["shared"] += 1
+            # shield: a cancelled follower must not cancel the leader's work
+            return await asyncio.shield(future)
+        
+        future = loop.create_future()
+        self._async_calls[call_key] = future
+        self.counters["executed"] += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged as lost
+            future.exception()
+            raise
+        finally:
+            self._async_calls.pop(call_key, None)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters
+        
+        Returns:
+            Executions and calls served by another caller's execution
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            counters["in_flight"] = len(self._calls) + len(self._async_calls)
+        return counters
+
+# Global single-flight instance
+single_flight = SingleFlight()